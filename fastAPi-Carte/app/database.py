@@ -1,8 +1,10 @@
 # app/database.py - FIXED FOR VERCEL
 from motor.motor_asyncio import AsyncIOMotorClient
+import bson
 import os
-from app.utils.db_logger import log_find, log_insert, log_update, log_delete, log_error
+from app.utils.db_logger import log_find, log_insert, log_update, log_bulk_write, log_delete, log_error
 from app.logging_config import get_logger
+from app.utils.report_cache import invalidate_for_write
 
 logger = get_logger("api.database")
 
@@ -11,6 +13,9 @@ logger = get_logger("api.database")
 
 MONGO_DETAILS = os.getenv("MONGODB_URL")
 
+# Number of documents fetched per round trip when streaming with iter_find()
+FIND_BATCH_SIZE = int(os.getenv("MONGODB_FIND_BATCH_SIZE", "500"))
+
 if not MONGO_DETAILS:
     # Just log the error instead of raising an exception during import
     logger.error("MONGODB_URL environment variable is not set")
@@ -56,6 +61,46 @@ class LoggedCollection:
             log_error(self.collection_name, "find", str(e), query)
             raise
     
+    async def iter_find(self, query=None, batch_size: int = FIND_BATCH_SIZE, **kwargs):
+        """Stream matching documents one batch at a time instead of loading the whole result set"""
+        count = 0
+        try:
+            cursor = self.collection.find(query or {}, **kwargs).batch_size(batch_size)
+            async for document in cursor:
+                count += 1
+                yield document
+            log_find(self.collection_name, query, count)
+        except Exception as e:
+            log_error(self.collection_name, "iter_find", str(e), query)
+            raise
+    
+    async def iter_find_batches(self, query=None, batch_size: int = FIND_BATCH_SIZE, **kwargs):
+        """
+        Stream matching documents as one list per batch. Batches are read as raw
+        BSON and decoded in a single call each, without per-document cursor steps.
+        """
+        count = 0
+        try:
+            cursor = self.collection.find_raw_batches(query or {}, **kwargs).batch_size(batch_size)
+            async for batch in cursor:
+                documents = bson.decode_all(batch)
+                count += len(documents)
+                yield documents
+            log_find(self.collection_name, query, count)
+        except Exception as e:
+            log_error(self.collection_name, "iter_find_batches", str(e), query)
+            raise
+    
+    async def aggregate(self, pipeline, **kwargs):
+        try:
+            cursor = self.collection.aggregate(pipeline, **kwargs)
+            results = await cursor.to_list(length=None)
+            log_find(self.collection_name, {"$aggregate": len(pipeline)}, len(results))
+            return results
+        except Exception as e:
+            log_error(self.collection_name, "aggregate", str(e))
+            raise
+    
     async def find_one(self, query=None, **kwargs):
         try:
             result = await self.collection.find_one(query or {}, **kwargs)
@@ -69,6 +114,7 @@ class LoggedCollection:
         try:
             result = await self.collection.insert_one(document, **kwargs)
             log_insert(self.collection_name, document, result)
+            invalidate_for_write(self.collection_name, document)
             return result
         except Exception as e:
             log_error(self.collection_name, "insert_one", str(e))
@@ -78,6 +124,7 @@ class LoggedCollection:
         try:
             result = await self.collection.insert_many(documents, **kwargs)
             log_insert(self.collection_name, documents, result)
+            invalidate_for_write(self.collection_name, documents)
             return result
         except Exception as e:
             log_error(self.collection_name, "insert_many", str(e))
@@ -87,6 +134,7 @@ class LoggedCollection:
         try:
             result = await self.collection.update_one(filter, update, **kwargs)
             log_update(self.collection_name, filter, update, result)
+            invalidate_for_write(self.collection_name, filter, update)
             return result
         except Exception as e:
             log_error(self.collection_name, "update_one", str(e), filter)
@@ -96,15 +144,37 @@ class LoggedCollection:
         try:
             result = await self.collection.update_many(filter, update, **kwargs)
             log_update(self.collection_name, filter, update, result)
+            invalidate_for_write(self.collection_name, filter, update)
             return result
         except Exception as e:
             log_error(self.collection_name, "update_many", str(e), filter)
             raise
     
+    async def find_one_and_update(self, filter, update, **kwargs):
+        try:
+            result = await self.collection.find_one_and_update(filter, update, **kwargs)
+            log_update(self.collection_name, filter, update, result)
+            invalidate_for_write(self.collection_name, filter, update, result)
+            return result
+        except Exception as e:
+            log_error(self.collection_name, "find_one_and_update", str(e), filter)
+            raise
+    
+    async def bulk_write(self, requests, **kwargs):
+        try:
+            result = await self.collection.bulk_write(requests, **kwargs)
+            log_bulk_write(self.collection_name, requests, result)
+            invalidate_for_write(self.collection_name)
+            return result
+        except Exception as e:
+            log_error(self.collection_name, "bulk_write", str(e))
+            raise
+    
     async def delete_one(self, filter, **kwargs):
         try:
             result = await self.collection.delete_one(filter, **kwargs)
             log_delete(self.collection_name, filter, result)
+            invalidate_for_write(self.collection_name, filter)
             return result
         except Exception as e:
             log_error(self.collection_name, "delete_one", str(e), filter)
@@ -114,6 +184,7 @@ class LoggedCollection:
         try:
             result = await self.collection.delete_many(filter, **kwargs)
             log_delete(self.collection_name, filter, result)
+            invalidate_for_write(self.collection_name, filter)
             return result
         except Exception as e:
             log_error(self.collection_name, "delete_many", str(e), filter)
@@ -0,0 +1,221 @@
+# app/indexes.py - DECLARATIVE INDEX REGISTRY
+"""
+Indexes required by the API's hot queries, declared per collection.
+
+reconcile_indexes() creates anything missing and reports drift (indexes whose
+keys/options differ from the declaration, and undeclared indexes). It is safe
+to run repeatedly; it runs on startup and can be run by hand:
+
+    python -m app.indexes            # create missing indexes, report drift
+    python -m app.indexes --check    # report only, exit 1 on drift
+    python -m app.indexes --rebuild  # also drop and recreate drifted indexes
+"""
+import asyncio
+import os
+import sys
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from app.logging_config import get_logger
+from app.utils.idempotency import IDEMPOTENCY_COLLECTION, IDEMPOTENCY_TTL_SECONDS
+from app.utils.events import ORDER_EVENTS_COLLECTION, ORDER_EVENTS_TTL_SECONDS
+from app.utils.sales_rollup import SALES_ROLLUP_COLLECTION
+from app.utils.job_queue import FAILED_JOBS_COLLECTION, JOBS_COLLECTION
+from app.utils.report_jobs import REPORT_RESULTS_COLLECTION, REPORT_RESULTS_TTL_SECONDS
+
+logger = get_logger("api.indexes")
+
+# Set MONGODB_ENSURE_INDEXES=false to skip reconciliation on startup
+ENSURE_INDEXES_ON_STARTUP = os.getenv("MONGODB_ENSURE_INDEXES", "true").lower() == "true"
+
+# Options that make two indexes with the same name different
+_COMPARED_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    "orders": [
+        IndexModel([("store_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)],
+                   name="store_status_created_at"),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+        IndexModel([("items.id", ASCENDING)], name="items_id"),
+        IndexModel([("items.food_id", ASCENDING)], name="items_food_id"),
+        IndexModel([("customer_id", ASCENDING), ("created_at", DESCENDING)], name="customer_created_at"),
+        IndexModel([("employee_id", ASCENDING), ("created_at", DESCENDING)], name="employee_created_at"),
+    ],
+    "payment_attempts": [
+        IndexModel([("order_id", ASCENDING)], name="order_id"),
+    ],
+    "payments": [
+        IndexModel([("order_id", ASCENDING)], name="order_id"),
+    ],
+    "timesheet_entries": [
+        IndexModel([("employee_id", ASCENDING), ("clock_in", DESCENDING)], name="employee_clock_in"),
+    ],
+    "domains": [
+        IndexModel([("domain", ASCENDING), ("is_primary", ASCENDING)], name="domain_is_primary"),
+        # A domain may only have one primary record
+        IndexModel([("domain", ASCENDING)], name="unique_primary_domain", unique=True,
+                   partialFilterExpression={"is_primary": True}),
+    ],
+    "shifts": [
+        IndexModel([("recurring_series_id", ASCENDING), ("start", ASCENDING)], name="series_start"),
+        IndexModel([("employee_id", ASCENDING)], name="employee_id"),
+    ],
+    "users": [
+        # Partial so documents without the field don't collide on null
+        IndexModel([("email", ASCENDING)], name="unique_email", unique=True,
+                   partialFilterExpression={"email": {"$type": "string"}}),
+        IndexModel([("username", ASCENDING)], name="unique_username", unique=True,
+                   partialFilterExpression={"username": {"$type": "string"}}),
+    ],
+    "employees": [
+        IndexModel([("email", ASCENDING)], name="email"),
+        IndexModel([("store_id", ASCENDING)], name="store_id"),
+    ],
+    "foods": [
+        IndexModel([("store_id", ASCENDING)], name="store_id"),
+    ],
+    IDEMPOTENCY_COLLECTION: [
+        IndexModel([("created_at", ASCENDING)], name="ttl_created_at",
+                   expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS),
+    ],
+    ORDER_EVENTS_COLLECTION: [
+        IndexModel([("created_at", ASCENDING)], name="ttl_created_at",
+                   expireAfterSeconds=ORDER_EVENTS_TTL_SECONDS),
+    ],
+    SALES_ROLLUP_COLLECTION: [
+        IndexModel([("store_id", ASCENDING), ("hour", ASCENDING)], name="store_hour"),
+        IndexModel([("hour", ASCENDING)], name="hour"),
+    ],
+    JOBS_COLLECTION: [
+        IndexModel([("queue", ASCENDING), ("available_at", ASCENDING)], name="queue_available_at"),
+        # Sparse: jobs queued before the uuid was stored at the top level don't have it
+        IndexModel([("uuid", ASCENDING)], name="uuid", unique=True, sparse=True),
+    ],
+    FAILED_JOBS_COLLECTION: [
+        IndexModel([("uuid", ASCENDING)], name="uuid"),
+    ],
+    REPORT_RESULTS_COLLECTION: [
+        IndexModel([("created_at", ASCENDING)], name="ttl_created_at",
+                   expireAfterSeconds=REPORT_RESULTS_TTL_SECONDS),
+    ],
+}
+
+
+def _normalise(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce an index document to the parts we compare"""
+    normalised = {"key": [(field, direction) for field, direction in dict(spec["key"]).items()]}
+    for option in _COMPARED_OPTIONS:
+        if spec.get(option) is not None:
+            normalised[option] = spec[option]
+    return normalised
+
+
+async def reconcile_indexes(database, check_only: bool = False, rebuild: bool = False) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Bring each registered collection's indexes in line with INDEX_REGISTRY.
+    Returns a per-collection report of created, drifted and undeclared index
+    names. Errors are recorded under "failed" ("<name>: <error>") and the
+    remaining indexes and collections are still reconciled.
+    """
+    report: Dict[str, Dict[str, List[str]]] = {}
+
+    for collection_name, models in INDEX_REGISTRY.items():
+        collection = database[collection_name]
+        result = {"created": [], "drifted": [], "rebuilt": [], "undeclared": [], "failed": []}
+        report[collection_name] = result
+        try:
+            existing = await collection.index_information()
+        except Exception as e:
+            result["failed"].append(f"*: {e}")
+            logger.error(f"Could not read indexes on {collection_name}: {e}")
+            continue
+        to_create = []
+
+        for model in models:
+            declared = model.document
+            name = declared["name"]
+            if name not in existing:
+                to_create.append(model)
+                continue
+            if _normalise(declared) != _normalise(existing[name]):
+                result["drifted"].append(name)
+                if rebuild and not check_only:
+                    try:
+                        await collection.drop_index(name)
+                    except Exception as e:
+                        result["failed"].append(f"{name}: {e}")
+                        logger.error(f"Could not drop drifted index {collection_name}.{name}: {e}")
+                        continue
+                    to_create.append(model)
+                    result["rebuilt"].append(name)
+
+        # One at a time, so a failing index (e.g. a unique index over existing
+        # duplicates) doesn't hold back the rest
+        failed = set()
+        if not check_only:
+            for model in to_create:
+                name = model.document["name"]
+                try:
+                    await collection.create_indexes([model])
+                except Exception as e:
+                    failed.add(name)
+                    result["failed"].append(f"{name}: {e}")
+                    logger.error(f"Could not create index {collection_name}.{name}: {e}")
+        result["rebuilt"] = [name for name in result["rebuilt"] if name not in failed]
+        result["created"] = [m.document["name"] for m in to_create
+                             if m.document["name"] not in result["rebuilt"] and m.document["name"] not in failed]
+
+        declared_names = {m.document["name"] for m in models}
+        result["undeclared"] = [name for name in existing if name != "_id_" and name not in declared_names]
+
+        for name in result["drifted"]:
+            logger.warning(f"Index drift on {collection_name}.{name}: definition differs from registry")
+        if result["created"]:
+            verb = "Missing" if check_only else "Created"
+            logger.info(f"{verb} indexes on {collection_name}: {', '.join(result['created'])}")
+
+    return report
+
+
+def has_drift(report: Dict[str, Dict[str, List[str]]]) -> bool:
+    """True if any collection is missing an index or has a drifted definition"""
+    return any(result["created"] or (set(result["drifted"]) - set(result["rebuilt"]))
+               for result in report.values())
+
+
+def failures(report: Dict[str, Dict[str, List[str]]]) -> List[str]:
+    """Every index that could not be read, dropped or created, as '<collection>.<name>: <error>'"""
+    return [f"{collection_name}.{failure}" for collection_name, result in report.items()
+            for failure in result["failed"]]
+
+
+async def _main(argv: List[str]) -> int:
+    from app.database import database
+
+    if database is None:
+        print("❌ Database not initialized - check MONGODB_URL environment variable")
+        return 2
+
+    check_only = "--check" in argv
+    report = await reconcile_indexes(database, check_only=check_only, rebuild="--rebuild" in argv)
+
+    for collection_name, result in report.items():
+        label = "missing" if check_only else "created"
+        print(f"📂 {collection_name}: {label}={result['created']} drifted={result['drifted']} "
+              f"rebuilt={result['rebuilt']} undeclared={result['undeclared']}")
+
+    failed = failures(report)
+    if failed:
+        for failure in failed:
+            print(f"❌ {failure}")
+        return 1
+    if check_only and has_drift(report):
+        print("⚠️  Index drift detected")
+        return 1
+    print("✅ Index reconciliation complete")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
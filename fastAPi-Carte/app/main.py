@@ -1,11 +1,17 @@
 # app/main.py - COMPLETELY CORRECTED VERSION
 from fastapi import FastAPI
-from app.database import client
+from app.database import client, database
+from app.indexes import ENSURE_INDEXES_ON_STARTUP, failures, reconcile_indexes
+from app.utils.job_queue import start_in_process_worker, stop_in_process_worker
+from app.utils.sales_rollup import schedule_initial_backfill
 from fastapi.middleware.cors import CORSMiddleware
+from app.middleware.compression_middleware import CompressionMiddleware
+from app.middleware.etag_middleware import ETagMiddleware
 from app.logging_config import get_logger, setup_logging
 from app.routes import (
     core_router, hr_router, inventory_router, auth_router,
-    payroll_router, payments_router, log_router, reports_router, analytics_router
+    payroll_router, payments_router, log_router, reports_router, analytics_router,
+    events_router
 )
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
@@ -52,12 +58,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ETags and 304s for GETs, then compression (outermost) of what goes on the wire
+app.add_middleware(ETagMiddleware)
+app.add_middleware(CompressionMiddleware)
+
 # === CRITICAL: REORDER ROUTERS ===
 # Put specific routers BEFORE generic core router to avoid conflicts
 app.include_router(reports_router)    # First - specific reports routes
 app.include_router(analytics_router)  # Second - specific analytics routes
 app.include_router(log_router)        # Third - specific log routes
 app.include_router(payments_router)   # Fourth - specific payment routes
+app.include_router(events_router)     # Order event stream (SSE)
 
 # Then include general routers
 app.include_router(core_router)       # Fifth - has generic /api/reports/{id} route
@@ -79,6 +90,24 @@ async def startup_event():
     except Exception as e:
         logger.error(f"❌ Could not connect to MongoDB: {e}")
         print(f"❌ Could not connect to MongoDB: {e}")
+        return
+
+    if ENSURE_INDEXES_ON_STARTUP:
+        try:
+            failed = failures(await reconcile_indexes(database))
+            if failed:
+                logger.error(f"❌ {len(failed)} index(es) could not be reconciled: {'; '.join(failed)}")
+        except Exception as e:
+            logger.error(f"❌ Index reconciliation failed: {e}")
+
+    # Existing orders are invisible to reports until their rollups are built
+    try:
+        await schedule_initial_backfill()
+    except Exception as e:
+        logger.error(f"❌ Could not schedule sales rollup backfill: {e}")
+
+    # Runs queued jobs unless JOB_WORKER_IN_PROCESS=false (see worker.py)
+    start_in_process_worker()
 
 @app.get("/health")
 async def health_check():
@@ -95,6 +124,7 @@ async def health_check():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await stop_in_process_worker()
     if client:
         client.close()
         logger.info("✅ MongoDB connection closed.")
@@ -0,0 +1,138 @@
+# app/middleware/compression_middleware.py
+"""
+Brotli / gzip compression for complete responses above a size threshold.
+
+Brotli is used when the client accepts it and the brotli package is
+installed, gzip otherwise. Each encoding is a different representation, so
+its ETag gets a suffix ("<etag>-br", "<etag>-gzip"); the suffix is stripped
+again from If-None-Match on the way in, so the ETag middleware and cached
+reports compare against the tag they issued, and a 304 hands back the
+client's own tag.
+"""
+import gzip
+import os
+from typing import Dict, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+HTTP_COMPRESSION_MIN_BYTES = int(os.getenv("HTTP_COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("HTTP_GZIP_LEVEL", "6"))
+# Quality 5 compresses JSON close to gzip -9 at a fraction of brotli's default cost
+BROTLI_QUALITY = int(os.getenv("HTTP_BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/plain", "text/css", "application/javascript")
+
+_SUFFIXES = {"br": "-br", "gzip": "-gzip"}
+
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        params = params.strip()
+        try:
+            quality = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def _strip_suffixes(if_none_match: str, originals: Dict[str, str]) -> str:
+    """If-None-Match with encoding suffixes removed; originals maps each stripped tag back"""
+    tags = []
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        for suffix in _SUFFIXES.values():
+            if tag.endswith(suffix + '"'):
+                stripped = tag[:-len(suffix) - 1] + '"'
+                originals[stripped.removeprefix("W/")] = tag
+                tag = stripped
+                break
+        tags.append(tag)
+    return ", ".join(tags)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = HTTP_COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = _accepted_encoding(request_headers.get("accept-encoding", ""))
+        originals: Dict[str, str] = {}
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match:
+            stripped = _strip_suffixes(if_none_match, originals)
+            if originals:
+                raw = [(name, value) for name, value in scope["headers"] if name != b"if-none-match"]
+                raw.append((b"if-none-match", stripped.encode("latin-1")))
+                scope = {**scope, "headers": raw}
+
+        start: Message = {}
+        chunks = []
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if message["status"] == 304:
+                    etag = headers.get("etag")
+                    if etag in originals:
+                        headers["ETag"] = originals[etag]
+                    headers.add_vary_header("Accept-Encoding")
+                    passthrough = True
+                    await send(message)
+                    return
+                content_type = headers.get("content-type", "")
+                if "content-length" not in headers or "content-encoding" in headers \
+                        or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            headers = MutableHeaders(raw=start["headers"])
+            if encoding and len(body) >= self.minimum_size and scope["method"] != "HEAD":
+                body = _compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                etag = headers.get("etag")
+                if etag and etag.endswith('"'):
+                    headers["ETag"] = etag[:-1] + _SUFFIXES[encoding] + '"'
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
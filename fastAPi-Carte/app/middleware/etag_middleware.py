@@ -0,0 +1,64 @@
+# app/middleware/etag_middleware.py
+"""
+Strong ETags computed from the response body, and 304 Not Modified for GETs
+whose If-None-Match names the current one.
+
+Only complete responses are buffered (those with a Content-Length), so
+streams such as the order event feed pass straight through. Responses that
+already carry an ETag (e.g. cached reports) are left to their route.
+"""
+import hashlib
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.utils.report_cache import etag_matches
+
+# Headers a 304 must not carry, since it has no body
+_BODY_HEADERS = ("content-length", "content-type", "content-encoding")
+
+
+class ETagMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start: Message = {}
+        chunks = []
+        passthrough = False
+
+        async def send_with_etag(message: Message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if message["status"] != 200 or "etag" in headers or "content-length" not in headers:
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            headers = MutableHeaders(raw=start["headers"])
+            headers["ETag"] = etag
+            if etag_matches(if_none_match, etag):
+                for name in _BODY_HEADERS:
+                    del headers[name]
+                await send({**start, "status": 304, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_with_etag)
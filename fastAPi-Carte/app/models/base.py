@@ -1,5 +1,6 @@
 # app/models/base.py - FIXED VERSION
-from typing import Optional, Any
+from functools import lru_cache
+from typing import List, Optional, Any, Tuple, Type, Union, get_args, get_origin
 from pydantic import BaseModel, Field, field_validator
 from pydantic_core import core_schema
 from bson import ObjectId
@@ -32,6 +33,114 @@ class PyObjectId(str):
     def __get_validators__(cls):
         yield cls.validate
 
+def nested_model(annotation: Any) -> Tuple[Optional[Type[BaseModel]], bool]:
+    """The model inside Optional[Model] / List[Model] annotations, and whether it is a list"""
+    origin = get_origin(annotation)
+    if origin is Union:
+        for arg in get_args(annotation):
+            model, is_list = nested_model(arg)
+            if model is not None:
+                return model, is_list
+        return None, False
+    if origin in (list, List):
+        args = get_args(annotation)
+        model, _ = nested_model(args[0]) if args else (None, False)
+        return model, model is not None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None, False
+
+def _calls_python(schema: Any) -> bool:
+    """Whether validating against a core schema calls back into Python (e.g. EmailStr)"""
+    if isinstance(schema, dict):
+        if str(schema.get("type", "")).startswith("function-"):
+            return True
+        return any(_calls_python(value) for key, value in schema.items() if key != "serialization")
+    if isinstance(schema, (list, tuple)):
+        return any(_calls_python(value) for value in schema)
+    return False
+
+class _TrustedPlan:
+    """What construct_trusted needs to know about a model class, worked out once"""
+
+    def __init__(self, model: Type[BaseModel]):
+        # Document keys (field names and aliases such as _id) mapped to field names
+        self.keys = {}
+        self.defaults = {}
+        self.nested = []
+        for name, field in model.model_fields.items():
+            self.keys[name] = name
+            if field.alias:
+                self.keys[field.alias] = name
+            if not field.is_required():
+                self.defaults[name] = (field.default, field.default_factory)
+            nested, is_list = nested_model(field.annotation)
+            if nested is not None:
+                self.nested.append((name, nested, is_list))
+        if "id" in self.keys:
+            self.keys.setdefault("_id", "id")
+        self.default_names = frozenset(self.defaults)
+        
+        # Validators may normalise values, so their models are always validated.
+        # Otherwise validation that stays inside pydantic-core is about as fast
+        # as building the model in Python; skipping it pays off when it calls
+        # back into Python.
+        decorators = model.__pydantic_decorators__
+        self.validate = (
+            bool(decorators.validators or decorators.field_validators
+                 or decorators.root_validators or decorators.model_validators)
+            or not _calls_python(model.__pydantic_core_schema__)
+            or model.__pydantic_post_init__ is not None
+            or model.__pydantic_root_model__
+        )
+
+@lru_cache(maxsize=None)
+def _trusted_plan(model: Type[BaseModel]) -> _TrustedPlan:
+    return _TrustedPlan(model)
+
+def construct_trusted(model: Type[BaseModel], data: dict):
+    """
+    Build a model from a document our own API wrote. _id becomes id and
+    ObjectIds become strings as in from_mongo, and unknown keys are dropped.
+    Where validation calls back into Python, it is skipped: missing fields
+    get their defaults, nested documents become their models and values are
+    otherwise taken as stored. Other models are validated by pydantic-core,
+    which is the cheaper path for them.
+    """
+    plan = _trusted_plan(model)
+    keys = plan.keys
+    values = {
+        keys[key]: str(value) if value.__class__ is ObjectId else value
+        for key, value in data.items() if key in keys
+    }
+    if plan.validate:
+        return model.model_validate(values)
+    fields_set = set(values)
+    
+    for name in plan.default_names - fields_set:
+        default, factory = plan.defaults[name]
+        if factory is not None:
+            values[name] = factory()
+        else:
+            # Copy mutable defaults as pydantic does, so instances don't share them
+            values[name] = default.copy() if isinstance(default, (list, dict, set)) else default
+    
+    for name, nested, is_list in plan.nested:
+        value = values.get(name)
+        if value is None:
+            continue
+        if is_list:
+            values[name] = [construct_trusted(nested, entry) if isinstance(entry, dict) else entry for entry in value]
+        elif isinstance(value, dict):
+            values[name] = construct_trusted(nested, value)
+    
+    instance = model.__new__(model)
+    object.__setattr__(instance, "__dict__", values)
+    object.__setattr__(instance, "__pydantic_fields_set__", fields_set)
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", None)
+    return instance
+
 class MongoModel(BaseModel):
     id: Optional[PyObjectId] = Field(default=None, alias="_id")
     created_at: Optional[datetime] = None 
@@ -89,4 +198,15 @@ class MongoModel(BaseModel):
         
         # Let Pydantic handle datetime conversion automatically
         # No need to convert datetime objects to strings
-        return cls(**data)
\ No newline at end of file
+        return cls(**data)
+
+    @classmethod
+    def from_trusted(cls, data: dict):
+        """
+        Convert a MongoDB document to a model instance without revalidating it.
+        Only for documents read back from our own collections, which were
+        validated when they were written.
+        """
+        if not data:
+            return None
+        return construct_trusted(cls, data)
@@ -105,6 +105,8 @@ class Order(MongoModel):
     payment_status: Optional[str] = None
     payment_method: Optional[str] = None
     stock_warnings: Optional[List[Dict[str, Any]]] = None
+    stock_reserved: Optional[bool] = None
+    reserved_stock: Optional[Dict[str, float]] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     cancellation_reason: Optional[str] = None
@@ -326,6 +328,7 @@ class Domain(MongoModel):
     is_primary: bool = False
 
 class Job(MongoModel):
+    uuid: Optional[str] = None
     queue: str
     payload: str
     attempts: int
@@ -7,6 +7,7 @@ from .payroll import router as payroll_router
 from .payments import router as payments_router
 from .reports import router as reports_router 
 from .analytics import router as analytics_router 
+from .events import router as events_router
 from app.utils.log_viewer import router as log_router
 
 __all__ = [
@@ -18,5 +19,6 @@ __all__ = [
     "payments_router",
     "reports_router", 
     "analytics_router",
+    "events_router",
     "log_router"
 ]
\ No newline at end of file
@@ -1,10 +1,13 @@
 # app/routes/analytics.py - UPDATED WITH FIXED DATABASE CALLS
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 from bson import ObjectId
 from app.database import get_collection
+from app.utils.report_cache import cached_report
 from app.utils.response_helpers import success_response, error_response
+from app.utils.sales_rollup import SALES_ROLLUP_COLLECTION, bucket_hour, load_sales_summary
+import asyncio
 from collections import defaultdict
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
@@ -19,12 +22,77 @@ def safe_objectid(id_str):
         pass
     return None
 
+def _map_totals(field: str, value: str, group_by: str = "$entry.k") -> list:
+    """$facet stages that sum one value of a rollup map (items, customers, ...) per key"""
+    return [
+        {"$project": {"entry": {"$objectToArray": {"$ifNull": [f"${field}", {}]}}}},
+        {"$unwind": "$entry"},
+        {"$group": {"_id": group_by, "total": {"$sum": f"$entry.v{value}"}}},
+    ]
+
+def _dashboard_pipeline(start_date: datetime, end_date: datetime, today_start: datetime, store_id: Optional[str]) -> list:
+    """One pass over the period's sales rollups; only the KPI numbers come back"""
+    match = {"hour": {"$gte": bucket_hour(start_date), "$lte": end_date}}
+    if store_id:
+        match["store_id"] = store_id
+    
+    return [
+        {"$match": match},
+        {"$facet": {
+            "totals": [
+                {"$group": {"_id": None, "revenue": {"$sum": "$revenue"}, "orders": {"$sum": "$orders"}}}
+            ],
+            "hourly": [
+                {"$match": {"hour": {"$gte": today_start}}},
+                {"$group": {"_id": {"$hour": "$hour"}, "revenue": {"$sum": "$revenue"}, "orders": {"$sum": "$orders"}}}
+            ],
+            "top_items": [
+                {"$project": {"entry": {"$objectToArray": {"$ifNull": ["$items", {}]}}}},
+                {"$unwind": "$entry"},
+                {"$group": {
+                    "_id": {"$ifNull": ["$entry.v.name", "Unknown"]},
+                    "quantity": {"$sum": "$entry.v.quantity"},
+                    "revenue": {"$sum": "$entry.v.revenue"}
+                }},
+                {"$sort": {"revenue": -1}},
+                {"$limit": 5}
+            ],
+            "payment_methods": _map_totals("payment_methods", "") + [{"$match": {"total": {"$ne": 0}}}],
+            "active_customers": _map_totals("customers", ".orders") + [{"$match": {"total": {"$gt": 0}}}, {"$count": "count"}],
+            "active_employees": _map_totals("employees", ".orders") + [{"$match": {"total": {"$gt": 0}}}, {"$count": "count"}],
+        }}
+    ]
+
+# Inventory KPIs computed server-side
+INVENTORY_TOTALS_PIPELINE = [
+    {"$group": {
+        "_id": None,
+        "count": {"$sum": 1},
+        "value": {"$sum": {"$multiply": [{"$ifNull": ["$quantity_in_stock", 0]}, {"$ifNull": ["$unit_cost", 0]}]}},
+        "low_stock": {"$sum": {"$cond": [
+            {"$lte": [{"$ifNull": ["$quantity_in_stock", 0]}, {"$ifNull": ["$reorder_level", 0]}]}, 1, 0
+        ]}}
+    }}
+]
+
 @router.get("/dashboard")
 async def get_dashboard_analytics(
+    request: Request,
     period: str = Query("week", regex="^(day|week|month|quarter|year)$"),
     store_id: Optional[str] = Query(None)
 ):
     """Get dashboard analytics with KPIs from real data"""
+    return await cached_report(
+        request,
+        lambda: _get_dashboard_analytics(period, store_id),
+        store_id=store_id
+    )
+
+async def _get_dashboard_analytics(
+    period: str,
+    store_id: Optional[str]
+):
+    """Compute the dashboard analytics response"""
     try:
         # Calculate date range
         end_date = datetime.utcnow()
@@ -39,107 +107,65 @@ async def get_dashboard_analytics(
         else:  # year
             start_date = end_date - timedelta(days=365)
         
-        # Build query
-        query = {
-            "created_at": {
-                "$gte": start_date,
-                "$lte": end_date
-            }
-        }
-        if store_id:
-            store_obj_id = safe_objectid(store_id)
-            if store_obj_id:
-                query["store_id"] = store_obj_id
-            else:
-                return error_response(message="Invalid store ID format", code=400)
+        if store_id and not safe_objectid(store_id):
+            return error_response(message="Invalid store ID format", code=400)
         
         # Get collections
-        orders_collection = get_collection("orders")
+        rollups_collection = get_collection(SALES_ROLLUP_COLLECTION)
         customers_collection = get_collection("customers")
         employees_collection = get_collection("employees")
         inventory_collection = get_collection("inventory_products")
         tables_collection = get_collection("tables")
         
-        # FIXED: Use await directly since LoggedCollection.find() returns a list
-        orders = await orders_collection.find(query)
-        customers = await customers_collection.find({})
-        employees = await employees_collection.find({})
-        inventory = await inventory_collection.find({})
-        tables = await tables_collection.find({})
+        # Sales KPIs are one $facet over the hourly rollups; the other collections only return counts
+        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        facets, inventory, total_customers, total_employees, active_tables = await asyncio.gather(
+            rollups_collection.aggregate(_dashboard_pipeline(start_date, end_date, today_start, store_id)),
+            inventory_collection.aggregate(INVENTORY_TOTALS_PIPELINE),
+            customers_collection.count_documents({}),
+            employees_collection.count_documents({}),
+            tables_collection.count_documents({"status": "occupied"})
+        )
+        facets = facets[0]
         
-        # Calculate KPIs with defaults for empty data
-        total_revenue = sum(o.get("total_amount", 0) or 0 for o in orders)
-        total_orders = len(orders)
+        totals = facets["totals"][0] if facets["totals"] else {}
+        total_revenue = totals.get("revenue", 0)
+        total_orders = totals.get("orders", 0)
         avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
         
+        payment_methods = {row["_id"]: row["total"] for row in facets["payment_methods"]}
+        
         # Customer metrics
-        active_customers = len(set(str(o.get("customer_id")) for o in orders if o.get("customer_id")))
-        total_customers = len(customers)
+        active_customers = facets["active_customers"][0]["count"] if facets["active_customers"] else 0
         customer_growth = (active_customers / total_customers * 100) if total_customers > 0 else 0
         
         # Employee metrics
-        active_employees = len(set(str(o.get("employee_id")) for o in orders if o.get("employee_id")))
-        total_employees = len(employees)
+        active_employees = facets["active_employees"][0]["count"] if facets["active_employees"] else 0
         
         # Inventory metrics
-        inventory_value = sum((p.get("quantity_in_stock", 0) or 0) * (p.get("unit_cost", 0) or 0) for p in inventory)
-        low_stock_items = [p for p in inventory if (p.get("quantity_in_stock", 0) or 0) <= (p.get("reorder_level", 0) or 0)]
+        inventory = inventory[0] if inventory else {}
+        inventory_count = inventory.get("count", 0)
+        inventory_value = inventory.get("value", 0)
+        low_stock_count = inventory.get("low_stock", 0)
         
-        # Calculate hourly performance for today
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_orders = [o for o in orders if (
-            isinstance(o.get("created_at"), datetime) and o["created_at"] >= today_start
-        )]
-        
-        hourly_performance = defaultdict(lambda: {"revenue": 0, "orders": 0})
-        for order in today_orders:
-            order_date = order.get("created_at")
-            if isinstance(order_date, datetime):
-                hour = order_date.hour
-            else:
-                try:
-                    hour = datetime.fromisoformat(str(order_date)).hour
-                except:
-                    hour = 0
-            
-            hourly_performance[hour]["revenue"] += order.get("total_amount", 0) or 0
-            hourly_performance[hour]["orders"] += 1
-        
-        # Format hourly data
+        # Format hourly data for today
+        hourly_performance = {row["_id"]: row for row in facets["hourly"]}
         hourly_data = []
         for hour in range(24):
-            data = hourly_performance[hour]
+            data = hourly_performance.get(hour, {})
             hourly_data.append({
                 "hour": hour,
-                "revenue": data["revenue"],
-                "orders": data["orders"]
+                "revenue": data.get("revenue", 0),
+                "orders": data.get("orders", 0)
             })
         
-        # Calculate top items
-        item_sales = defaultdict(lambda: {"quantity": 0, "revenue": 0})
-        for order in orders:
-            for item in order.get("items", []):
-                item_name = item.get("name", "Unknown")
-                item_sales[item_name]["quantity"] += item.get("quantity", 0) or 0
-                item_sales[item_name]["revenue"] += item.get("sub_total", 0) or 0
-        
-        top_items = sorted(
-            [{"name": k, **v} for k, v in item_sales.items()],
-            key=lambda x: x["revenue"],
-            reverse=True
-        )[:5]
-        
-        # Calculate payment method distribution
-        payment_methods = defaultdict(float)
-        for order in orders:
-            method = order.get("payment_method", "unknown")
-            payment_methods[method] += order.get("total_amount", 0) or 0
-        
-        # Get active tables
-        active_tables = [t for t in tables if t.get("status") == "occupied"]
+        top_items = [
+            {"name": row["_id"], "quantity": row["quantity"], "revenue": row["revenue"]}
+            for row in facets["top_items"]
+        ]
         
         # Check if we have any data
-        has_data = len(orders) > 0 or len(customers) > 0 or len(employees) > 0 or len(inventory) > 0
+        has_data = total_orders > 0 or total_customers > 0 or total_employees > 0 or inventory_count > 0
         
         # Prepare response
         response_data = {
@@ -159,12 +185,12 @@ async def get_dashboard_analytics(
                 "active_employees": active_employees,
                 "total_employees": total_employees,
                 "inventory_value": inventory_value,
-                "low_stock_items": len(low_stock_items),
-                "active_tables": len(active_tables)
+                "low_stock_items": low_stock_count,
+                "active_tables": active_tables
             },
             "hourly_performance": hourly_data,
             "top_items": top_items,
-            "payment_methods": dict(payment_methods),
+            "payment_methods": payment_methods,
             "generated_at": datetime.utcnow().isoformat(),
             "data_status": "has_data" if has_data else "empty",
             "message": "Dashboard analytics generated successfully" if has_data else "No data available for dashboard analytics"
@@ -185,77 +211,64 @@ async def get_dashboard_analytics(
 
 @router.get("/realtime")
 async def get_realtime_analytics(
+    request: Request,
     store_id: Optional[str] = Query(None)
 ):
     """Get real-time analytics for the current day from real data"""
+    return await cached_report(
+        request,
+        lambda: _get_realtime_analytics(store_id),
+        store_id=store_id
+    )
+
+async def _get_realtime_analytics(
+    store_id: Optional[str]
+):
+    """Compute the realtime analytics response"""
     try:
         # Today's date range
         today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
         today_end = datetime.utcnow()
         
-        # Build query
-        query = {
-            "created_at": {
-                "$gte": today_start,
-                "$lte": today_end
-            }
-        }
-        if store_id:
-            store_obj_id = safe_objectid(store_id)
-            if store_obj_id:
-                query["store_id"] = store_obj_id
-            else:
-                return error_response(message="Invalid store ID format", code=400)
+        if store_id and not safe_objectid(store_id):
+            return error_response(message="Invalid store ID format", code=400)
         
         # Get collections
-        orders_collection = get_collection("orders")
         tables_collection = get_collection("tables")
         
-        # FIXED: Use await directly
-        orders = await orders_collection.find(query)
-        active_tables = await tables_collection.find({"status": "occupied"})
+        # Today's hourly rollups (at most 24 per store)
+        sales = await load_sales_summary(today_start, today_end, store_id)
+        today_revenue = sales.revenue
+        today_orders = sales.orders
+        pending_orders = sales.status.get("new", 0) + sales.status.get("preparing", 0)
+        hourly_revenue = defaultdict(float)
+        hourly_orders = defaultdict(int)
+        for hour_start, totals in sales.by_hour.items():
+            if totals["orders"]:
+                hourly_revenue[hour_start.hour] += totals["revenue"]
+                hourly_orders[hour_start.hour] += totals["orders"]
+        
+        active_tables = await tables_collection.count_documents({"status": "occupied"})
         
         # Check if we have any data
-        has_data = len(orders) > 0 or len(active_tables) > 0
+        has_data = today_orders > 0 or active_tables > 0
         
         # Today's metrics
-        today_revenue = sum(o.get("total_amount", 0) or 0 for o in orders)
-        today_orders = len(orders)
         today_avg_order = today_revenue / today_orders if today_orders > 0 else 0
         
         # Current hour metrics
         current_hour = datetime.utcnow().hour
-        current_hour_orders = [
-            o for o in orders 
-            if (isinstance(o.get("created_at"), datetime) and o["created_at"].hour == current_hour)
-        ]
-        
-        current_hour_revenue = sum(o.get("total_amount", 0) or 0 for o in current_hour_orders)
-        current_hour_orders_count = len(current_hour_orders)
+        current_hour_revenue = hourly_revenue.get(current_hour, 0)
+        current_hour_orders_count = hourly_orders.get(current_hour, 0)
         
         # Calculate trend (compare to previous hour)
         previous_hour = (current_hour - 1) % 24
-        previous_hour_orders = [
-            o for o in orders 
-            if (isinstance(o.get("created_at"), datetime) and o["created_at"].hour == previous_hour)
-        ]
-        
-        previous_hour_revenue = sum(o.get("total_amount", 0) or 0 for o in previous_hour_orders)
+        previous_hour_revenue = hourly_revenue.get(previous_hour, 0)
         
         revenue_trend = "up" if current_hour_revenue > previous_hour_revenue else "down"
         revenue_change_pct = abs((current_hour_revenue - previous_hour_revenue) / previous_hour_revenue * 100) if previous_hour_revenue > 0 else 0
         
-        # Get pending orders
-        pending_orders = [o for o in orders if o.get("status") in ["new", "preparing"]]
-        
         # Calculate peak hour
-        hourly_revenue = defaultdict(float)
-        for order in orders:
-            order_date = order.get("created_at")
-            if isinstance(order_date, datetime):
-                hour = order_date.hour
-                hourly_revenue[hour] += order.get("total_amount", 0) or 0
-        
         peak_hour = max(hourly_revenue.items(), key=lambda x: x[1])[0] if hourly_revenue else None
         
         # Prepare response
@@ -274,8 +287,8 @@ async def get_realtime_analytics(
                 "trend": revenue_trend,
                 "change_percentage": round(revenue_change_pct, 1)
             },
-            "active_tables": len(active_tables),
-            "pending_orders": len(pending_orders),
+            "active_tables": active_tables,
+            "pending_orders": pending_orders,
             "peak_hour_today": peak_hour,
             "data_status": "has_data" if has_data else "empty",
             "message": "Real-time analytics generated successfully" if has_data else "No data available for real-time analytics"
@@ -322,34 +335,35 @@ async def test_analytics_data():
         inventory_collection = get_collection("inventory_products")
         tables_collection = get_collection("tables")
         
-        orders = await orders_collection.find({})
-        customers = await customers_collection.find({})
-        employees = await employees_collection.find({})
-        inventory = await inventory_collection.find({})
-        tables = await tables_collection.find({})
+        # Count server-side and fetch only the sample documents we return
+        orders_total = await orders_collection.count_documents({})
+        customers_total = await customers_collection.count_documents({})
+        employees_total = await employees_collection.count_documents({})
+        inventory_total = await inventory_collection.count_documents({})
+        tables_total = await tables_collection.count_documents({})
         
         # Check recent orders (last 30 days)
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_orders = await orders_collection.find({
+        recent_orders = await orders_collection.count_documents({
             "created_at": {"$gte": thirty_days_ago}
         })
         
         return success_response(data={
             "collection_counts": {
-                "orders_total": len(orders),
-                "orders_recent_30_days": len(recent_orders),
-                "customers": len(customers),
-                "employees": len(employees),
-                "inventory_products": len(inventory),
-                "tables": len(tables)
+                "orders_total": orders_total,
+                "orders_recent_30_days": recent_orders,
+                "customers": customers_total,
+                "employees": employees_total,
+                "inventory_products": inventory_total,
+                "tables": tables_total
             },
             "sample_data": {
-                "latest_order": orders[-1] if orders else None,
-                "oldest_order": orders[0] if orders else None,
-                "sample_customer": customers[0] if customers else None,
-                "sample_employee": employees[0] if employees else None
+                "latest_order": await orders_collection.find_one({}, sort=[("$natural", -1)]),
+                "oldest_order": await orders_collection.find_one({}, sort=[("$natural", 1)]),
+                "sample_customer": await customers_collection.find_one({}),
+                "sample_employee": await employees_collection.find_one({})
             },
-            "has_data": len(orders) > 0 or len(customers) > 0 or len(employees) > 0,
+            "has_data": orders_total > 0 or customers_total > 0 or employees_total > 0,
             "message": "Data availability check completed"
         })
         
@@ -56,7 +56,7 @@ async def _fetch_and_enrich_employee_data(employee_id: str) -> Dict[str, Any]:
             raise HTTPException(status_code=404, detail="Employee data not found")
             
         # Convert MongoDB document to Employee Pydantic model for base data
-        employee_data = Employee.from_mongo(employee)
+        employee_data = Employee.from_trusted(employee)
         employee_dict = employee_data.model_dump()
         
         # 1. Get main access role details
@@ -159,15 +159,15 @@ async def register_employee(employee: Employee):
             )
 
         # Insert the new employee using the helper function
-        from app.utils.mongo_helpers import to_mongo_dict
+        from app.utils.mongo_helpers import to_mongo_dict, inserted_document
         employee_dict = to_mongo_dict(employee)
         employee_dict["password"] = hash_password("defaultpassword")
         
         new_employee = await employees_collection.insert_one(employee_dict)
-        created_employee = await employees_collection.find_one({"_id": new_employee.inserted_id})
+        created_employee = inserted_document(employee_dict, new_employee)
         
         return success_response(
-            data=Employee.from_mongo(created_employee),
+            data=Employee.from_trusted(created_employee),
             message="Employee registered successfully",
             code=201
         )
@@ -1,5 +1,5 @@
 # app/routes/core.py - COMPLETELY UPDATED
-from fastapi import APIRouter, HTTPException, Depends, Query, status, Body
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, status, Body
 from typing import List, Optional, Dict, Any
 from app.database import get_collection
 from app.models.core import (
@@ -8,19 +8,34 @@ from app.models.core import (
 )
 from app.models.inventory import InventoryProduct
 from app.models.response import (
-    StandardResponse, FoodResponse, OrderResponse, CategoryResponse, CustomerResponse, 
+    StandardResponse, PaginatedResponse, FoodResponse, OrderResponse, CategoryResponse, CustomerResponse, 
     TableResponse, StoreResponse, PurchaseOrderResponse, 
     GoodsReceiptResponse, ReservationResponse,
     InventoryProductResponse, TenantResponse, DomainResponse, 
     SiteResponse, PaymentMethodResponse, TaxResponse, PaymentResponse, 
     BrandResponse, ContactMessageResponse, UserResponse, ReportResponse, PasswordResetResponse, PaymentAttemptResponse, JobResponse, FailedJobResponse
 )
-from app.utils.response_helpers import success_response, error_response, handle_http_exception, handle_generic_exception
-from app.utils.mongo_helpers import to_mongo_dict, to_mongo_update_dict
+from app.utils.response_helpers import success_response, error_response, cursor_paginated_response, cursor_pagination, handle_http_exception, handle_generic_exception
+from app.utils.mongo_helpers import to_mongo_dict, to_mongo_update_dict, inserted_document
+from app.utils.pagination import PageParams, page_params, fetch_page, InvalidCursorError
+from app.utils.stock_reservation import reserve_stock, release_stock
+from app.utils.bom_cache import UnknownFoodError, bom_cache
+from app.utils.idempotency import IDEMPOTENCY_HEADER, run_idempotent
+from app.utils.events import event_bus
+from app.utils.payment_processor import PAYMENT_FAILED, PAYMENT_PENDING, PROCESS_PAYMENT_ATTEMPT_JOB
+from app.utils.job_queue import enqueue
+from app.utils.order_transitions import (
+    PAYABLE_STATUSES, OrderNotFound, PaymentInProgress, TransitionRejected,
+    cancel_order_atomically, claim_order_payment, release_order_payment, update_order_fields
+)
+from app.utils.sales_rollup import record_order_change
+from app.utils.fieldsets import Fieldset, InvalidFieldsError, fields_param, resolve_fieldset, sparse_json_response
+from app.utils.fast_json import trusted_response, trusted_shape
 from bson import ObjectId
+from pymongo import ReturnDocument
+from collections import defaultdict
 from datetime import datetime
 import math
-import asyncio  # ADD THIS IMPORT
 
 router = APIRouter(prefix="/api", tags=["core"])
 
@@ -32,7 +47,7 @@ async def _create_item(collection_name: str, item_model, response_model):
         collection = get_collection(collection_name)
         item_dict = to_mongo_dict(item_model)
         result = await collection.insert_one(item_dict)
-        new_item = await collection.find_one({"_id": result.inserted_id})
+        new_item = inserted_document(item_dict, result)
         
         # Handle different model types with to_response_dict method
         if hasattr(item_model, 'to_response_dict'):
@@ -49,32 +64,88 @@ async def _create_item(collection_name: str, item_model, response_model):
     except Exception as e:
         return handle_generic_exception(e)
 
-async def _get_all_items(collection_name: str, item_model, query: dict = None):
-    """Generic function to retrieve a list of items with proper response handling"""
+def _list_item_response(item, item_model, fieldset: Optional[Fieldset] = None):
+    """Convert a raw document into the response shape used by the list helpers"""
+    if fieldset:
+        return fieldset.to_item(item)
+    
+    # Handle models with to_response_dict method
+    item_instance = item_model.from_trusted(item)
+    if hasattr(item_instance, 'to_response_dict'):
+        return item_instance.to_response_dict()
+    return item_instance
+
+async def _get_all_items(
+    collection_name: str,
+    item_model,
+    query: dict = None,
+    page: Optional[PageParams] = None,
+    fields: Optional[List[str]] = None,
+    trusted_model=None
+):
+    """
+    Generic function to retrieve a list of items with proper response handling.
+    Passing the response model as trusted_model serves full documents through
+    the fast JSON path, read in raw BSON batches, instead of building and
+    validating a model for each one.
+    """
     try:
+        try:
+            fieldset = resolve_fieldset(item_model, fields)
+        except InvalidFieldsError as e:
+            return error_response(message=str(e), code=400)
+        shape = trusted_shape(trusted_model) if trusted_model and not fieldset else None
+        projector = fieldset or shape
+        
         collection = get_collection(collection_name)
-        items_data = await collection.find(query or {})
-        items = []
-        for item in items_data:
-            # Handle models with to_response_dict method
-            item_instance = item_model.from_mongo(item)
-            if hasattr(item_instance, 'to_response_dict'):
-                items.append(item_instance.to_response_dict())
-            else:
-                items.append(item_instance)
-        return success_response(data=items)
+        if page and page.enabled:
+            find_kwargs = {"projection": projector.project(page.order_by)} if projector else {}
+            try:
+                documents, next_cursor = await fetch_page(collection, query, page, **find_kwargs)
+            except InvalidCursorError as e:
+                return error_response(message=str(e), code=400)
+            if shape:
+                return trusted_response(
+                    [shape.to_item(item) for item in documents],
+                    pagination=cursor_pagination(page.page_size, next_cursor, page.order_by)
+                )
+            items = [_list_item_response(item, item_model, fieldset) for item in documents]
+            response = cursor_paginated_response(
+                data=items, limit=page.page_size, next_cursor=next_cursor, order_by=page.order_by, in_place=True
+            )
+        else:
+            find_kwargs = {"projection": projector.project()} if projector else {}
+            items = []
+            if shape:
+                async for batch in collection.iter_find_batches(query or {}, **find_kwargs):
+                    items.extend(shape.to_item(item) for item in batch)
+                return trusted_response(items)
+            async for item in collection.iter_find(query or {}, **find_kwargs):
+                items.append(_list_item_response(item, item_model, fieldset))
+            response = success_response(data=items, in_place=True)
+        
+        return sparse_json_response(response) if fieldset else response
     except Exception as e:
         return handle_generic_exception(e)
 
-async def _get_item_by_id(collection_name: str, item_id: str, item_model):
+async def _get_item_by_id(collection_name: str, item_id: str, item_model, fields: Optional[List[str]] = None):
     """Generic function to retrieve a single item by ID with proper response handling"""
+    try:
+        fieldset = resolve_fieldset(item_model, fields)
+    except InvalidFieldsError as e:
+        return error_response(message=str(e), code=400)
+    
     try:
         collection = get_collection(collection_name)
-        item = await collection.find_one({"_id": ObjectId(item_id)})
+        find_kwargs = {"projection": fieldset.project()} if fieldset else {}
+        item = await collection.find_one({"_id": ObjectId(item_id)}, **find_kwargs)
     except Exception:
         return error_response(message=f"Invalid ID format for {collection_name}", code=400)
         
     if item:
+        if fieldset:
+            return sparse_json_response(success_response(data=fieldset.to_item(item)))
+        
         # Handle models with to_response_dict method
         item_instance = item_model.from_mongo(item)
         if hasattr(item_instance, 'to_response_dict'):
@@ -89,13 +160,13 @@ async def _update_item(collection_name: str, item_id: str, item_model, response_
         collection = get_collection(collection_name)
         item_dict = to_mongo_update_dict(item_model, exclude_unset=True)
         
-        result = await collection.update_one(
-            {"_id": ObjectId(item_id)}, {"$set": item_dict}
+        updated_item = await collection.find_one_and_update(
+            {"_id": ObjectId(item_id)}, {"$set": item_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0 and result.matched_count == 0:
+        if updated_item is None:
             return error_response(message=f"{collection_name[:-1].capitalize()} not found", code=404)
             
-        updated_item = await collection.find_one({"_id": ObjectId(item_id)})
         
         # Handle models with to_response_dict method
         item_instance = item_model.__class__.from_mongo(updated_item)
@@ -129,24 +200,32 @@ async def _delete_item(collection_name: str, item_id: str):
 # --- Food Endpoints ---
 # --------------------------
 @router.get("/foods", response_model=StandardResponse[List[FoodResponse]])
-async def get_foods(store_id: Optional[str] = Query(None)):
-    return await _get_all_items("foods", Food, {"store_id": store_id} if store_id else {})
+async def get_foods(store_id: Optional[str] = Query(None), fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_all_items(
+        "foods", Food, {"store_id": store_id} if store_id else {}, fields=fields, trusted_model=FoodResponse
+    )
 
 @router.get("/foods/{food_id}", response_model=StandardResponse[FoodResponse])
-async def get_food(food_id: str):
-    return await _get_item_by_id("foods", food_id, Food)
+async def get_food(food_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("foods", food_id, Food, fields=fields)
 
 @router.post("/foods", response_model=StandardResponse[FoodResponse])
 async def create_food(food: Food):
-    return await _create_item("foods", food, FoodResponse)
+    response = await _create_item("foods", food, FoodResponse)
+    bom_cache.invalidate()
+    return response
 
 @router.put("/foods/{food_id}", response_model=StandardResponse[FoodResponse])
 async def update_food(food_id: str, food: Food):
-    return await _update_item("foods", food_id, food, FoodResponse)
+    response = await _update_item("foods", food_id, food, FoodResponse)
+    bom_cache.invalidate(food_id)
+    return response
 
 @router.delete("/foods/{food_id}", response_model=StandardResponse[dict])
 async def delete_food(food_id: str):
-    return await _delete_item("foods", food_id)
+    response = await _delete_item("foods", food_id)
+    bom_cache.invalidate(food_id)
+    return response
 
 # --------------------------
 # --- Orders Endpoints ---
@@ -239,47 +318,77 @@ async def get_payment_attempt_by_order(order_id: str):
     except Exception as e:
         return handle_generic_exception(e)
 
+@router.get("/payment_attempts/{attempt_id}/status", response_model=StandardResponse[dict])
+async def get_payment_attempt_status(attempt_id: str):
+    """Poll the state of a payment attempt started by /orders/{order_id}/process_payment"""
+    try:
+        collection = get_collection("payment_attempts")
+        attempt = await collection.find_one(
+            {"_id": ObjectId(attempt_id)},
+            projection={"order_id": 1, "status": 1, "payment_id": 1, "completed_at": 1, "cancellation_reason": 1}
+        )
+    except Exception:
+        return error_response(message="Invalid ID format", code=400)
+    
+    if not attempt:
+        return error_response(message="Payment attempt not found", code=404)
+    return success_response(data={
+        "payment_attempt_id": attempt_id,
+        "order_id": attempt.get("order_id"),
+        "status": attempt.get("status"),
+        "payment_id": attempt.get("payment_id"),
+        "completed_at": attempt.get("completed_at"),
+        "error": attempt.get("cancellation_reason")
+    })
+
 @router.get("/orders/{order_id}", response_model=StandardResponse[OrderResponse])
 async def get_order(order_id: str):
     """Get a single order with all related data"""
     try:
         orders_collection = get_collection("orders")
-        order = await orders_collection.find_one({"_id": ObjectId(order_id)})
         
-        if not order:
+        # Fetch the order with its payment attempts and payments in one round trip
+        results = await orders_collection.aggregate([
+            {"$match": {"_id": ObjectId(order_id)}},
+            {"$lookup": {
+                "from": "payment_attempts",
+                "let": {"order_id": {"$toString": "$_id"}},
+                "pipeline": [{"$match": {"$expr": {"$eq": ["$order_id", "$$order_id"]}}}],
+                "as": "payment_attempts"
+            }},
+            {"$lookup": {
+                "from": "payments",
+                "let": {"order_id": {"$toString": "$_id"}},
+                "pipeline": [{"$match": {"$expr": {"$eq": ["$order_id", "$$order_id"]}}}],
+                "as": "payments"
+            }}
+        ])
+        
+        if not results:
             return error_response(message="Order not found", code=404)
         
-        # Get related payment attempts
-        payment_attempts_collection = get_collection("payment_attempts")
-        payment_attempts = await payment_attempts_collection.find({"order_id": order_id}).to_list()
-        
-        # Get related payments
-        payments_collection = get_collection("payments")
-        payments = await payments_collection.find({"order_id": order_id}).to_list()
-        
-        order_instance = Order.from_mongo(order)
-        order_dict = order_instance.model_dump()
-        
-        # Add related data
-        if payment_attempts:
-            order_dict["payment_attempts"] = [
-                PaymentAttempt.from_mongo(pa).model_dump() 
-                for pa in payment_attempts
-            ]
-        
-        if payments:
-            order_dict["payments"] = [
-                Payment.from_mongo(p).model_dump() 
-                for p in payments
-            ]
+        # The response model validates the raw document, so no from_mongo/model_dump round trip here
+        order = results[0]
+        for related in ("payment_attempts", "payments"):
+            if not order.get(related):
+                order.pop(related, None)
         
-        return success_response(data=order_dict)
+        return success_response(data=order, in_place=True)
     except Exception:
         return error_response(message="Invalid ID format", code=400)
 
 @router.post("/orders", response_model=StandardResponse[OrderResponse])
-async def create_order(order: Order):
+async def create_order(
+    order: Order,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
+):
     """Create a new order with inventory management"""
+    return await run_idempotent(
+        idempotency_key, "orders:create", lambda: _create_order(order), payload=order
+    )
+
+async def _create_order(order: Order):
+    """Create the order, reserve its stock and return the response"""
     try:
         # Set defaults for missing required fields
         if order.subtotal_amount is None:
@@ -303,7 +412,6 @@ async def create_order(order: Order):
             order.notes = ""
             
         orders_collection = get_collection("orders")
-        inventory_collection = get_collection("inventory_products")
         
         # Generate order ID
         order_id = str(ObjectId())
@@ -330,51 +438,37 @@ async def create_order(order: Order):
         order_dict["created_at"] = datetime.utcnow().isoformat()
         order_dict["updated_at"] = datetime.utcnow().isoformat()
         
-        # Check inventory and collect stock warnings
-        stock_warnings = []
-        inventory_updates = []
-        
+        # Total each inventory product's requirement across all items from the cached BOMs
+        try:
+            boms = await bom_cache.get_many(item.food_id for item in order.items)
+        except UnknownFoodError as e:
+            return error_response(
+                message=f"Order contains unknown food items: {', '.join(e.food_ids)}",
+                code=400,
+                details={"food_ids": e.food_ids}
+            )
+        required_quantities = defaultdict(float)
         for item in order.items:
-            foods_collection = get_collection("foods")
-            food = await foods_collection.find_one({"_id": ObjectId(item.food_id)})
+            for product_id, quantity_used in boms[item.food_id]:
+                required_quantities[product_id] += quantity_used * item.quantity
+        
+        # Reserve all-or-nothing; the stock check happens inside each conditional update
+        reservation = await reserve_stock(dict(required_quantities))
+        stock_warnings = reservation.shortages
+        try:
+            order_dict["stock_reserved"] = bool(reservation.reserved)
+            order_dict["reserved_stock"] = reservation.reserved
+            if not reservation.succeeded:
+                order_dict["status"] = "pending_stock"
             
-            if food and food.get("recipes"):
-                for recipe in food["recipes"]:
-                    inventory_product = await inventory_collection.find_one(
-                        {"_id": ObjectId(recipe["inventory_product_id"])}
-                    )
-                    if inventory_product:
-                        required_quantity = recipe["quantity_used"] * item.quantity
-                        current_stock = inventory_product.get("quantity_in_stock", 0)
-                        
-                        if current_stock < required_quantity:
-                            stock_warnings.append({
-                                "product_id": recipe["inventory_product_id"],
-                                "product_name": inventory_product.get("name", "Unknown"),
-                                "required": required_quantity,
-                                "available": current_stock,
-                                "shortage": required_quantity - current_stock
-                            })
-                        
-                        # Schedule inventory update
-                        inventory_updates.append({
-                            "product_id": recipe["inventory_product_id"],
-                            "quantity_change": -required_quantity
-                        })
-        
-        # Apply inventory updates if no critical shortages
-        if not any(warning["shortage"] > 0 for warning in stock_warnings if warning.get("shortage")):
-            for update in inventory_updates:
-                await inventory_collection.update_one(
-                    {"_id": ObjectId(update["product_id"])},
-                    {"$inc": {"quantity_in_stock": update["quantity_change"]}}
-                )
-        else:
-            order_dict["status"] = "pending_stock"
-        
-        # Insert order
-        result = await orders_collection.insert_one(order_dict)
-        new_order = await orders_collection.find_one({"_id": result.inserted_id})
+            # Insert order
+            result = await orders_collection.insert_one(order_dict)
+        except BaseException:
+            # Until the order is stored nothing can restore its stock, so give it back now
+            await release_stock(reservation.reserved)
+            raise
+        new_order = inserted_document(order_dict, result)
+        await record_order_change(None, new_order)
         order_instance = Order.from_mongo(new_order)
         
         # Add stock warnings to response
@@ -382,6 +476,8 @@ async def create_order(order: Order):
         if stock_warnings:
             order_data["stock_warnings"] = stock_warnings
         
+        await event_bus.publish("order.created", order_data)
+        
         return success_response(
             data=order_data,
             message="Order created successfully",
@@ -397,63 +493,34 @@ async def update_order(
 ):
     """Update an order with validation"""
     try:
-        orders_collection = get_collection("orders")
-        
-        # Check if order exists
-        existing_order = await orders_collection.find_one({"_id": ObjectId(order_id)})
-        if not existing_order:
-            return error_response(message="Order not found", code=404)
-        
-        # Validate status transitions
-        current_status = existing_order.get("status")
-        new_status = order_update.get("status")
-        
-        if new_status and new_status != current_status:
-            valid_transitions = {
-                "new": ["preparing", "cancelled"],
-                "preparing": ["ready", "served", "cancelled"],
-                "ready": ["served", "cancelled"],
-                "served": ["paid", "cancelled"],
-                "paid": [],
-                "cancelled": []
-            }
-            
-            if current_status not in valid_transitions:
-                return error_response(
-                    message=f"Cannot transition from status '{current_status}'",
-                    code=400
-                )
-            
-            if new_status not in valid_transitions.get(current_status, []):
-                return error_response(
-                    message=f"Invalid status transition from '{current_status}' to '{new_status}'",
-                    code=400
-                )
-        
-        # Update order
-        update_data = {
-            **order_update,
-            "updated_at": datetime.utcnow().isoformat()
-        }
-        
-        result = await orders_collection.update_one(
-            {"_id": ObjectId(order_id)},
-            {"$set": update_data}
-        )
-        
-        if result.modified_count == 0:
-            return error_response(message="No changes made", code=400)
-            
-        updated_order = await orders_collection.find_one({"_id": ObjectId(order_id)})
-        order_instance = Order.from_mongo(updated_order)
-        
-        return success_response(
-            data=order_instance.model_dump(),
-            message="Order updated successfully"
+        # Status check and write happen in one conditional update
+        order, updated_order = await update_order_fields(order_id, order_update)
+    except OrderNotFound:
+        return error_response(message="Order not found", code=404)
+    except TransitionRejected as e:
+        return error_response(
+            message=e.message,
+            code=409,
+            details={"current_status": e.current_status, "requested_status": order_update.get("status")}
         )
     except Exception:
         return error_response(message="Invalid ID format", code=400)
 
+    await record_order_change(order, updated_order)
+    order_instance = Order.from_mongo(updated_order)
+
+    previous_status = order.get("status")
+    await event_bus.publish(
+        "order.status_changed" if updated_order.get("status") != previous_status else "order.updated",
+        updated_order,
+        previous_status=previous_status
+    )
+
+    return success_response(
+        data=order_instance.model_dump(),
+        message="Order updated successfully"
+    )
+
 @router.delete("/orders/{order_id}", response_model=StandardResponse[dict])
 async def delete_order(order_id: str, force: bool = Query(False)):
     """Delete an order (with optional force delete)"""
@@ -483,6 +550,8 @@ async def delete_order(order_id: str, force: bool = Query(False)):
         if result.deleted_count == 0:
             return error_response(message="Order deletion failed", code=500)
         
+        await record_order_change(order, None)
+        
         return success_response(
             data=None,
             message="Order deleted successfully"
@@ -493,13 +562,22 @@ async def delete_order(order_id: str, force: bool = Query(False)):
 @router.post("/orders/{order_id}/process_payment", response_model=StandardResponse[dict])
 async def process_order_payment(
     order_id: str,
-    payment_data: Dict[str, Any] = Body(...)
+    payment_data: Dict[str, Any] = Body(...),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
 ):
-    """Process payment for an order"""
+    """Start payment for an order; the attempt is processed by a queued job"""
+    return await run_idempotent(
+        idempotency_key,
+        f"orders:{order_id}:process_payment",
+        lambda: _process_order_payment(order_id, payment_data),
+        payload=payment_data
+    )
+
+async def _process_order_payment(order_id: str, payment_data: Dict[str, Any]):
+    """Record a pending payment attempt and hand it to the payment processor"""
     try:
         orders_collection = get_collection("orders")
         payment_attempts_collection = get_collection("payment_attempts")
-        payments_collection = get_collection("payments")
         
         # Get order
         order = await orders_collection.find_one({"_id": ObjectId(order_id)})
@@ -507,7 +585,7 @@ async def process_order_payment(
             return error_response(message="Order not found", code=404)
         
         # Check if order is ready for payment
-        if order.get("status") not in ["served", "ready"]:
+        if order.get("status") not in PAYABLE_STATUSES:
             return error_response(
                 message=f"Order must be 'served' or 'ready' for payment. Current status: {order.get('status')}",
                 code=400
@@ -519,79 +597,67 @@ async def process_order_payment(
             payment_gateway=payment_data.get("payment_gateway", "halo"),
             amount=order.get("total_amount", 0),
             reference=f"PAY-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
-            status="pending",
+            status=PAYMENT_PENDING,
             payment_data=payment_data,
             created_at=datetime.utcnow().isoformat()
         )
         
         attempt_dict = to_mongo_dict(payment_attempt)
         attempt_result = await payment_attempts_collection.insert_one(attempt_dict)
+        attempt_id = str(attempt_result.inserted_id)
         
-        # Simulate payment processing
-        await asyncio.sleep(1)  # Use asyncio.sleep instead of sleep
-        
-        # Update payment attempt status
-        is_successful = payment_data.get("simulate_success", True)
-        if is_successful:
-            # Create payment record
-            payment = Payment(
-                order_id=order_id,
-                payment_method_id=payment_data.get("payment_method_id", ""),
-                amount=order.get("total_amount", 0),
-                payment_date=datetime.utcnow().isoformat(),
-                transaction_id=payment_data.get("transaction_id", f"TXN-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"),
-                status="completed"
-            )
-            
-            payment_dict = to_mongo_dict(payment)
-            await payments_collection.insert_one(payment_dict)
-            
-            # Update order
-            await orders_collection.update_one(
-                {"_id": ObjectId(order_id)},
-                {
-                    "$set": {
-                        "status": "paid",
-                        "payment_status": "paid",
-                        "payment_method": payment_data.get("payment_method"),
-                        "updated_at": datetime.utcnow().isoformat()
-                    }
-                }
-            )
-            
-            # Update payment attempt
+        # One charge at a time: the attempt exists before it claims the order,
+        # so a claim never points at an attempt that isn't there
+        try:
+            await claim_order_payment(order_id, attempt_id)
+        except (OrderNotFound, TransitionRejected, PaymentInProgress) as e:
             await payment_attempts_collection.update_one(
-                {"_id": attempt_result.inserted_id},
-                {
-                    "$set": {
-                        "status": "completed",
-                        "completed_at": datetime.utcnow().isoformat()
-                    }
-                }
-            )
-            
-            return success_response(
-                data={"payment_id": str(payment_dict["_id"])},
-                message="Payment processed successfully"
+                {"_id": attempt_result.inserted_id, "status": PAYMENT_PENDING},
+                {"$set": {
+                    "status": PAYMENT_FAILED,
+                    "cancelled_at": datetime.utcnow().isoformat(),
+                    "cancellation_reason": getattr(e, "message", "Order not found")
+                }}
             )
-        else:
-            # Payment failed
-            await payment_attempts_collection.update_one(
-                {"_id": attempt_result.inserted_id},
-                {
-                    "$set": {
-                        "status": "failed",
-                        "cancelled_at": datetime.utcnow().isoformat(),
-                        "cancellation_reason": payment_data.get("error_message", "Payment failed")
-                    }
+            if isinstance(e, OrderNotFound):
+                return error_response(message="Order not found", code=404)
+            if isinstance(e, TransitionRejected):
+                return error_response(message=e.message, code=400)
+            return error_response(
+                message=e.message,
+                code=409,
+                details={
+                    "payment_attempt_id": e.payment_attempt_id,
+                    "status_url": f"/api/payment_attempts/{e.payment_attempt_id}/status"
                 }
             )
-            
-            return error_response(
-                message="Payment processing failed",
-                code=400,
-                details={"payment_attempt_id": str(attempt_result.inserted_id)}
+        
+        try:
+            await enqueue(PROCESS_PAYMENT_ATTEMPT_JOB, {"attempt_id": attempt_id})
+        except BaseException as e:
+            # Nothing would ever process the attempt: settle it and free the order for a retry
+            await payment_attempts_collection.update_one(
+                {"_id": attempt_result.inserted_id, "status": PAYMENT_PENDING},
+                {"$set": {
+                    "status": PAYMENT_FAILED,
+                    "cancelled_at": datetime.utcnow().isoformat(),
+                    "cancellation_reason": f"Could not queue payment: {e}"
+                }}
             )
+            await release_order_payment(order_id, attempt_id)
+            if not isinstance(e, Exception):
+                raise
+            return error_response(message="Payment could not be queued, please retry", code=503)
+        
+        return success_response(
+            data={
+                "payment_attempt_id": attempt_id,
+                "status": PAYMENT_PENDING,
+                "status_url": f"/api/payment_attempts/{attempt_id}/status"
+            },
+            message="Payment accepted for processing",
+            code=202
+        )
             
     except Exception as e:
         return handle_generic_exception(e)
@@ -618,60 +684,53 @@ async def cancel_order(
 ):
     """Cancel an order"""
     try:
-        orders_collection = get_collection("orders")
-        
-        # Check if order exists
-        order = await orders_collection.find_one({"_id": ObjectId(order_id)})
-        if not order:
-            return error_response(message="Order not found", code=404)
-        
-        # Check if order can be cancelled
-        current_status = order.get("status")
-        if current_status in ["paid", "completed"]:
-            return error_response(
-                message=f"Cannot cancel order with status '{current_status}'",
-                code=400
-            )
-        
-        # Update order status
-        result = await orders_collection.update_one(
-            {"_id": ObjectId(order_id)},
-            {
-                "$set": {
-                    "status": "cancelled",
-                    "updated_at": datetime.utcnow().isoformat(),
-                    "cancellation_reason": reason
-                }
-            }
-        )
-        
-        if result.modified_count == 0:
-            return error_response(message="Order cancellation failed", code=500)
-        
-        # Restore inventory if needed
-        if current_status not in ["new", "cancelled"]:
-            await restore_order_inventory(order_id)
-        
-        updated_order = await orders_collection.find_one({"_id": ObjectId(order_id)})
-        order_instance = Order.from_mongo(updated_order)
-        
-        return success_response(
-            data=order_instance.model_dump(),
-            message="Order cancelled successfully"
-        )
+        # Only unsettled orders match, so two concurrent cancels cannot both succeed
+        order, updated_order = await cancel_order_atomically(order_id, reason)
+    except OrderNotFound:
+        return error_response(message="Order not found", code=404)
+    except TransitionRejected as e:
+        return error_response(message=e.message, code=409, details={"current_status": e.current_status})
     except Exception:
         return error_response(message="Invalid ID format", code=400)
 
+    current_status = order.get("status")
+
+    # Restore inventory if stock was reserved for this order
+    if "stock_reserved" in order:
+        if order.get("stock_reserved"):
+            await restore_order_inventory(order_id)
+    elif current_status not in ["new", "cancelled"]:
+        await restore_order_inventory(order_id)
+
+    await record_order_change(order, updated_order)
+    order_instance = Order.from_mongo(updated_order)
+
+    await event_bus.publish("order.cancelled", updated_order, previous_status=current_status)
+
+    return success_response(
+        data=order_instance.model_dump(),
+        message="Order cancelled successfully"
+    )
+
 # --------------------------
 # --- Orders Endpoints ---
 # --------------------------
-@router.get("/orders", response_model=StandardResponse[List[OrderResponse]])
+@router.get("/orders", response_model=PaginatedResponse[List[OrderResponse]])
 async def get_orders(
     store_id: Optional[str] = Query(None),
-    status: Optional[str] = Query(None)
+    status: Optional[str] = Query(None),
+    page: PageParams = Depends(page_params),
+    fields: Optional[List[str]] = Depends(fields_param)
 ):
     """Get orders - custom implementation to fix datetime issue"""
     try:
+        try:
+            fieldset = resolve_fieldset(Order, fields)
+        except InvalidFieldsError as e:
+            return error_response(message=str(e), code=400)
+        # Full orders skip response_model validation via the fast JSON path
+        projector = fieldset or trusted_shape(OrderResponse)
+        
         collection = get_collection("orders")
         
         # Build query
@@ -680,23 +739,33 @@ async def get_orders(
             query["store_id"] = store_id
         if status:
             query["status"] = status
-            
-        items_data = await collection.find(query)
-        items = []
-        for item in items_data:
-            # Convert MongoDB document to dictionary
-            item_dict = dict(item)
-            item_dict["id"] = str(item_dict.pop("_id"))
-            
-            # Convert datetime fields to ISO strings
-            for field in ['created_at', 'updated_at']:
-                if field in item_dict and item_dict[field]:
-                    if isinstance(item_dict[field], datetime):
-                        item_dict[field] = item_dict[field].isoformat()
-            
-            items.append(item_dict)
         
-        return success_response(data=items)
+        if page.enabled:
+            try:
+                items_data, next_cursor = await fetch_page(
+                    collection, query, page, projection=projector.project(page.order_by)
+                )
+            except InvalidCursorError as e:
+                return error_response(message=str(e), code=400)
+            items = [projector.to_item(item) for item in items_data]
+            if not fieldset:
+                return trusted_response(items, pagination=cursor_pagination(page.page_size, next_cursor, page.order_by))
+            response = cursor_paginated_response(
+                data=items,
+                limit=page.page_size,
+                next_cursor=next_cursor,
+                order_by=page.order_by,
+                in_place=True
+            )
+        else:
+            items = []
+            async for batch in collection.iter_find_batches(query, projection=projector.project()):
+                items.extend(projector.to_item(item) for item in batch)
+            if not fieldset:
+                return trusted_response(items, pagination=None)
+            response = success_response(data=items, in_place=True)
+        
+        return sparse_json_response(response)
     except Exception as e:
         return handle_generic_exception(e)
 
@@ -705,23 +774,30 @@ async def restore_order_inventory(order_id: str):
     """Restore inventory quantities for a cancelled order"""
     try:
         orders_collection = get_collection("orders")
-        inventory_collection = get_collection("inventory_products")
         
         order = await orders_collection.find_one({"_id": ObjectId(order_id)})
         if not order:
             return
         
-        # Restore inventory for each item
+        # Claim the release first so concurrent cancellations cannot restock twice
+        if "stock_reserved" in order:
+            claimed = await orders_collection.update_one(
+                {"_id": ObjectId(order_id), "stock_reserved": True},
+                {"$set": {"stock_reserved": False}}
+            )
+            if claimed.modified_count == 0:
+                return
+            await release_stock(order.get("reserved_stock") or {})
+            return
+        
+        # Orders created before reservations were recorded: restore from the recipes
+        # Foods deleted since the order was placed have no recipe left to restore from
+        boms = await bom_cache.get_many((item["food_id"] for item in order.get("items", [])), strict=False)
+        restored_quantities = defaultdict(float)
         for item in order.get("items", []):
-            foods_collection = get_collection("foods")
-            food = await foods_collection.find_one({"_id": ObjectId(item["food_id"])})
-            
-            if food and food.get("recipes"):
-                for recipe in food["recipes"]:
-                    await inventory_collection.update_one(
-                        {"_id": ObjectId(recipe["inventory_product_id"])},
-                        {"$inc": {"quantity_in_stock": recipe["quantity_used"] * item["quantity"]}}
-                    )
+            for product_id, quantity_used in boms.get(item["food_id"], ()):
+                restored_quantities[product_id] += quantity_used * item["quantity"]
+        await release_stock(restored_quantities)
     except Exception as e:
         print(f"Error restoring inventory for order {order_id}: {e}")
 
@@ -750,13 +826,13 @@ async def orders_id_options():
 # --- Categories Endpoints ---
 # --------------------------
 @router.get("/categories", response_model=StandardResponse[List[CategoryResponse]])
-async def get_categories(store_id: Optional[str] = Query(None)):
+async def get_categories(store_id: Optional[str] = Query(None), fields: Optional[List[str]] = Depends(fields_param)):
     query = {"store_id": store_id} if store_id else {}
-    return await _get_all_items("categories", Category, query)
+    return await _get_all_items("categories", Category, query, fields=fields, trusted_model=CategoryResponse)
 
 @router.get("/categories/{category_id}", response_model=StandardResponse[CategoryResponse])
-async def get_category(category_id: str):
-    return await _get_item_by_id("categories", category_id, Category)
+async def get_category(category_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("categories", category_id, Category, fields=fields)
 
 @router.post("/categories", response_model=StandardResponse[CategoryResponse])
 async def create_category(category: Category):
@@ -773,14 +849,18 @@ async def delete_category(category_id: str):
 # --------------------------
 # --- Customers Endpoints ---
 # --------------------------
-@router.get("/customers", response_model=StandardResponse[List[CustomerResponse]])
-async def get_customers(store_id: Optional[str] = Query(None)):
+@router.get("/customers", response_model=PaginatedResponse[List[CustomerResponse]])
+async def get_customers(
+    store_id: Optional[str] = Query(None),
+    page: PageParams = Depends(page_params),
+    fields: Optional[List[str]] = Depends(fields_param)
+):
     query = {"store_id": store_id} if store_id else {}
-    return await _get_all_items("customers", Customer, query)
+    return await _get_all_items("customers", Customer, query, page, fields=fields)
 
 @router.get("/customers/{customer_id}", response_model=StandardResponse[CustomerResponse])
-async def get_customer(customer_id: str):
-    return await _get_item_by_id("customers", customer_id, Customer)
+async def get_customer(customer_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("customers", customer_id, Customer, fields=fields)
 
 @router.post("/customers", response_model=StandardResponse[CustomerResponse])
 async def create_customer(customer: Customer):
@@ -798,13 +878,13 @@ async def delete_customer(customer_id: str):
 # --- Tables Endpoints ---
 # --------------------------
 @router.get("/tables", response_model=StandardResponse[List[TableResponse]])
-async def get_tables(store_id: Optional[str] = Query(None)):
+async def get_tables(store_id: Optional[str] = Query(None), fields: Optional[List[str]] = Depends(fields_param)):
     query = {"store_id": store_id} if store_id else {}
-    return await _get_all_items("tables", Table, query)
+    return await _get_all_items("tables", Table, query, fields=fields, trusted_model=TableResponse)
 
 @router.get("/tables/{table_id}", response_model=StandardResponse[TableResponse])
-async def get_table(table_id: str):
-    return await _get_item_by_id("tables", table_id, Table)
+async def get_table(table_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("tables", table_id, Table, fields=fields)
 
 @router.post("/tables", response_model=StandardResponse[TableResponse])
 async def create_table(table: Table):
@@ -822,12 +902,12 @@ async def delete_table(table_id: str):
 # --- Stores Endpoints ---
 # --------------------------
 @router.get("/stores", response_model=StandardResponse[List[StoreResponse]])
-async def get_stores():
-    return await _get_all_items("stores", Store)
+async def get_stores(fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_all_items("stores", Store, fields=fields)
 
 @router.get("/stores/{store_id}", response_model=StandardResponse[StoreResponse])
-async def get_store(store_id: str):
-    return await _get_item_by_id("stores", store_id, Store)
+async def get_store(store_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("stores", store_id, Store, fields=fields)
 
 @router.post("/stores", response_model=StandardResponse[StoreResponse])
 async def create_store(store: Store):
@@ -845,12 +925,12 @@ async def delete_store(store_id: str):
 # --- Purchase Orders Endpoints ---
 # --------------------------
 @router.get("/purchase_orders", response_model=StandardResponse[List[PurchaseOrderResponse]])
-async def get_purchase_orders():
-    return await _get_all_items("purchase_orders", PurchaseOrder)
+async def get_purchase_orders(fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_all_items("purchase_orders", PurchaseOrder, fields=fields)
 
 @router.get("/purchase_orders/{po_id}", response_model=StandardResponse[PurchaseOrderResponse])
-async def get_purchase_order(po_id: str):
-    return await _get_item_by_id("purchase_orders", po_id, PurchaseOrder)
+async def get_purchase_order(po_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("purchase_orders", po_id, PurchaseOrder, fields=fields)
 
 @router.post("/purchase_orders", response_model=StandardResponse[PurchaseOrderResponse])
 async def create_purchase_order(po: PurchaseOrder):
@@ -868,12 +948,12 @@ async def delete_purchase_order(po_id: str):
 # --- Goods Receipts Endpoints ---
 # --------------------------
 @router.get("/goods_receipts", response_model=StandardResponse[List[GoodsReceiptResponse]])
-async def get_goods_receipts():
-    return await _get_all_items("goods_receipts", GoodsReceipt)
+async def get_goods_receipts(fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_all_items("goods_receipts", GoodsReceipt, fields=fields)
 
 @router.get("/goods_receipts/{gr_id}", response_model=StandardResponse[GoodsReceiptResponse])
-async def get_goods_receipt(gr_id: str):
-    return await _get_item_by_id("goods_receipts", gr_id, GoodsReceipt)
+async def get_goods_receipt(gr_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("goods_receipts", gr_id, GoodsReceipt, fields=fields)
 
 @router.post("/goods_receipts", response_model=StandardResponse[GoodsReceiptResponse])
 async def create_goods_receipt(gr: GoodsReceipt):
@@ -900,7 +980,7 @@ async def create_goods_receipt(gr: GoodsReceipt):
         gr_dict = to_mongo_dict(gr)
         
         result = await gr_collection.insert_one(gr_dict)
-        new_gr = await gr_collection.find_one({"_id": result.inserted_id})
+        new_gr = inserted_document(gr_dict, result)
         return success_response(
             data=GoodsReceipt.from_mongo(new_gr),
             message="Goods receipt created successfully",
@@ -921,13 +1001,13 @@ async def delete_goods_receipt(gr_id: str):
 # --- Reservations Endpoints ---
 # --------------------------
 @router.get("/reservations", response_model=StandardResponse[List[ReservationResponse]])
-async def get_reservations(store_id: Optional[str] = Query(None)):
+async def get_reservations(store_id: Optional[str] = Query(None), fields: Optional[List[str]] = Depends(fields_param)):
     query = {"store_id": store_id} if store_id else {}
-    return await _get_all_items("reservations", Reservation, query)
+    return await _get_all_items("reservations", Reservation, query, fields=fields)
 
 @router.get("/reservations/{reservation_id}", response_model=StandardResponse[ReservationResponse])
-async def get_reservation(reservation_id: str):
-    return await _get_item_by_id("reservations", reservation_id, Reservation)
+async def get_reservation(reservation_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("reservations", reservation_id, Reservation, fields=fields)
 
 @router.post("/reservations", response_model=StandardResponse[ReservationResponse])
 async def create_reservation(reservation: Reservation):
@@ -947,12 +1027,12 @@ async def delete_reservation(reservation_id: str):
 
 # Brands Endpoints
 @router.get("/brands", response_model=StandardResponse[List[BrandResponse]])
-async def get_brands():
-    return await _get_all_items("brands", Brand)
+async def get_brands(fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_all_items("brands", Brand, fields=fields)
 
 @router.get("/brands/{brand_id}", response_model=StandardResponse[BrandResponse])
-async def get_brand(brand_id: str):
-    return await _get_item_by_id("brands", brand_id, Brand)
+async def get_brand(brand_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("brands", brand_id, Brand, fields=fields)
 
 @router.post("/brands", response_model=StandardResponse[BrandResponse])
 async def create_brand(brand: Brand):
@@ -968,12 +1048,12 @@ async def delete_brand(brand_id: str):
 
 # Contact Messages Endpoints
 @router.get("/contact_messages", response_model=StandardResponse[List[ContactMessageResponse]])
-async def get_contact_messages():
-    return await _get_all_items("contact_messages", ContactMessage)
+async def get_contact_messages(fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_all_items("contact_messages", ContactMessage, fields=fields)
 
 @router.get("/contact_messages/{message_id}", response_model=StandardResponse[ContactMessageResponse])
-async def get_contact_message(message_id: str):
-    return await _get_item_by_id("contact_messages", message_id, ContactMessage)
+async def get_contact_message(message_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("contact_messages", message_id, ContactMessage, fields=fields)
 
 @router.post("/contact_messages", response_model=StandardResponse[ContactMessageResponse])
 async def create_contact_message(message: ContactMessage):
@@ -985,13 +1065,13 @@ async def delete_contact_message(message_id: str):
 
 # Domains Endpoints
 @router.get("/domains", response_model=StandardResponse[List[DomainResponse]])
-async def get_domains(tenant_id: Optional[str] = Query(None)):
+async def get_domains(tenant_id: Optional[str] = Query(None), fields: Optional[List[str]] = Depends(fields_param)):
     query = {"tenant_id": tenant_id} if tenant_id else {}
-    return await _get_all_items("domains", Domain, query)
+    return await _get_all_items("domains", Domain, query, fields=fields)
 
 @router.get("/domains/{domain_id}", response_model=StandardResponse[DomainResponse])
-async def get_domain(domain_id: str):
-    return await _get_item_by_id("domains", domain_id, Domain)
+async def get_domain(domain_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("domains", domain_id, Domain, fields=fields)
 
 @router.post("/domains", response_model=StandardResponse[DomainResponse])
 async def create_domain(domain: Domain):
@@ -1007,13 +1087,13 @@ async def delete_domain(domain_id: str):
 
 # Payments Endpoints
 @router.get("/payments", response_model=StandardResponse[List[PaymentResponse]])
-async def get_payments(order_id: Optional[str] = Query(None)):
+async def get_payments(order_id: Optional[str] = Query(None), fields: Optional[List[str]] = Depends(fields_param)):
     query = {"order_id": order_id} if order_id else {}
-    return await _get_all_items("payments", Payment, query)
+    return await _get_all_items("payments", Payment, query, fields=fields)
 
 @router.get("/payments/{payment_id}", response_model=StandardResponse[PaymentResponse])
-async def get_payment(payment_id: str):
-    return await _get_item_by_id("payments", payment_id, Payment)
+async def get_payment(payment_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("payments", payment_id, Payment, fields=fields)
 
 @router.post("/payments", response_model=StandardResponse[PaymentResponse])
 async def create_payment(payment: Payment):
@@ -1029,13 +1109,13 @@ async def delete_payment(payment_id: str):
 
 # Payment Methods Endpoints
 @router.get("/payment_methods", response_model=StandardResponse[List[PaymentMethodResponse]])
-async def get_payment_methods(store_id: Optional[str] = Query(None)):
+async def get_payment_methods(store_id: Optional[str] = Query(None), fields: Optional[List[str]] = Depends(fields_param)):
     query = {"store_id": store_id} if store_id else {}
-    return await _get_all_items("payment_methods", PaymentMethod, query)
+    return await _get_all_items("payment_methods", PaymentMethod, query, fields=fields)
 
 @router.get("/payment_methods/{method_id}", response_model=StandardResponse[PaymentMethodResponse])
-async def get_payment_method(method_id: str):
-    return await _get_item_by_id("payment_methods", method_id, PaymentMethod)
+async def get_payment_method(method_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("payment_methods", method_id, PaymentMethod, fields=fields)
 
 @router.post("/payment_methods", response_model=StandardResponse[PaymentMethodResponse])
 async def create_payment_method(method: PaymentMethod):
@@ -1051,13 +1131,13 @@ async def delete_payment_method(method_id: str):
 
 # Sites Endpoints
 @router.get("/sites", response_model=StandardResponse[List[SiteResponse]])
-async def get_sites(store_id: Optional[str] = Query(None)):
+async def get_sites(store_id: Optional[str] = Query(None), fields: Optional[List[str]] = Depends(fields_param)):
     query = {"store_id": store_id} if store_id else {}
-    return await _get_all_items("sites", Site, query)
+    return await _get_all_items("sites", Site, query, fields=fields)
 
 @router.get("/sites/{site_id}", response_model=StandardResponse[SiteResponse])
-async def get_site(site_id: str):
-    return await _get_item_by_id("sites", site_id, Site)
+async def get_site(site_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("sites", site_id, Site, fields=fields)
 
 @router.post("/sites", response_model=StandardResponse[SiteResponse])
 async def create_site(site: Site):
@@ -1073,13 +1153,13 @@ async def delete_site(site_id: str):
 
 # Taxes Endpoints
 @router.get("/taxes", response_model=StandardResponse[List[TaxResponse]])
-async def get_taxes(store_id: Optional[str] = Query(None)):
+async def get_taxes(store_id: Optional[str] = Query(None), fields: Optional[List[str]] = Depends(fields_param)):
     query = {"store_id": store_id} if store_id else {}
-    return await _get_all_items("taxes", Tax, query)
+    return await _get_all_items("taxes", Tax, query, fields=fields)
 
 @router.get("/taxes/{tax_id}", response_model=StandardResponse[TaxResponse])
-async def get_tax(tax_id: str):
-    return await _get_item_by_id("taxes", tax_id, Tax)
+async def get_tax(tax_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("taxes", tax_id, Tax, fields=fields)
 
 @router.post("/taxes", response_model=StandardResponse[TaxResponse])
 async def create_tax(tax: Tax):
@@ -1096,9 +1176,9 @@ async def delete_tax(tax_id: str):
 # ==================== TENANT ENDPOINTS ====================
 
 @router.get("/tenants", response_model=StandardResponse[List[TenantResponse]])
-async def get_tenants():
+async def get_tenants(fields: Optional[List[str]] = Depends(fields_param)):
     """Get all tenants (authenticated)"""
-    return await _get_all_items("tenants", Tenant)
+    return await _get_all_items("tenants", Tenant, fields=fields)
 
 @router.get("/tenants/{tenant_id}", response_model=StandardResponse[TenantResponse])
 async def get_tenant(tenant_id: str):
@@ -1208,16 +1288,14 @@ async def update_tenant(tenant_id: str, tenant_update: dict):
         # Always set updated_at
         update_data["updated_at"] = datetime.utcnow().isoformat()
         
-        result = await collection.update_one(
+        updated_tenant = await collection.find_one_and_update(
             {"_id": ObjectId(tenant_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0 and result.matched_count == 0:
+        if updated_tenant is None:
             return error_response(message="No changes made", code=400)
-            
-        # Return updated tenant
-        updated_tenant = await collection.find_one({"_id": ObjectId(tenant_id)})
         
         response_data = {
             "id": str(updated_tenant["_id"]),
@@ -1279,16 +1357,14 @@ async def update_tenant_settings(tenant_id: str, settings_update: dict):
             "updated_at": datetime.utcnow().isoformat()
         }
         
-        result = await collection.update_one(
+        updated_tenant = await collection.find_one_and_update(
             {"_id": ObjectId(tenant_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0 and result.matched_count == 0:
+        if updated_tenant is None:
             return error_response(message="No changes made", code=400)
-            
-        # Return updated tenant
-        updated_tenant = await collection.find_one({"_id": ObjectId(tenant_id)})
         
         response_data = {
             "id": str(updated_tenant["_id"]),
@@ -1350,11 +1426,19 @@ async def get_pending_purchase_orders():
 async def get_order_item(order_item_id: str):
     try:
         orders_collection = get_collection("orders")
-        orders = await orders_collection.find()
-        for order in orders:
-            for item in order.get("items", []):
-                if str(item.get("id")) == order_item_id:
-                    return success_response(data=item)
+        
+        # Item ids are normally strings, but older orders may hold ObjectIds
+        candidate_ids = [order_item_id]
+        if ObjectId.is_valid(order_item_id):
+            candidate_ids.append(ObjectId(order_item_id))
+        
+        # Uses the items.id multikey index; the positional projection returns only the matching item
+        order = await orders_collection.find_one(
+            {"items.id": {"$in": candidate_ids}},
+            projection={"items.$": 1}
+        )
+        if order and order.get("items"):
+            return success_response(data=order["items"][0])
         return error_response(message="Order item not found", code=404)
     except Exception as e:
         return handle_generic_exception(e)
@@ -1381,18 +1465,16 @@ async def get_store_foods(store_id: Optional[str] = Query(None)):
 @router.get("/recipes", response_model=StandardResponse[List[dict]])
 async def get_recipes(food_id: Optional[str] = Query(None)):
     try:
-        foods_collection = get_collection("foods")
         recipes = []
-        foods = await foods_collection.find()
-        for food in foods:
-            if food.get("recipes"):
-                for recipe in food["recipes"]:
-                    if not food_id or str(food["_id"]) == food_id:
-                        recipes.append({
-                            **recipe,
-                            "food_id": str(food["_id"]),
-                            "id": recipe.get("id", str(food["_id"]) + "_" + recipe.get("inventory_product_id", ""))
-                        })
+        foods = await bom_cache.all_recipes()
+        for current_food_id, food_recipes in foods.items():
+            if not food_id or current_food_id == food_id:
+                for recipe in food_recipes:
+                    recipes.append({
+                        **recipe,
+                        "food_id": current_food_id,
+                        "id": recipe.get("id", current_food_id + "_" + recipe.get("inventory_product_id", ""))
+                    })
         return success_response(data=recipes)
     except Exception as e:
         return handle_generic_exception(e)
@@ -1449,7 +1531,7 @@ async def create_user(user: User):
         user_dict = to_mongo_dict(user)
         
         result = await users_collection.insert_one(user_dict)
-        new_user = await users_collection.find_one({"_id": result.inserted_id})
+        new_user = inserted_document(user_dict, result)
         
         # Remove password from response
         user_data = User.from_mongo(new_user)
@@ -1471,13 +1553,13 @@ async def update_user(user_id: str, user: User):
         users_collection = get_collection("users")
         user_dict = to_mongo_update_dict(user, exclude_unset=True)
         
-        result = await users_collection.update_one(
-            {"_id": ObjectId(user_id)}, {"$set": user_dict}
+        updated_user = await users_collection.find_one_and_update(
+            {"_id": ObjectId(user_id)}, {"$set": user_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0 and result.matched_count == 0:
+        if updated_user is None:
             return error_response(message="User not found", code=404)
             
-        updated_user = await users_collection.find_one({"_id": ObjectId(user_id)})
         
         # Remove password from response
         user_data = User.from_mongo(updated_user)
@@ -1500,12 +1582,12 @@ async def delete_user(user_id: str):
 # --- Password Resets Endpoints ---
 # --------------------------
 @router.get("/password_resets", response_model=StandardResponse[List[PasswordResetResponse]])
-async def get_password_resets():
-    return await _get_all_items("password_resets", PasswordReset)
+async def get_password_resets(fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_all_items("password_resets", PasswordReset, fields=fields)
 
 @router.get("/password_resets/{reset_id}", response_model=StandardResponse[PasswordResetResponse])
-async def get_password_reset(reset_id: str):
-    return await _get_item_by_id("password_resets", reset_id, PasswordReset)
+async def get_password_reset(reset_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("password_resets", reset_id, PasswordReset, fields=fields)
 
 @router.post("/password_resets", response_model=StandardResponse[PasswordResetResponse])
 async def create_password_reset(reset: PasswordReset):
@@ -1519,12 +1601,12 @@ async def delete_password_reset(reset_id: str):
 # --- Jobs Endpoints ---
 # --------------------------
 @router.get("/jobs", response_model=StandardResponse[List[JobResponse]])
-async def get_jobs():
-    return await _get_all_items("jobs", Job)
+async def get_jobs(fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_all_items("jobs", Job, fields=fields)
 
 @router.get("/jobs/{job_id}", response_model=StandardResponse[JobResponse])
-async def get_job(job_id: str):
-    return await _get_item_by_id("jobs", job_id, Job)
+async def get_job(job_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("jobs", job_id, Job, fields=fields)
 
 @router.post("/jobs", response_model=StandardResponse[JobResponse])
 async def create_job(job: Job):
@@ -1538,12 +1620,12 @@ async def delete_job(job_id: str):
 # --- Failed Jobs Endpoints ---
 # --------------------------
 @router.get("/failed_jobs", response_model=StandardResponse[List[FailedJobResponse]])
-async def get_failed_jobs():
-    return await _get_all_items("failed_jobs", FailedJob)
+async def get_failed_jobs(fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_all_items("failed_jobs", FailedJob, fields=fields)
 
 @router.get("/failed_jobs/{job_id}", response_model=StandardResponse[FailedJobResponse])
-async def get_failed_job(job_id: str):
-    return await _get_item_by_id("failed_jobs", job_id, FailedJob)
+async def get_failed_job(job_id: str, fields: Optional[List[str]] = Depends(fields_param)):
+    return await _get_item_by_id("failed_jobs", job_id, FailedJob, fields=fields)
 
 @router.post("/failed_jobs", response_model=StandardResponse[FailedJobResponse])
 async def create_failed_job(job: FailedJob):
@@ -1699,8 +1781,20 @@ async def halo_status():
     )
 
 @router.post("/halo/transaction", response_model=StandardResponse[dict])
-async def process_halo_transaction(transaction_data: Dict[str, Any] = Body(...)):
+async def process_halo_transaction(
+    transaction_data: Dict[str, Any] = Body(...),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
+):
     """Process Halo payment transaction"""
+    return await run_idempotent(
+        idempotency_key,
+        "halo:transaction",
+        lambda: _process_halo_transaction(transaction_data),
+        payload=transaction_data
+    )
+
+async def _process_halo_transaction(transaction_data: Dict[str, Any]):
+    """Build the Halo transaction response"""
     try:
         # Extract transaction data
         amount = transaction_data.get("amount", 0)
@@ -1729,20 +1823,22 @@ async def process_halo_transaction(transaction_data: Dict[str, Any] = Body(...))
         if order_id != "new-order":
             try:
                 orders_collection = get_collection("orders")
-                # Try to find and update the order
-                order = await orders_collection.find_one({"_id": ObjectId(order_id)})
+                # Try to update the order, keeping the previous version for the sales rollup
+                payment_update = {
+                    "payment_status": "paid",
+                    "payment_method": transaction_data.get("payment_method", "card"),
+                    "updated_at": datetime.utcnow().isoformat()
+                }
+                order = await orders_collection.find_one_and_update(
+                    {"_id": ObjectId(order_id)},
+                    {"$set": payment_update},
+                    return_document=ReturnDocument.BEFORE
+                )
                 if order:
-                    await orders_collection.update_one(
-                        {"_id": ObjectId(order_id)},
-                        {
-                            "$set": {
-                                "payment_status": "paid",
-                                "payment_method": transaction_data.get("payment_method", "card"),
-                                "updated_at": datetime.utcnow().isoformat()
-                            }
-                        }
-                    )
+                    paid_order = {**order, **payment_update}
+                    await record_order_change(order, paid_order)
                     response_data["order_updated"] = True
+                    await event_bus.publish("order.paid", paid_order)
             except:
                 # If order not found or invalid ID, continue anyway
                 response_data["order_updated"] = False
@@ -0,0 +1,35 @@
+# app/routes/events.py - SERVER-SENT EVENTS FOR ORDER UPDATES
+import json
+from typing import Optional
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from app.utils.events import event_bus
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+# Seconds between keep-alive comments so proxies don't close idle streams
+HEARTBEAT_SECONDS = 15
+
+
+@router.get("/orders")
+async def stream_order_events(request: Request, store_id: Optional[str] = Query(None)):
+    """Stream order created/updated/cancelled/paid events for a store (or all stores) as SSE"""
+    subscription = event_bus.subscribe(store_id)
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,22 +1,46 @@
 # app/routes/hr.py - COMPLETELY UPDATED
-from fastapi import APIRouter, HTTPException, Query, status, Body
+from fastapi import APIRouter, HTTPException, Depends, Query, status, Body
 from typing import List, Optional, Any  # Add Any to the imports
 from app.database import get_collection
 from app.models.hr import Employee, Shift, TimesheetEntry, Payroll, AccessRole, JobTitle, PayrollSettings, Timesheet, Department
 from app.models.response import (
-    StandardResponse, EmployeeResponse, ShiftResponse, TimesheetEntryResponse, PayrollResponse, 
+    StandardResponse, PaginatedResponse, EmployeeResponse, ShiftResponse, TimesheetEntryResponse, PayrollResponse, 
     AccessRoleResponse, JobTitleResponse, PayrollSettingsResponse, TimesheetResponse,
     DepartmentResponse, PayrollPreviewResponse
 )
-from app.utils.response_helpers import success_response, error_response, handle_http_exception, handle_generic_exception
-from app.utils.mongo_helpers import to_mongo_dict, to_mongo_update_dict
+from app.utils.response_helpers import success_response, error_response, cursor_paginated_response, handle_http_exception, handle_generic_exception
+from app.utils.mongo_helpers import to_mongo_dict, to_mongo_update_dict, inserted_document
+from app.utils.pagination import PageParams, page_params, fetch_page, InvalidCursorError
+from app.utils.job_queue import enqueue, job_handler
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime, timedelta
-import asyncio
 
 
 RECURRENCE_WEEKS = 52 # Create shifts for one year
 
+
+async def _list_documents(collection_name: str, item_model, query: dict, page: PageParams):
+    """List documents as item_model instances, cursor-paginated when the client asks for it"""
+    collection = get_collection(collection_name)
+    if page.enabled:
+        try:
+            documents, next_cursor = await fetch_page(collection, query, page)
+        except InvalidCursorError as e:
+            return error_response(message=str(e), code=400)
+        return cursor_paginated_response(
+            data=[item_model.from_trusted(document) for document in documents],
+            limit=page.page_size,
+            next_cursor=next_cursor,
+            order_by=page.order_by,
+            in_place=True
+        )
+    
+    items = []
+    async for document in collection.iter_find(query):
+        items.append(item_model.from_trusted(document))
+    return success_response(data=items, in_place=True)
+
 async def _process_shift_recurrence(shift_data: dict, original_shift_id: ObjectId):
     """
     Helper to process recurring shifts by creating future shift instances.
@@ -115,7 +139,7 @@ async def create_department(department: Department):
         department_dict = to_mongo_dict(department)
         
         result = await departments_collection.insert_one(department_dict)
-        new_department = await departments_collection.find_one({"_id": result.inserted_id})
+        new_department = inserted_document(department_dict, result)
         return success_response(
             data=Department.from_mongo(new_department),
             message="Department created successfully",
@@ -131,13 +155,13 @@ async def update_department(department_id: str, department: Department):
         departments_collection = get_collection("departments")
         department_dict = to_mongo_update_dict(department, exclude_unset=True)
         
-        result = await departments_collection.update_one(
-            {"_id": ObjectId(department_id)}, {"$set": department_dict}
+        updated_department = await departments_collection.find_one_and_update(
+            {"_id": ObjectId(department_id)}, {"$set": department_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0 and result.matched_count == 0:
+        if updated_department is None:
             return error_response(message="Department not found", code=404)
         
-        updated_department = await departments_collection.find_one({"_id": ObjectId(department_id)})
         return success_response(
             data=Department.from_mongo(updated_department),
             message="Department updated successfully"
@@ -198,7 +222,7 @@ async def create_employee(employee: Employee):
         employee_dict = to_mongo_dict(employee)
         
         result = await employees_collection.insert_one(employee_dict)
-        new_employee = await employees_collection.find_one({"_id": result.inserted_id})
+        new_employee = inserted_document(employee_dict, result)
         return success_response(
             data=Employee.from_mongo(new_employee),
             message="Employee created successfully",
@@ -214,13 +238,13 @@ async def update_employee(employee_id: str, employee: Employee):
         employees_collection = get_collection("employees")
         employee_dict = to_mongo_update_dict(employee, exclude_unset=True)
         
-        result = await employees_collection.update_one(
-            {"_id": ObjectId(employee_id)}, {"$set": employee_dict}
+        updated_employee = await employees_collection.find_one_and_update(
+            {"_id": ObjectId(employee_id)}, {"$set": employee_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0 and result.matched_count == 0:
+        if updated_employee is None:
             return error_response(message="Employee not found", code=404)
         
-        updated_employee = await employees_collection.find_one({"_id": ObjectId(employee_id)})
         return success_response(
             data=Employee.from_mongo(updated_employee),
             message="Employee updated successfully"
@@ -280,7 +304,7 @@ async def create_access_role(role: AccessRole):
         role_dict = to_mongo_dict(role)
         
         result = await access_roles_collection.insert_one(role_dict)
-        new_role = await access_roles_collection.find_one({"_id": result.inserted_id})
+        new_role = inserted_document(role_dict, result)
         return success_response(
             data=AccessRole.from_mongo(new_role),
             message="Access role created successfully",
@@ -296,13 +320,13 @@ async def update_access_role(role_id: str, role: AccessRole):
         access_roles_collection = get_collection("access_roles")
         role_dict = to_mongo_update_dict(role, exclude_unset=True)
         
-        result = await access_roles_collection.update_one(
-            {"_id": ObjectId(role_id)}, {"$set": role_dict}
+        updated_role = await access_roles_collection.find_one_and_update(
+            {"_id": ObjectId(role_id)}, {"$set": role_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0 and result.matched_count == 0:
+        if updated_role is None:
             return error_response(message="Access role not found", code=404)
         
-        updated_role = await access_roles_collection.find_one({"_id": ObjectId(role_id)})
         return success_response(
             data=AccessRole.from_mongo(updated_role),
             message="Access role updated successfully"
@@ -363,7 +387,7 @@ async def create_job_title(title: JobTitle):
         title_dict = to_mongo_dict(title)
         
         result = await job_titles_collection.insert_one(title_dict)
-        new_title = await job_titles_collection.find_one({"_id": result.inserted_id})
+        new_title = inserted_document(title_dict, result)
         return success_response(
             data=JobTitle.from_mongo(new_title),
             message="Job title created successfully",
@@ -379,13 +403,13 @@ async def update_job_title(title_id: str, title: JobTitle):
         job_titles_collection = get_collection("job_titles")
         title_dict = to_mongo_update_dict(title, exclude_unset=True)
         
-        result = await job_titles_collection.update_one(
-            {"_id": ObjectId(title_id)}, {"$set": title_dict}
+        updated_title = await job_titles_collection.find_one_and_update(
+            {"_id": ObjectId(title_id)}, {"$set": title_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0 and result.matched_count == 0:
+        if updated_title is None:
             return error_response(message="Job title not found", code=404)
         
-        updated_title = await job_titles_collection.find_one({"_id": ObjectId(title_id)})
         return success_response(
             data=JobTitle.from_mongo(updated_title),
             message="Job title updated successfully"
@@ -411,23 +435,21 @@ async def delete_job_title(title_id: str):
 # -----------------
 # Shifts endpoints
 # -----------------
-@router.get("/shifts", response_model=StandardResponse[List[ShiftResponse]])
-async def get_shifts(employee_id: Optional[str] = Query(None), active: Optional[bool] = Query(None)):
+@router.get("/shifts", response_model=PaginatedResponse[List[ShiftResponse]])
+async def get_shifts(
+    employee_id: Optional[str] = Query(None),
+    active: Optional[bool] = Query(None),
+    page: PageParams = Depends(page_params)
+):
     """Retrieve a list of shifts, optionally filtered by employee_id or active status."""
     try:
-        shifts_collection = get_collection("shifts")
         query = {}
         if employee_id:
             query["employee_id"] = employee_id
         if active is not None:
             query["active"] = active
             
-        shifts = []
-        # FIXED: Use await and iterate
-        shift_docs = await shifts_collection.find(query)
-        for shift in shift_docs:
-            shifts.append(Shift.from_mongo(shift))
-        return success_response(data=shifts)
+        return await _list_documents("shifts", Shift, query, page)
     except Exception as e:
         return handle_generic_exception(e)
 
@@ -452,7 +474,7 @@ async def _create_item(collection_name: str, item: Any, response_model: Any):
         print(f"🔍 [Backend] Inserting into {collection_name}: {item_dict}")
         
         result = await collection.insert_one(item_dict)
-        new_item = await collection.find_one({"_id": result.inserted_id})
+        new_item = inserted_document(item_dict, result)
         
         print(f"🔍 [Backend] Inserted item: {new_item}")
         
@@ -461,19 +483,14 @@ async def _create_item(collection_name: str, item: Any, response_model: Any):
             shift_id = result.inserted_id
             
             # Set recurring_series_id for the original shift
-            await collection.update_one(
+            new_item = await collection.find_one_and_update(
                 {"_id": shift_id},
-                {"$set": {"recurring_series_id": str(shift_id)}}
+                {"$set": {"recurring_series_id": str(shift_id)}},
+                return_document=ReturnDocument.AFTER
             )
             
-            # Fetch updated document
-            new_item = await collection.find_one({"_id": shift_id})
-            
-            # Process recurrence for future shifts
+            # Process recurrence for future shifts (only inserts new shifts, the original is unchanged)
             await _process_shift_recurrence(new_item, shift_id)
-            
-            # Fetch final document
-            new_item = await collection.find_one({"_id": shift_id})
         
         return success_response(
             data=response_model.from_mongo(new_item),
@@ -523,7 +540,7 @@ async def create_shift(shift: Shift):
         print(f"🔍 [Backend] Inserting shift: {shift_dict}")
         
         result = await shifts_collection.insert_one(shift_dict)
-        new_shift_doc = await shifts_collection.find_one({"_id": result.inserted_id})
+        new_shift_doc = inserted_document(shift_dict, result)
         
         # Convert to Shift model for response
         new_shift = Shift.from_mongo(new_shift_doc)
@@ -535,20 +552,16 @@ async def create_shift(shift: Shift):
             original_shift_id = result.inserted_id
             
             # Set the series ID on the original shift
-            await shifts_collection.update_one(
+            updated_doc = await shifts_collection.find_one_and_update(
                 {"_id": original_shift_id},
-                {"$set": {"recurring_series_id": str(original_shift_id)}}
+                {"$set": {"recurring_series_id": str(original_shift_id)}},
+                return_document=ReturnDocument.AFTER
             )
             
-            # Fetch the updated doc with the correct 'created_at' and 'updated_at' for recurrence
-            updated_doc = await shifts_collection.find_one({"_id": original_shift_id})
-            
-            # Process recurrence
+            # Process recurrence (only inserts new shifts, the original is unchanged)
             await _process_shift_recurrence(updated_doc, original_shift_id)
             
-            # Re-fetch the shift to get the updated data
-            new_shift_doc = await shifts_collection.find_one({"_id": result.inserted_id})
-            new_shift = Shift.from_mongo(new_shift_doc)
+            new_shift = Shift.from_mongo(updated_doc)
 
         # Return the shift data in the standard response format
         return success_response(
@@ -580,31 +593,32 @@ async def update_shift(shift_id: str, shift: Shift):
         print(f"🔍 [Backend] Updating shift {shift_id} with data: {update_data}")
 
         # 1. Perform the update on the specific shift instance
-        result = await shifts_collection.update_one(
+        updated_doc = await shifts_collection.find_one_and_update(
             {"_id": ObjectId(shift_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
         )
 
-        if result.modified_count == 0 and result.matched_count == 0:
+        if updated_doc is None:
             return error_response(message="Shift not found", code=404)
 
         # 2. Handle Recurrence Logic Changes
-        updated_doc = await shifts_collection.find_one({"_id": ObjectId(shift_id)})
         series_id = updated_doc.get("recurring_series_id") or shift_id
         
         # A. If recurrence is kept or newly added, re-process future shifts
         if updated_doc.get("recurring"):
             # Ensure the recurring_series_id is set if it was a new recurrence
             if not updated_doc.get("recurring_series_id"):
-                 await shifts_collection.update_one(
+                 updated_doc = await shifts_collection.find_one_and_update(
                     {"_id": ObjectId(shift_id)},
-                    {"$set": {"recurring_series_id": shift_id}}
+                    {"$set": {"recurring_series_id": shift_id}},
+                    return_document=ReturnDocument.AFTER
                 )
-                 updated_doc = await shifts_collection.find_one({"_id": ObjectId(shift_id)})
                  series_id = shift_id
 
-            # Delete all *future* recurring shifts in the series
+            # Delete all *future* recurring shifts in the series (never the shift being edited)
             await shifts_collection.delete_many({
+                "_id": {"$ne": ObjectId(shift_id)},
                 "recurring_series_id": series_id,
                 "start": {"$gt": old_shift_doc.get("start")} 
             })
@@ -616,18 +630,13 @@ async def update_shift(shift_id: str, shift: Shift):
         elif old_shift.recurring and not updated_doc.get("recurring"):
             # Delete all future recurring shifts in the series
             await shifts_collection.delete_many({
+                "_id": {"$ne": ObjectId(shift_id)},
                 "recurring_series_id": series_id,
                 "start": {"$gt": old_shift_doc.get("start")}
             })
             
-        # 3. Retrieve and return the FINAL updated shift
-        final_doc = await shifts_collection.find_one({"_id": ObjectId(shift_id)})
-        
-        if not final_doc:
-            return error_response(message="Shift not found after update", code=404)
-            
-        # Convert to Shift model and return in standard response
-        final_shift = Shift.from_mongo(final_doc)
+        # 3. Return the updated shift (recurrence processing only touches other shifts)
+        final_shift = Shift.from_mongo(updated_doc)
         
         return success_response(
             data=final_shift,
@@ -641,14 +650,14 @@ async def update_shift_status(shift_id: str, active: bool):
     """Update the active status of a shift by ID."""
     try:
         shifts_collection = get_collection("shifts")
-        result = await shifts_collection.update_one(
+        updated_shift = await shifts_collection.find_one_and_update(
             {"_id": ObjectId(shift_id)}, 
-            {"$set": {"active": active, "updated_at": datetime.utcnow().isoformat()}}
+            {"$set": {"active": active, "updated_at": datetime.utcnow().isoformat()}},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0:
+        if updated_shift is None:
             return error_response(message="Shift not found", code=404)
         
-        updated_shift = await shifts_collection.find_one({"_id": ObjectId(shift_id)})
         return success_response(
             data=Shift.from_mongo(updated_shift),
             message="Shift status updated successfully"
@@ -686,15 +695,15 @@ async def delete_shift(shift_id: str, delete_all: bool = Query(False, descriptio
 # -----------------
 # Timesheet Entries endpoints
 # -----------------
-@router.get("/timesheet_entries", response_model=StandardResponse[List[TimesheetEntryResponse]])
+@router.get("/timesheet_entries", response_model=PaginatedResponse[List[TimesheetEntryResponse]])
 async def get_timesheet_entries(
     employee_id: Optional[str] = Query(None),
     date_from: Optional[str] = Query(None),
-    date_to: Optional[str] = Query(None)
+    date_to: Optional[str] = Query(None),
+    page: PageParams = Depends(page_params)
 ):
     """Retrieve timesheet entries, optionally filtered by employee_id or date range."""
     try:
-        ts_collection = get_collection("timesheet_entries")
         query = {}
         if employee_id:
             query["employee_id"] = employee_id
@@ -710,12 +719,7 @@ async def get_timesheet_entries(
             except ValueError:
                 return error_response(message="Invalid date format. Use ISO 8601 format.", code=400)
         
-        entries = []
-        # FIXED: Use await and iterate
-        entry_docs = await ts_collection.find(query)
-        for entry in entry_docs:
-            entries.append(TimesheetEntry.from_mongo(entry))
-        return success_response(data=entries)
+        return await _list_documents("timesheet_entries", TimesheetEntry, query, page)
     except Exception as e:
         return handle_generic_exception(e)
 
@@ -739,7 +743,7 @@ async def create_timesheet_entry(entry: TimesheetEntry):
         entry_dict = to_mongo_dict(entry)
         
         result = await ts_collection.insert_one(entry_dict)
-        new_entry = await ts_collection.find_one({"_id": result.inserted_id})
+        new_entry = inserted_document(entry_dict, result)
         return success_response(
             data=TimesheetEntry.from_mongo(new_entry),
             message="Timesheet entry created successfully",
@@ -765,13 +769,13 @@ async def update_timesheet_entry(entry_id: str, entry: TimesheetEntry):
             except (ValueError, TypeError):
                 entry_dict["duration_minutes"] = 0
         
-        result = await ts_collection.update_one(
-            {"_id": ObjectId(entry_id)}, {"$set": entry_dict}
+        updated_entry = await ts_collection.find_one_and_update(
+            {"_id": ObjectId(entry_id)}, {"$set": entry_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0 and result.matched_count == 0:
+        if updated_entry is None:
             return error_response(message="Timesheet entry not found", code=404)
         
-        updated_entry = await ts_collection.find_one({"_id": ObjectId(entry_id)})
         return success_response(
             data=TimesheetEntry.from_mongo(updated_entry),
             message="Timesheet entry updated successfully"
@@ -822,7 +826,7 @@ async def clock_in(employee_id: str, store_id: str):
         }
         
         result = await ts_collection.insert_one(entry_dict)
-        new_entry = await ts_collection.find_one({"_id": result.inserted_id})
+        new_entry = inserted_document(entry_dict, result)
         return success_response(
             data=TimesheetEntry.from_mongo(new_entry),
             message="Clock in successful",
@@ -866,15 +870,14 @@ async def clock_out(entry_id: str):
             "updated_at": datetime.utcnow().isoformat()
         }
 
-        result = await ts_collection.update_one(
+        updated_entry = await ts_collection.find_one_and_update(
             {"_id": ObjectId(entry_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
         )
-        
-        if result.modified_count == 0:
+        if updated_entry is None:
             return error_response(message="Timesheet entry not found or no changes made", code=404)
         
-        updated_entry = await ts_collection.find_one({"_id": ObjectId(entry_id)})
         return success_response(
             data=TimesheetEntry.from_mongo(updated_entry),
             message="Clock out successful"
@@ -885,22 +888,24 @@ async def clock_out(entry_id: str):
 # -----------------
 # Payroll endpoints
 # -----------------
-@router.get("/payroll", response_model=StandardResponse[List[PayrollResponse]])
+@router.get("/payroll", response_model=PaginatedResponse[List[PayrollResponse]])
 async def get_payroll_entries(
     employee_id: Optional[str] = Query(None),
-    status: Optional[str] = Query(None)
+    status: Optional[str] = Query(None),
+    store_id: Optional[str] = Query(None),
+    page: PageParams = Depends(page_params)
 ):
-    """Retrieve payroll entries, optionally filtered by employee_id or status."""
+    """Retrieve payroll entries, optionally filtered by employee_id, status or store_id."""
     try:
-        payroll_collection = get_collection("payroll")
-        query = {"store_id": store_id} if store_id else {}
+        query = {}
+        if employee_id:
+            query["employee_id"] = employee_id
+        if status:
+            query["status"] = status
+        if store_id:
+            query["store_id"] = store_id
         
-        payroll_list = []
-        # FIXED: Use async for loop instead of to_list()
-        async for payroll in payroll_collection.find(query):
-            payroll_list.append(Payroll.from_mongo(payroll))
-            
-        return success_response(data=entries)
+        return await _list_documents("payroll", Payroll, query, page)
     except Exception as e:
         return handle_generic_exception(e)
 
@@ -925,7 +930,7 @@ async def create_payroll_entry(entry: Payroll):
         entry_dict = to_mongo_dict(entry)
         
         result = await payroll_collection.insert_one(entry_dict)
-        new_entry = await payroll_collection.find_one({"_id": result.inserted_id})
+        new_entry = inserted_document(entry_dict, result)
         return success_response(
             data=Payroll.from_mongo(new_entry),
             message="Payroll entry created successfully",
@@ -941,13 +946,13 @@ async def update_payroll_entry(payroll_id: str, entry: Payroll):
         payroll_collection = get_collection("payroll")
         entry_dict = to_mongo_update_dict(entry, exclude_unset=True)
         
-        result = await payroll_collection.update_one(
-            {"_id": ObjectId(payroll_id)}, {"$set": entry_dict}
+        updated_entry = await payroll_collection.find_one_and_update(
+            {"_id": ObjectId(payroll_id)}, {"$set": entry_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0 and result.matched_count == 0:
+        if updated_entry is None:
             return error_response(message="Payroll entry not found", code=404)
         
-        updated_entry = await payroll_collection.find_one({"_id": ObjectId(payroll_id)})
         return success_response(
             data=Payroll.from_mongo(updated_entry),
             message="Payroll entry updated successfully"
@@ -955,40 +960,61 @@ async def update_payroll_entry(payroll_id: str, entry: Payroll):
     except Exception:
         return error_response(message="Invalid ID format for payroll entry", code=400)
 
+@job_handler("payroll.complete")
+async def _complete_payroll_processing(data: dict):
+    """Queued step that settles a payroll entry claimed by process_payroll"""
+    payroll_collection = get_collection("payroll")
+    await payroll_collection.update_one(
+        {"_id": ObjectId(data["payroll_id"]), "status": "processing"},
+        {"$set": {"status": "paid", "updated_at": datetime.utcnow().isoformat()}}
+    )
+
 @router.post("/payroll/{payroll_id}/process", response_model=StandardResponse[PayrollResponse])
 async def process_payroll(payroll_id: str):
-    """Simulate the processing of a payroll entry."""
+    """Start processing a payroll entry; a queued job marks it paid."""
+    try:
+        oid = ObjectId(payroll_id)
+    except Exception:
+        return error_response(message="Invalid ID format for payroll entry", code=400)
+    
     try:
         payroll_collection = get_collection("payroll")
+        now = datetime.utcnow().isoformat()
         
-        # Update status to processing
-        await payroll_collection.update_one(
-            {"_id": ObjectId(payroll_id)},
-            {"$set": {"status": "processing", "updated_at": datetime.utcnow().isoformat()}}
-        )
-    
-        # Simulate processing delay
-        await asyncio.sleep(2)
-    
-        # Update status to paid
-        result = await payroll_collection.update_one(
-            {"_id": ObjectId(payroll_id)},
-            {"$set": {"status": "paid", "updated_at": datetime.utcnow().isoformat()}}
+        # Update status to processing unless it is already underway or paid
+        previous = await payroll_collection.find_one_and_update(
+            {"_id": oid, "status": {"$nin": ["processing", "paid"]}},
+            {"$set": {"status": "processing", "updated_at": now}},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.modified_count == 0:
-            if await payroll_collection.find_one({"_id": ObjectId(payroll_id)}):
-                pass
-            else:
+        if previous is None:
+            entry = await payroll_collection.find_one({"_id": oid})
+            if not entry:
                 return error_response(message="Payroll entry not found", code=404)
+            return success_response(
+                data=Payroll.from_mongo(entry),
+                message=f"Payroll is already {entry.get('status')}",
+                code=200
+            )
+        
+        try:
+            await enqueue("payroll.complete", {"payroll_id": payroll_id})
+        except BaseException:
+            # No job would ever settle it: put the entry back so it can be retried
+            await payroll_collection.update_one(
+                {"_id": oid, "status": "processing"},
+                {"$set": {"status": previous.get("status"), "updated_at": previous.get("updated_at")}}
+            )
+            raise
         
-        updated_entry = await payroll_collection.find_one({"_id": ObjectId(payroll_id)})
         return success_response(
-            data=Payroll.from_mongo(updated_entry),
-            message="Payroll processed successfully"
+            data=Payroll.from_mongo({**previous, "status": "processing", "updated_at": now}),
+            message="Payroll accepted for processing",
+            code=202
         )
-    except Exception:
-        return error_response(message="Invalid ID format for payroll entry", code=400)
+    except Exception as e:
+        return handle_generic_exception(e)
 
 @router.delete("/payroll/{payroll_id}", response_model=StandardResponse[dict])
 async def delete_payroll_entry(payroll_id: str):
@@ -1049,7 +1075,7 @@ async def create_payroll_settings(settings: PayrollSettings):
         await settings_collection.delete_many({"store_id": settings.store_id})
         
         result = await settings_collection.insert_one(settings_dict)
-        new_settings = await settings_collection.find_one({"_id": result.inserted_id})
+        new_settings = inserted_document(settings_dict, result)
         return success_response(
             data=PayrollSettings.from_mongo(new_settings),
             message="Payroll settings created successfully",
@@ -1076,13 +1102,13 @@ async def update_payroll_settings(settings_id: str, settings: PayrollSettings):
             
         settings_dict = to_mongo_update_dict(updated_settings, exclude_unset=False)
         
-        result = await settings_collection.update_one(
-            {"_id": ObjectId(settings_id)}, {"$set": settings_dict}
+        updated_settings_doc = await settings_collection.find_one_and_update(
+            {"_id": ObjectId(settings_id)}, {"$set": settings_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0 and result.matched_count == 0:
+        if updated_settings_doc is None:
             return error_response(message="Payroll settings not found", code=404)
         
-        updated_settings_doc = await settings_collection.find_one({"_id": ObjectId(settings_id)})
         return success_response(
             data=PayrollSettings.from_mongo(updated_settings_doc),
             message="Payroll settings updated successfully"
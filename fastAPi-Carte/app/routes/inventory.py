@@ -10,8 +10,10 @@ from app.models.response import (
     GoodsReceiptResponse
 )
 from app.utils.response_helpers import success_response, error_response, handle_http_exception, handle_generic_exception
-from app.utils.mongo_helpers import to_mongo_dict, to_mongo_update_dict
+from app.utils.mongo_helpers import to_mongo_dict, to_mongo_update_dict, inserted_document
+from app.utils.fast_json import trusted_response, trusted_shape
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
 
 router = APIRouter(prefix="/api", tags=["inventory"])
@@ -22,12 +24,12 @@ async def get_inventory_products(store_id: Optional[str] = Query(None)):
     try:
         products_collection = get_collection("inventory_products")
         query = {"store_id": store_id} if store_id else {}
+        # Served through the fast JSON path, without building a model per product
+        shape = trusted_shape(InventoryProductResponse)
         products = []
-        # FIXED: Use await and iterate
-        product_docs = await products_collection.find(query)
-        for product in product_docs:
-            products.append(InventoryProduct.from_mongo(product))
-        return success_response(data=products)
+        async for batch in products_collection.iter_find_batches(query, projection=shape.project()):
+            products.extend(shape.to_item(product) for product in batch)
+        return trusted_response(products)
     except Exception as e:
         return handle_generic_exception(e)
 
@@ -49,7 +51,7 @@ async def create_inventory_product(product: InventoryProduct):
         product_dict = to_mongo_dict(product)
         
         result = await products_collection.insert_one(product_dict)
-        new_product = await products_collection.find_one({"_id": result.inserted_id})
+        new_product = inserted_document(product_dict, result)
         return success_response(
             data=InventoryProduct.from_mongo(new_product),
             message="Inventory product created successfully",
@@ -64,13 +66,13 @@ async def update_inventory_product(product_id: str, product: InventoryProduct):
         products_collection = get_collection("inventory_products")
         product_dict = to_mongo_update_dict(product, exclude_unset=True)
         
-        result = await products_collection.update_one(
-            {"_id": ObjectId(product_id)}, {"$set": product_dict}
+        updated_product = await products_collection.find_one_and_update(
+            {"_id": ObjectId(product_id)}, {"$set": product_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0:
+        if updated_product is None:
             return error_response(message="Inventory product not found", code=404)
         
-        updated_product = await products_collection.find_one({"_id": ObjectId(product_id)})
         return success_response(
             data=InventoryProduct.from_mongo(updated_product),
             message="Inventory product updated successfully"
@@ -124,7 +126,7 @@ async def create_supplier(supplier: Supplier):
         supplier_dict = to_mongo_dict(supplier)
         
         result = await suppliers_collection.insert_one(supplier_dict)
-        new_supplier = await suppliers_collection.find_one({"_id": result.inserted_id})
+        new_supplier = inserted_document(supplier_dict, result)
         return success_response(
             data=Supplier.from_mongo(new_supplier),
             message="Supplier created successfully",
@@ -139,13 +141,13 @@ async def update_supplier(supplier_id: str, supplier: Supplier):
         suppliers_collection = get_collection("suppliers")
         supplier_dict = to_mongo_update_dict(supplier, exclude_unset=True)
         
-        result = await suppliers_collection.update_one(
-            {"_id": ObjectId(supplier_id)}, {"$set": supplier_dict}
+        updated_supplier = await suppliers_collection.find_one_and_update(
+            {"_id": ObjectId(supplier_id)}, {"$set": supplier_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0:
+        if updated_supplier is None:
             return error_response(message="Supplier not found", code=404)
         
-        updated_supplier = await suppliers_collection.find_one({"_id": ObjectId(supplier_id)})
         return success_response(
             data=Supplier.from_mongo(updated_supplier),
             message="Supplier updated successfully"
@@ -199,7 +201,7 @@ async def create_unit(unit: Unit):
         unit_dict = to_mongo_dict(unit)
         
         result = await units_collection.insert_one(unit_dict)
-        new_unit = await units_collection.find_one({"_id": result.inserted_id})
+        new_unit = inserted_document(unit_dict, result)
         return success_response(
             data=Unit.from_mongo(new_unit),
             message="Unit created successfully",
@@ -214,13 +216,13 @@ async def update_unit(unit_id: str, unit: Unit):
         units_collection = get_collection("units")
         unit_dict = to_mongo_update_dict(unit, exclude_unset=True)
         
-        result = await units_collection.update_one(
-            {"_id": ObjectId(unit_id)}, {"$set": unit_dict}
+        updated_unit = await units_collection.find_one_and_update(
+            {"_id": ObjectId(unit_id)}, {"$set": unit_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0:
+        if updated_unit is None:
             return error_response(message="Unit not found", code=404)
         
-        updated_unit = await units_collection.find_one({"_id": ObjectId(unit_id)})
         return success_response(
             data=Unit.from_mongo(updated_unit),
             message="Unit updated successfully"
@@ -275,7 +277,7 @@ async def create_stock(stock: Stock):
         stock_dict = to_mongo_dict(stock)
         
         result = await stocks_collection.insert_one(stock_dict)
-        new_stock = await stocks_collection.find_one({"_id": result.inserted_id})
+        new_stock = inserted_document(stock_dict, result)
         return success_response(
             data=Stock.from_mongo(new_stock),
             message="Stock created successfully",
@@ -290,13 +292,13 @@ async def update_stock(stock_id: str, stock: Stock):
         stocks_collection = get_collection("stocks")
         stock_dict = to_mongo_update_dict(stock, exclude_unset=True)
         
-        result = await stocks_collection.update_one(
-            {"_id": ObjectId(stock_id)}, {"$set": stock_dict}
+        updated_stock = await stocks_collection.find_one_and_update(
+            {"_id": ObjectId(stock_id)}, {"$set": stock_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0:
+        if updated_stock is None:
             return error_response(message="Stock not found", code=404)
         
-        updated_stock = await stocks_collection.find_one({"_id": ObjectId(stock_id)})
         return success_response(
             data=Stock.from_mongo(updated_stock),
             message="Stock updated successfully"
@@ -351,7 +353,7 @@ async def create_stock_adjustment(sa: StockAdjustment):
         sa_dict = to_mongo_dict(sa)
         
         result = await sa_collection.insert_one(sa_dict)
-        new_sa = await sa_collection.find_one({"_id": result.inserted_id})
+        new_sa = inserted_document(sa_dict, result)
         return success_response(
             data=StockAdjustment.from_mongo(new_sa),
             message="Stock adjustment created successfully",
@@ -366,13 +368,13 @@ async def update_stock_adjustment(adjustment_id: str, sa: StockAdjustment):
         sa_collection = get_collection("stock_adjustments")
         sa_dict = to_mongo_update_dict(sa, exclude_unset=True)
         
-        result = await sa_collection.update_one(
-            {"_id": ObjectId(adjustment_id)}, {"$set": sa_dict}
+        updated_sa = await sa_collection.find_one_and_update(
+            {"_id": ObjectId(adjustment_id)}, {"$set": sa_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0:
+        if updated_sa is None:
             return error_response(message="Stock adjustment not found", code=404)
         
-        updated_sa = await sa_collection.find_one({"_id": ObjectId(adjustment_id)})
         return success_response(
             data=StockAdjustment.from_mongo(updated_sa),
             message="Stock adjustment updated successfully"
@@ -427,7 +429,7 @@ async def create_inv_category(category: InvCategory):
         category_dict = to_mongo_dict(category)
         
         result = await categories_collection.insert_one(category_dict)
-        new_category = await categories_collection.find_one({"_id": result.inserted_id})
+        new_category = inserted_document(category_dict, result)
         return success_response(
             data=InvCategory.from_mongo(new_category),
             message="Inventory category created successfully",
@@ -442,13 +444,13 @@ async def update_inv_category(category_id: str, category: InvCategory):
         categories_collection = get_collection("inv_categories")
         category_dict = to_mongo_update_dict(category, exclude_unset=True)
         
-        result = await categories_collection.update_one(
-            {"_id": ObjectId(category_id)}, {"$set": category_dict}
+        updated_category = await categories_collection.find_one_and_update(
+            {"_id": ObjectId(category_id)}, {"$set": category_dict},
+            return_document=ReturnDocument.AFTER
         )
-        if result.modified_count == 0:
+        if updated_category is None:
             return error_response(message="Inventory category not found", code=404)
         
-        updated_category = await categories_collection.find_one({"_id": ObjectId(category_id)})
         return success_response(
             data=InvCategory.from_mongo(updated_category),
             message="Inventory category updated successfully"
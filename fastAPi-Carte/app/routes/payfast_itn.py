@@ -1,11 +1,15 @@
 # app/routes/payfast_itn.py - UPDATED VERSION (using httpx)
-from fastapi import APIRouter, Request, HTTPException, BackgroundTasks, Form
+from fastapi import APIRouter, Request, HTTPException, Form
 from typing import Dict, Any
 import hashlib
 from urllib.parse import urlencode
 import httpx  # ✅ Use httpx instead of aiohttp
 from app.database import get_collection
+from app.utils.events import event_bus
+from app.utils.job_queue import enqueue, job_handler
+from app.utils.sales_rollup import record_order_change
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
 
 router = APIRouter()
@@ -41,19 +45,16 @@ class PayFastITNService:
         return received_signature == generated_signature
     
     async def validate_with_payfast(self, data: Dict[str, Any]) -> bool:
-        """Validate payment with PayFast server"""
-        try:
-            base_url = "https://sandbox.payfast.co.za" if self.sandbox_mode else "https://api.payfast.co.za"
-            url = f"{base_url}/eng/query/validate"
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, data=data)
-                result = response.text
-                print(f"🔍 PayFast validation response: {result}")
-                return result.strip() == "VALID"
-        except Exception as e:
-            print(f"❌ PayFast validation error: {e}")
-            return False
+        """Validate payment with PayFast server; network errors propagate so the job is retried"""
+        base_url = "https://sandbox.payfast.co.za" if self.sandbox_mode else "https://api.payfast.co.za"
+        url = f"{base_url}/eng/query/validate"
+        
+        async with httpx.AsyncClient() as client:
+            response = await client.post(url, data=data)
+            response.raise_for_status()
+            result = response.text
+            print(f"🔍 PayFast validation response: {result}")
+            return result.strip() == "VALID"
     
     async def handle_successful_payment(self, data: Dict[str, Any]):
         """Handle successful payment"""
@@ -76,19 +77,21 @@ class PayFastITNService:
             
             if order_id:
                 # Update order payment status
-                result = await orders_collection.update_one(
+                payment_update = {
+                    "payment_status": "paid",
+                    "status": "confirmed",
+                    "payment_reference": pf_payment_id,
+                    "paid_amount": amount,
+                    "payment_date": datetime.utcnow().isoformat(),
+                    "updated_at": datetime.utcnow().isoformat()
+                }
+                order = await orders_collection.find_one_and_update(
                     {"_id": ObjectId(order_id)},
-                    {"$set": {
-                        "payment_status": "paid",
-                        "status": "confirmed",
-                        "payment_reference": pf_payment_id,
-                        "paid_amount": amount,
-                        "payment_date": datetime.utcnow().isoformat(),
-                        "updated_at": datetime.utcnow().isoformat()
-                    }}
+                    {"$set": payment_update},
+                    return_document=ReturnDocument.BEFORE
                 )
                 
-                print(f"✅ Order updated: {result.modified_count} documents modified")
+                print(f"✅ Order updated: {1 if order else 0} documents modified")
                 
                 # Update payment attempt
                 await payment_attempts_collection.update_one(
@@ -103,15 +106,20 @@ class PayFastITNService:
                 
                 print(f"✅ Payment successful for order {order_id}")
                 
+                if order:
+                    paid_order = {**order, **payment_update}
+                    await record_order_change(order, paid_order)
+                    await event_bus.publish("order.paid", paid_order)
+                
         except Exception as e:
             print(f"❌ Error handling successful payment: {e}")
+            raise
 
 payfast_itn_service = PayFastITNService()
 
 @router.post("/payfast/itn")
 async def handle_payfast_itn(
     request: Request, 
-    background_tasks: BackgroundTasks,
     m_payment_id: str = Form(None),
     pf_payment_id: str = Form(None),
     payment_status: str = Form(None),
@@ -129,54 +137,52 @@ async def handle_payfast_itn(
         for key, value in itn_data.items():
             print(f"   {key}: {value}")
         
-        # Immediately return 200 to acknowledge receipt
-        # This prevents PayFast from retrying
-        response = {"status": "received"}
-        
-        # Process payment in background
-        background_tasks.add_task(process_payfast_payment, itn_data)
-        
-        return response
-        
     except Exception as e:
         print(f"❌ ITN processing error: {e}")
         # Still return 200 to prevent retries
         return {"status": "error", "message": str(e)}
-
-async def process_payfast_payment(itn_data: Dict[str, Any]):
-    """Process PayFast payment in background"""
+    
+    # Queue validation and processing, then return 200 to acknowledge receipt.
+    # If the job can't be stored, fail so PayFast redelivers the ITN.
     try:
-        print("🔄 Processing PayFast payment in background...")
-        
-        # 1. Validate payment status
-        payment_status = itn_data.get('payment_status')
-        if payment_status != 'COMPLETE':
-            print(f"❌ Payment not complete: {payment_status}")
-            return
-        
-        print("✅ Payment status: COMPLETE")
-        
-        # 2. Validate signature
-        if not payfast_itn_service.validate_signature(itn_data):
-            print("❌ Invalid signature")
-            return
-        
-        print("✅ Signature validated")
-        
-        # 3. Validate with PayFast server
-        if not await payfast_itn_service.validate_with_payfast(itn_data):
-            print("❌ Server validation failed")
-            return
-        
-        print("✅ Server validation successful")
-        
-        # 4. Handle successful payment
-        await payfast_itn_service.handle_successful_payment(itn_data)
-        
-        print("✅ Payment processed successfully")
-        
+        await enqueue("payfast.process_itn", itn_data)
     except Exception as e:
-        print(f"❌ Error processing payment: {e}")
+        print(f"❌ Could not queue ITN: {e}")
+        raise HTTPException(status_code=503, detail="ITN could not be queued")
+    
+    return {"status": "received"}
+
+@job_handler("payfast.process_itn")
+async def process_payfast_payment(itn_data: Dict[str, Any]):
+    """Validate and apply a queued ITN; errors propagate so the job is retried"""
+    print("🔄 Processing PayFast payment from the job queue...")
+    
+    # 1. Validate payment status
+    payment_status = itn_data.get('payment_status')
+    if payment_status != 'COMPLETE':
+        print(f"❌ Payment not complete: {payment_status}")
+        return
+    
+    print("✅ Payment status: COMPLETE")
+    
+    # 2. Validate signature
+    if not payfast_itn_service.validate_signature(itn_data):
+        print("❌ Invalid signature")
+        return
+    
+    print("✅ Signature validated")
+    
+    # 3. Validate with PayFast server
+    if not await payfast_itn_service.validate_with_payfast(itn_data):
+        print("❌ Server validation failed")
+        return
+    
+    print("✅ Server validation successful")
+    
+    # 4. Handle successful payment
+    await payfast_itn_service.handle_successful_payment(itn_data)
+    
+    print("✅ Payment processed successfully")
 
 @router.get("/payfast/test")
 async def test_payfast_endpoint():
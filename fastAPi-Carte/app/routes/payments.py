@@ -1,18 +1,34 @@
 # app/routes/payments.py
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Header
 from app.database import get_collection
 from app.models.response import StandardResponse, PaymentAttemptResponse
 from app.utils.response_helpers import success_response, error_response, handle_generic_exception
 from app.utils.mongo_helpers import to_mongo_dict
+from app.utils.idempotency import IDEMPOTENCY_HEADER, run_idempotent
+from app.utils.events import event_bus
+from app.utils.sales_rollup import record_order_change
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 router = APIRouter(prefix="/api/halo", tags=["payments"])
 
 @router.post("/transaction", response_model=StandardResponse[Dict[str, Any]])
-async def process_halo_transaction(transaction_data: Dict[str, Any] = Body(...)):
+async def process_halo_transaction(
+    transaction_data: Dict[str, Any] = Body(...),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
+):
     """Process Halo payment transaction"""
+    return await run_idempotent(
+        idempotency_key,
+        "halo:transaction",
+        lambda: _process_halo_transaction(transaction_data),
+        payload=transaction_data
+    )
+
+async def _process_halo_transaction(transaction_data: Dict[str, Any]):
+    """Record the Halo payment attempt and mark the order paid"""
     try:
         # Extract transaction data
         amount = transaction_data.get("amount", 0)
@@ -71,18 +87,22 @@ async def process_halo_transaction(transaction_data: Dict[str, Any] = Body(...))
             )
             
             # Update order payment status
-            await orders_collection.update_one(
+            payment_update = {
+                "payment_status": "paid",
+                "payment_method": transaction_data.get("payment_method", "card"),
+                "updated_at": datetime.utcnow().isoformat(),
+                "payment_reference": transaction_id,
+                "transaction_id": transaction_id
+            }
+            order = await orders_collection.find_one_and_update(
                 {"_id": ObjectId(order_id)},
-                {
-                    "$set": {
-                        "payment_status": "paid",
-                        "payment_method": transaction_data.get("payment_method", "card"),
-                        "updated_at": datetime.utcnow().isoformat(),
-                        "payment_reference": transaction_id,
-                        "transaction_id": transaction_id
-                    }
-                }
-            )
+                {"$set": payment_update},
+                return_document=ReturnDocument.BEFORE
+            ) or order
+            paid_order = {**order, **payment_update}
+            await record_order_change(order, paid_order)
+            
+            await event_bus.publish("order.paid", paid_order)
             
             response_data = {
                 "status": "success",
@@ -1,11 +1,19 @@
 # app/routes/reports.py - FIXED VERSION
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Body, Query, Request
+from fastapi.encoders import jsonable_encoder
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from bson import ObjectId
 from app.database import get_collection
+from app.utils.job_queue import FAILED_JOBS_COLLECTION, enqueue, job_handler
+from app.utils.report_cache import cached_report, report_period
+from app.utils.report_jobs import GENERATE_REPORT_JOB, REPORT_RESULTS_COLLECTION
 from app.utils.response_helpers import success_response, error_response
+from app.utils.sales_rollup import SalesSummary, load_sales_summary
+from app.utils.order_columns import load_order_columns, summarise_orders
 import asyncio
+import inspect
+import uuid
 from collections import defaultdict
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
@@ -45,6 +53,54 @@ def create_empty_response(start_date=None, end_date=None, store_id=None, message
     }
     return response
 
+async def _fetch_by_ids(collection_name: str, ids: List[str], projection: Dict[str, int]) -> Dict[str, dict]:
+    """Load only the referenced documents, keyed by their string id"""
+    object_ids = [oid for oid in (safe_objectid(i) for i in ids) if oid]
+    if not object_ids:
+        return {}
+    
+    collection = get_collection(collection_name)
+    documents = {}
+    async for document in collection.iter_find({"_id": {"$in": object_ids}}, projection=projection):
+        documents[str(document["_id"])] = document
+    return documents
+
+async def _inventory_totals(query: Optional[dict] = None):
+    """Stream inventory products and return (total stock value, low stock count)"""
+    inventory_collection = get_collection("inventory_products")
+    total_value = 0
+    low_stock_count = 0
+    async for product in inventory_collection.iter_find(
+        query or {},
+        projection={"quantity_in_stock": 1, "unit_cost": 1, "reorder_level": 1}
+    ):
+        quantity = product.get("quantity_in_stock", 0) or 0
+        total_value += quantity * (product.get("unit_cost", 0) or 0)
+        if quantity <= (product.get("reorder_level", 0) or 0):
+            low_stock_count += 1
+    return total_value, low_stock_count
+
+def _daily_performance(sales: SalesSummary) -> List[dict]:
+    """
+    Fold hourly totals into one row per day in a single pass over the hours.
+    Daily order counts include cancelled orders, matching total_orders.
+    """
+    daily = defaultdict(lambda: {"revenue": 0, "orders": 0})
+    for hour_start, totals in sales.by_hour.items():
+        date_key = hour_start.strftime("%Y-%m-%d") if hour_start else "unknown"
+        daily[date_key]["revenue"] += totals["revenue"]
+        daily[date_key]["orders"] += totals["orders"]
+    
+    return [
+        {
+            "date": date_str,
+            "revenue": day["revenue"],
+            "orders": day["orders"],
+            "avg_order_value": day["revenue"] / day["orders"] if day["orders"] > 0 else 0
+        }
+        for date_str, day in sorted(daily.items())
+    ]
+
 # ==================== TEST ENDPOINT ====================
 
 @router.get("/test")
@@ -69,6 +125,7 @@ async def test_reports_endpoint():
 
 @router.get("/financial")
 async def get_financial_report(
+    request: Request,
     start_date: str = Query(..., description="Start date in YYYY-MM-DD format"),
     end_date: str = Query(..., description="End date in YYYY-MM-DD format"),
     store_id: Optional[str] = Query(None),
@@ -78,6 +135,23 @@ async def get_financial_report(
     status: Optional[str] = Query(None)
 ):
     """Generate comprehensive financial report from real data"""
+    return await cached_report(
+        request,
+        lambda: _get_financial_report(start_date, end_date, store_id, employee_id, category_id, payment_method, status),
+        store_id=store_id,
+        period=report_period(start_date, end_date)
+    )
+
+async def _get_financial_report(
+    start_date: str,
+    end_date: str,
+    store_id: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    category_id: Optional[str] = None,
+    payment_method: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """Compute the financial report response"""
     try:
         # Parse dates
         try:
@@ -98,17 +172,18 @@ async def get_financial_report(
         }
         
         # Add filters with ObjectId validation
+        # Ids are stored as strings by the API; older data may hold ObjectIds
         if store_id:
             store_obj_id = safe_objectid(store_id)
             if store_obj_id:
-                query["store_id"] = store_obj_id
+                query["store_id"] = {"$in": [store_id, store_obj_id]}
             else:
                 return error_response(message="Invalid store ID format", code=400)
         
         if employee_id:
             emp_obj_id = safe_objectid(employee_id)
             if emp_obj_id:
-                query["employee_id"] = emp_obj_id
+                query["employee_id"] = {"$in": [employee_id, emp_obj_id]}
             else:
                 return error_response(message="Invalid employee ID format", code=400)
         
@@ -118,21 +193,49 @@ async def get_financial_report(
             query["status"] = status
         
         # Get collections
-        orders_collection = get_collection("orders")
         foods_collection = get_collection("foods")
-        customers_collection = get_collection("customers")
-        employees_collection = get_collection("employees")
-        inventory_collection = get_collection("inventory_products")
         
-        # FIXED: Use await directly since LoggedCollection.find() returns a list
-        orders = await orders_collection.find(query)
-        foods = await foods_collection.find({})
-        customers = await customers_collection.find({})
-        employees = await employees_collection.find({})
-        inventory = await inventory_collection.find({})
+        # Inventory only contributes totals, so stream it instead of holding it
+        inventory_value, low_stock_count = await _inventory_totals()
+        
+        # Food lookup (menu sized, only the fields needed for costing)
+        food_dict = {}
+        async for food in foods_collection.iter_find({}, projection={"name": 1, "unit_cost": 1}):
+            food_id = str(food.get("_id", ""))
+            food_dict[food_id] = food
+        
+        # Unfiltered reports read the hourly rollups; they aren't broken down by
+        # employee, payment method or status, so those filters summarise matching orders
+        if employee_id or payment_method or status:
+            sales = await summarise_orders(query)
+        else:
+            sales = await load_sales_summary(start_dt, end_dt, store_id)
+        
+        total_revenue = sales.revenue
+        total_orders = sales.orders
+        payment_methods = {method: amount for method, amount in sales.payment_methods.items() if amount}
+        
+        # Item sales, costed from the current food data
+        total_cost = 0
+        item_sales = {}
+        for food_id, item in sales.items.items():
+            if not item["quantity"] and not item["revenue"]:
+                continue
+            food = food_dict.get(food_id)
+            item_cost = (food.get("unit_cost") or 0) * item["quantity"] if food else 0
+            item_sales[food_id] = {"quantity": item["quantity"], "revenue": item["revenue"], "cost": item_cost}
+            total_cost += item_cost
+        
+        customer_spending = {
+            customer_id: {"total": data["revenue"], "orders": data["orders"]}
+            for customer_id, data in sales.customers.items() if data["orders"] > 0
+        }
+        employee_performance = {
+            emp_id: dict(data) for emp_id, data in sales.employees.items() if data["orders"] > 0
+        }
         
         # If no orders found, return empty report with success response
-        if not orders:
+        if total_orders == 0:
             report_data = {
                 "period": {
                     "start_date": start_dt.isoformat(),
@@ -146,7 +249,7 @@ async def get_financial_report(
                     "gross_profit": 0,
                     "gross_margin": 0,
                     "average_order_value": 0,
-                    "inventory_value": sum((p.get("quantity_in_stock", 0) or 0) * (p.get("unit_cost", 0) or 0) for p in inventory)
+                    "inventory_value": inventory_value
                 },
                 "payment_methods": {},
                 "daily_performance": [],
@@ -154,8 +257,8 @@ async def get_financial_report(
                 "top_customers": [],
                 "employee_performance": [],
                 "inventory_metrics": {
-                    "total_value": sum((p.get("quantity_in_stock", 0) or 0) * (p.get("unit_cost", 0) or 0) for p in inventory),
-                    "low_stock_count": len([p for p in inventory if (p.get("quantity_in_stock", 0) or 0) <= (p.get("reorder_level", 0) or 0)])
+                    "total_value": inventory_value,
+                    "low_stock_count": low_stock_count
                 },
                 "filters": {
                     "store_id": store_id,
@@ -174,82 +277,6 @@ async def get_financial_report(
                 message="No orders found for the selected period"
             )
         
-        # Calculate metrics (existing code continues...)
-        total_revenue = 0
-        total_cost = 0
-        total_orders = len(orders)
-        
-        # Data structures
-        item_sales = defaultdict(lambda: {"quantity": 0, "revenue": 0, "cost": 0})
-        customer_spending = defaultdict(lambda: {"total": 0, "orders": 0})
-        employee_performance = defaultdict(lambda: {"orders": 0, "revenue": 0})
-        payment_methods = defaultdict(float)
-        daily_revenue = defaultdict(float)
-        
-        # Food lookup
-        food_dict = {}
-        for food in foods:
-            food_id = str(food.get("_id", ""))
-            food_dict[food_id] = food
-        
-        # Process orders
-        for order in orders:
-            if order.get("status") == "cancelled":
-                continue
-                
-            order_revenue = order.get("total_amount", 0) or 0
-            order_date = order.get("created_at")
-            
-            # Parse date
-            date_key = "unknown"
-            if isinstance(order_date, datetime):
-                date_key = order_date.strftime("%Y-%m-%d")
-            elif isinstance(order_date, str):
-                try:
-                    date_key = datetime.fromisoformat(order_date.replace('Z', '+00:00')).strftime("%Y-%m-%d")
-                except:
-                    pass
-            
-            # Accumulate metrics
-            total_revenue += order_revenue
-            daily_revenue[date_key] += order_revenue
-            
-            # Payment method
-            pmt_method = order.get("payment_method", "unknown")
-            payment_methods[pmt_method] += order_revenue
-            
-            # Customer spending
-            customer_id = order.get("customer_id")
-            if customer_id:
-                customer_spending[str(customer_id)]["total"] += order_revenue
-                customer_spending[str(customer_id)]["orders"] += 1
-            
-            # Employee performance
-            emp_id = order.get("employee_id")
-            if emp_id:
-                employee_performance[str(emp_id)]["orders"] += 1
-                employee_performance[str(emp_id)]["revenue"] += order_revenue
-            
-            # Item sales
-            for item in order.get("items", []):
-                food_id = str(item.get("food_id", ""))
-                if not food_id:
-                    continue
-                    
-                quantity = item.get("quantity", 0) or 0
-                price = item.get("price", 0) or 0
-                sub_total = item.get("sub_total", 0) or 0
-                
-                item_sales[food_id]["quantity"] += quantity
-                item_sales[food_id]["revenue"] += sub_total
-                
-                # Calculate cost from food data
-                food = food_dict.get(food_id)
-                if food and food.get("unit_cost"):
-                    item_cost = (food.get("unit_cost") or 0) * quantity
-                    item_sales[food_id]["cost"] += item_cost
-                    total_cost += item_cost
-        
         # Calculate derived metrics
         gross_profit = total_revenue - total_cost
         gross_margin = (gross_profit / total_revenue * 100) if total_revenue > 0 else 0
@@ -271,14 +298,17 @@ async def get_financial_report(
         top_items.sort(key=lambda x: x["revenue"], reverse=True)
         top_items = top_items[:10]
         
-        # Get top customers
-        customer_dict = {}
-        for customer in customers:
-            customer_id = str(customer.get("_id", ""))
-            customer_dict[customer_id] = customer
+        # Get top customers - only the ten shown need a name lookup
+        top_customer_ids = sorted(
+            customer_spending, key=lambda cid: customer_spending[cid]["total"], reverse=True
+        )[:10]
+        customer_dict = await _fetch_by_ids(
+            "customers", top_customer_ids, {"first_name": 1, "last_name": 1}
+        )
         
         top_customers = []
-        for customer_id, data in customer_spending.items():
+        for customer_id in top_customer_ids:
+            data = customer_spending[customer_id]
             customer = customer_dict.get(customer_id)
             top_customers.append({
                 "id": customer_id,
@@ -289,14 +319,10 @@ async def get_financial_report(
                 "avg_spend": data["total"] / data["orders"] if data["orders"] > 0 else 0
             })
         
-        top_customers.sort(key=lambda x: x["total_spent"], reverse=True)
-        top_customers = top_customers[:10]
-        
         # Get employee performance
-        employee_dict = {}
-        for emp in employees:
-            emp_id = str(emp.get("_id", ""))
-            employee_dict[emp_id] = emp
+        employee_dict = await _fetch_by_ids(
+            "employees", list(employee_performance), {"first_name": 1, "last_name": 1}
+        )
         
         employee_perf_data = []
         for emp_id, data in employee_performance.items():
@@ -312,24 +338,8 @@ async def get_financial_report(
         
         employee_perf_data.sort(key=lambda x: x["total_sales"], reverse=True)
         
-        # Get inventory metrics
-        inventory_value = sum((p.get("quantity_in_stock", 0) or 0) * (p.get("unit_cost", 0) or 0) for p in inventory)
-        low_stock_items = [p for p in inventory if (p.get("quantity_in_stock", 0) or 0) <= (p.get("reorder_level", 0) or 0)]
-        
         # Calculate daily metrics
-        daily_data = []
-        for date_str, revenue in sorted(daily_revenue.items()):
-            daily_orders = [o for o in orders if (
-                (isinstance(o.get("created_at"), datetime) and o["created_at"].strftime("%Y-%m-%d") == date_str) or
-                (isinstance(o.get("created_at"), str) and date_str in o["created_at"])
-            )]
-            
-            daily_data.append({
-                "date": date_str,
-                "revenue": revenue,
-                "orders": len(daily_orders),
-                "avg_order_value": revenue / len(daily_orders) if len(daily_orders) > 0 else 0
-            })
+        daily_data = _daily_performance(sales)
         
         # Prepare response
         report_data = {
@@ -354,7 +364,7 @@ async def get_financial_report(
             "employee_performance": employee_perf_data,
             "inventory_metrics": {
                 "total_value": inventory_value,
-                "low_stock_count": len(low_stock_items)
+                "low_stock_count": low_stock_count
             },
             "filters": {
                 "store_id": store_id,
@@ -383,10 +393,23 @@ async def get_financial_report(
 
 @router.get("/sales/daily")
 async def get_daily_sales_report(
+    request: Request,
     date: str = Query(..., description="Date in YYYY-MM-DD format"),
     store_id: Optional[str] = Query(None)
 ):
     """Get detailed daily sales report from real data"""
+    return await cached_report(
+        request,
+        lambda: _get_daily_sales_report(date, store_id),
+        store_id=store_id,
+        period=report_period(date)
+    )
+
+async def _get_daily_sales_report(
+    date: str,
+    store_id: Optional[str] = None
+):
+    """Compute the daily sales report response"""
     try:
         # Parse date
         try:
@@ -397,28 +420,21 @@ async def get_daily_sales_report(
         start_dt = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
         end_dt = target_date.replace(hour=23, minute=59, second=59, microsecond=999999)
         
-        # Build query
-        query = {
-            "created_at": {
-                "$gte": start_dt,
-                "$lte": end_dt
-            }
-        }
-        if store_id:
-            store_obj_id = safe_objectid(store_id)
-            if store_obj_id:
-                query["store_id"] = store_obj_id
-            else:
-                return error_response(message="Invalid store ID format", code=400)
-        
-        # Get collection
-        orders_collection = get_collection("orders")
+        if store_id and not safe_objectid(store_id):
+            return error_response(message="Invalid store ID format", code=400)
         
-        # FIXED: Use await directly since LoggedCollection.find() returns a list
-        orders = await orders_collection.find(query)
+        # The day's hourly rollups hold the hourly, status and payment breakdowns
+        sales = await load_sales_summary(start_dt, end_dt, store_id)
+        order_count = sales.orders
+        hourly_data = defaultdict(lambda: {"revenue": 0, "orders": 0})
+        for hour_start, totals in sales.by_hour.items():
+            hourly_data[hour_start.hour]["revenue"] += totals["revenue"]
+            hourly_data[hour_start.hour]["orders"] += totals["orders"]
+        status_counts = {order_status: count for order_status, count in sales.status.items() if count}
+        payment_methods = {method: amount for method, amount in sales.payment_methods.items() if amount}
         
         # If no orders found, return empty report with success
-        if not orders:
+        if order_count == 0:
             response_data = {
                 "date": date,
                 "store_id": store_id,
@@ -437,24 +453,6 @@ async def get_daily_sales_report(
                 message="No orders found for the selected date"
             )
         
-        # Calculate hourly breakdown
-        hourly_data = defaultdict(lambda: {"revenue": 0, "orders": 0})
-        
-        for order in orders:
-            order_date = order.get("created_at")
-            hour = 0
-            
-            if isinstance(order_date, datetime):
-                hour = order_date.hour
-            elif isinstance(order_date, str):
-                try:
-                    hour = datetime.fromisoformat(order_date.replace('Z', '+00:00')).hour
-                except:
-                    pass
-            
-            hourly_data[hour]["revenue"] += order.get("total_amount", 0) or 0
-            hourly_data[hour]["orders"] += 1
-        
         # Sort hourly data
         hourly_list = []
         for hour in range(24):
@@ -470,18 +468,6 @@ async def get_daily_sales_report(
         total_revenue = sum(h["revenue"] for h in hourly_list)
         total_orders = sum(h["orders"] for h in hourly_list)
         
-        # Get status breakdown
-        status_counts = defaultdict(int)
-        for order in orders:
-            status = order.get("status", "unknown")
-            status_counts[status] += 1
-        
-        # Get payment method breakdown
-        payment_methods = defaultdict(float)
-        for order in orders:
-            method = order.get("payment_method", "unknown")
-            payment_methods[method] += order.get("total_amount", 0) or 0
-        
         # Prepare response
         response_data = {
             "date": date,
@@ -490,8 +476,8 @@ async def get_daily_sales_report(
             "total_orders": total_orders,
             "average_order_value": total_revenue / total_orders if total_orders > 0 else 0,
             "hourly_breakdown": hourly_list,
-            "status_breakdown": dict(status_counts),
-            "payment_method_breakdown": dict(payment_methods),
+            "status_breakdown": status_counts,
+            "payment_method_breakdown": payment_methods,
             "data_status": "has_data"
         }
         
@@ -512,10 +498,22 @@ async def get_daily_sales_report(
 
 @router.get("/inventory")
 async def get_inventory_report(
+    request: Request,
     threshold: float = Query(0.3, description="Low stock threshold as percentage of reorder level"),
     store_id: Optional[str] = Query(None)
 ):
     """Generate inventory report with stock analysis from real data"""
+    return await cached_report(
+        request,
+        lambda: _get_inventory_report(threshold, store_id),
+        store_id=store_id
+    )
+
+async def _get_inventory_report(
+    threshold: float = 0.3,
+    store_id: Optional[str] = None
+):
+    """Compute the inventory report response"""
     try:
         # Build query
         query = {}
@@ -529,44 +527,15 @@ async def get_inventory_report(
         # Get collection
         inventory_collection = get_collection("inventory_products")
         
-        # FIXED: Use await directly
-        products = await inventory_collection.find(query)
-        
-        # If no inventory products found, return empty report with success
-        if not products:
-            response_data = {
-                "total_items": 0,
-                "total_inventory_value": 0,
-                "low_stock_items": {
-                    "count": 0,
-                    "items": []
-                },
-                "out_of_stock_items": {
-                    "count": 0,
-                    "items": []
-                },
-                "slow_moving_items": {
-                    "count": 0,
-                    "items": []
-                },
-                "store_id": store_id,
-                "threshold_percentage": threshold * 100,
-                "data_status": "empty",
-                "message": "No inventory products found"
-            }
-            
-            return success_response(
-                data=response_data,
-                message="No inventory products found"
-            )
-        
         # Calculate metrics
         total_value = 0
+        product_count = 0
         low_stock = []
         out_of_stock = []
         slow_moving = []
         
-        for product in products:
+        async for product in inventory_collection.iter_find(query):
+            product_count += 1
             current_stock = product.get("quantity_in_stock", 0) or 0
             reorder_level = product.get("reorder_level", 0) or 0
             unit_cost = product.get("unit_cost", 0) or 0
@@ -616,6 +585,34 @@ async def get_inventory_report(
                 except:
                     pass
         
+        # If no inventory products found, return empty report with success
+        if product_count == 0:
+            response_data = {
+                "total_items": 0,
+                "total_inventory_value": 0,
+                "low_stock_items": {
+                    "count": 0,
+                    "items": []
+                },
+                "out_of_stock_items": {
+                    "count": 0,
+                    "items": []
+                },
+                "slow_moving_items": {
+                    "count": 0,
+                    "items": []
+                },
+                "store_id": store_id,
+                "threshold_percentage": threshold * 100,
+                "data_status": "empty",
+                "message": "No inventory products found"
+            }
+            
+            return success_response(
+                data=response_data,
+                message="No inventory products found"
+            )
+        
         # Sort lists
         low_stock.sort(key=lambda x: x["percentage"])
         out_of_stock.sort(key=lambda x: x.get("last_restocked") or "", reverse=True)
@@ -623,7 +620,7 @@ async def get_inventory_report(
         
         # Prepare response
         response_data = {
-            "total_items": len(products),
+            "total_items": product_count,
             "total_inventory_value": total_value,
             "low_stock_items": {
                 "count": len(low_stock),
@@ -654,11 +651,25 @@ async def get_inventory_report(
 
 @router.get("/employee/performance")
 async def get_employee_performance_report(
+    request: Request,
     start_date: str = Query(..., description="Start date in YYYY-MM-DD format"),
     end_date: str = Query(..., description="End date in YYYY-MM-DD format"),
     store_id: Optional[str] = Query(None)
 ):
     """Generate employee performance report from real data"""
+    return await cached_report(
+        request,
+        lambda: _get_employee_performance_report(start_date, end_date, store_id),
+        store_id=store_id,
+        period=report_period(start_date, end_date)
+    )
+
+async def _get_employee_performance_report(
+    start_date: str,
+    end_date: str,
+    store_id: Optional[str] = None
+):
+    """Compute the employee performance report response"""
     try:
         # Parse dates
         try:
@@ -684,16 +695,13 @@ async def get_employee_performance_report(
             else:
                 return error_response(message="Invalid store ID format", code=400)
         
-        # Get collections
-        orders_collection = get_collection("orders")
-        employees_collection = get_collection("employees")
-        
-        # FIXED: Use await directly
-        orders = await orders_collection.find(orders_query)
-        employees = await employees_collection.find({})
+        # Per-employee totals, grouped over columnar order data
+        orders = await load_order_columns(orders_query, ("employee_id", "total_amount"))
+        order_count = len(orders)
+        employee_totals = orders.totals_by("employee_id")
         
         # If no orders found, return empty report with success
-        if not orders:
+        if order_count == 0:
             report_data = {
                 "period": {
                     "start_date": start_dt.isoformat(),
@@ -719,28 +727,20 @@ async def get_employee_performance_report(
                 message="No orders found for the selected period"
             )
         
-        # Group orders by employee
-        employee_orders = defaultdict(list)
-        for order in orders:
-            emp_id = order.get("employee_id")
-            if emp_id:
-                employee_orders[str(emp_id)].append(order)
-        
         # Process each employee
         performance_data = []
-        employee_dict = {}
-        for emp in employees:
-            emp_id = str(emp.get("_id", ""))
-            employee_dict[emp_id] = emp
+        employee_dict = await _fetch_by_ids(
+            "employees", list(employee_totals), {"first_name": 1, "last_name": 1, "store_id": 1}
+        )
         
-        for emp_id, orders_list in employee_orders.items():
+        for emp_id, totals in employee_totals.items():
             employee = employee_dict.get(emp_id)
             if not employee:
                 continue
             
             # Calculate order metrics
-            total_orders = len(orders_list)
-            total_revenue = sum(o.get("total_amount", 0) or 0 for o in orders_list)
+            total_orders = totals["orders"]
+            total_revenue = totals["revenue"]
             avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
             
             performance_data.append({
@@ -795,12 +795,27 @@ async def get_employee_performance_report(
 
 @router.get("/customer/analysis")
 async def get_customer_analysis_report(
+    request: Request,
     start_date: str = Query(..., description="Start date in YYYY-MM-DD format"),
     end_date: str = Query(..., description="End date in YYYY-MM-DD format"),
     store_id: Optional[str] = Query(None),
     min_orders: int = Query(1, description="Minimum orders to be included")
 ):
     """Generate customer behavior analysis report from real data"""
+    return await cached_report(
+        request,
+        lambda: _get_customer_analysis_report(start_date, end_date, store_id, min_orders),
+        store_id=store_id,
+        period=report_period(start_date, end_date)
+    )
+
+async def _get_customer_analysis_report(
+    start_date: str,
+    end_date: str,
+    store_id: Optional[str] = None,
+    min_orders: int = 1
+):
+    """Compute the customer analysis report response"""
     try:
         # Parse dates
         try:
@@ -827,16 +842,15 @@ async def get_customer_analysis_report(
             else:
                 return error_response(message="Invalid store ID format", code=400)
         
-        # Get collections
-        orders_collection = get_collection("orders")
-        customers_collection = get_collection("customers")
-        
-        # FIXED: Use await directly
-        orders = await orders_collection.find(query)
-        customers = await customers_collection.find({})
+        # Per-customer metrics, grouped over columnar order data
+        orders = await load_order_columns(
+            query, ("created_at", "total_amount", "customer_id", "items")
+        )
+        order_count = len(orders)
+        customer_stats = orders.customer_stats()
         
         # If no orders found, return empty report with success
-        if not orders:
+        if order_count == 0:
             report_data = {
                 "period": {
                     "start_date": start_dt.isoformat(),
@@ -877,63 +891,34 @@ async def get_customer_analysis_report(
                 message="No orders found for the selected period"
             )
         
-        # Group orders by customer
-        customer_orders = {}
-        for order in orders:
-            customer_id = order.get("customer_id")
-            if customer_id:
-                customer_id_str = str(customer_id)
-                if customer_id_str not in customer_orders:
-                    customer_orders[customer_id_str] = []
-                customer_orders[customer_id_str].append(order)
-        
         # Prepare customer analysis
         customer_analysis = []
-        customer_dict = {}
-        for c in customers:
-            customer_id = str(c.get("_id", ""))
-            customer_dict[customer_id] = c
+        qualifying_ids = [cid for cid, stats in customer_stats.items() if stats["orders"] >= min_orders]
+        customer_dict = await _fetch_by_ids(
+            "customers",
+            qualifying_ids,
+            {"first_name": 1, "last_name": 1, "email": 1, "phone_number": 1, "loyalty_points": 1}
+        )
         
-        for customer_id, orders_list in customer_orders.items():
-            if len(orders_list) < min_orders:
-                continue
-            
+        for customer_id in qualifying_ids:
+            stats = customer_stats[customer_id]
             customer = customer_dict.get(customer_id)
             
             # Calculate metrics
-            total_spent = sum(o.get("total_amount", 0) or 0 for o in orders_list)
-            avg_spend = total_spent / len(orders_list)
+            total_spent = stats["total_spent"]
+            avg_spend = total_spent / stats["orders"]
             
             # Calculate visit frequency
-            order_dates = []
-            for order in orders_list:
-                order_date = order.get("created_at")
-                if isinstance(order_date, datetime):
-                    order_dates.append(order_date.date())
-                elif isinstance(order_date, str):
-                    try:
-                        order_dates.append(datetime.fromisoformat(order_date.replace('Z', '+00:00')).date())
-                    except:
-                        pass
-            
-            unique_visit_days = len(set(order_dates))
+            unique_visit_days = stats["unique_visit_days"]
             avg_days_between_visits = 0
-            if len(order_dates) > 1:
-                order_dates.sort()
-                total_days = (order_dates[-1] - order_dates[0]).days
-                avg_days_between_visits = total_days / (len(order_dates) - 1)
-            
-            # Calculate favorite items
-            item_counts = defaultdict(int)
-            for order in orders_list:
-                for item in order.get("items", []):
-                    item_name = item.get("name", "Unknown")
-                    item_counts[item_name] += item.get("quantity", 0) or 0
+            if stats["dated_orders"] > 1:
+                total_days = (stats["last_date"] - stats["first_date"]).days
+                avg_days_between_visits = total_days / (stats["dated_orders"] - 1)
             
-            favorite_item = max(item_counts.items(), key=lambda x: x[1]) if item_counts else ("None", 0)
+            favorite_item = stats["favorite_item"]
             
             # Calculate customer value
-            customer_value_score = (total_spent * len(orders_list)) / (avg_days_between_visits + 1)
+            customer_value_score = (total_spent * stats["orders"]) / (avg_days_between_visits + 1)
             
             customer_analysis.append({
                 "customer_id": customer_id,
@@ -941,7 +926,7 @@ async def get_customer_analysis_report(
                         if customer else f"Customer {customer_id[:8]}",
                 "email": customer.get("email") if customer else None,
                 "phone": customer.get("phone_number") if customer else None,
-                "total_orders": len(orders_list),
+                "total_orders": stats["orders"],
                 "total_spent": total_spent,
                 "average_spend": avg_spend,
                 "unique_visit_days": unique_visit_days,
@@ -950,7 +935,7 @@ async def get_customer_analysis_report(
                 "favorite_item_quantity": favorite_item[1],
                 "loyalty_points": customer.get("loyalty_points", 0) if customer else 0,
                 "customer_value_score": round(customer_value_score, 2),
-                "last_order_date": max(order_dates).isoformat() if order_dates else None
+                "last_order_date": stats["last_date"].isoformat() if stats["last_date"] else None
             })
         
         # Sort by customer value
@@ -1011,6 +996,95 @@ async def get_customer_analysis_report(
 
 # ==================== OTHER ENDPOINTS ====================
 
+# --- Queued report generation ---
+
+# Report ids as listed by /available
+REPORT_GENERATORS = {
+    "financial": _get_financial_report,
+    "sales_daily": _get_daily_sales_report,
+    "inventory": _get_inventory_report,
+    "employee_performance": _get_employee_performance_report,
+    "customer_analysis": _get_customer_analysis_report,
+}
+
+@job_handler(GENERATE_REPORT_JOB)
+async def _generate_report(data: Dict[str, Any]):
+    """Compute a queued report and store the result; server errors are raised so the job is retried"""
+    result = await REPORT_GENERATORS[data["report"]](**data.get("params", {}))
+    if result.get("code", 200) >= 500:
+        raise RuntimeError(result.get("message", "Report generation failed"))
+    
+    await get_collection(REPORT_RESULTS_COLLECTION).update_one(
+        {"_id": data["job_id"]},
+        {"$set": {"status": "completed", "result": jsonable_encoder(result), "completed_at": datetime.utcnow()}}
+    )
+
+@router.post("/jobs")
+async def queue_report(
+    report: str = Body(..., description="Report id from /api/reports/available"),
+    params: Dict[str, Any] = Body({}, description="The report's query parameters")
+):
+    """Queue a report to be generated off the request path; poll status_url for the result"""
+    generate = REPORT_GENERATORS.get(report)
+    if generate is None:
+        return error_response(
+            message=f"Unknown report '{report}'. Available: {', '.join(REPORT_GENERATORS)}",
+            code=400
+        )
+    try:
+        inspect.signature(generate).bind(**params)
+    except TypeError as e:
+        return error_response(message=f"Invalid parameters for {report} report: {e}", code=400)
+    
+    try:
+        job_id = str(uuid.uuid4())
+        await get_collection(REPORT_RESULTS_COLLECTION).insert_one({
+            "_id": job_id,
+            "report": report,
+            "params": params,
+            "status": "pending",
+            "created_at": datetime.utcnow()
+        })
+        await enqueue(GENERATE_REPORT_JOB, {"job_id": job_id, "report": report, "params": params}, job_uuid=job_id)
+        
+        return success_response(
+            data={"job_id": job_id, "status": "pending", "status_url": f"/api/reports/jobs/{job_id}"},
+            message="Report queued for generation",
+            code=202
+        )
+    except Exception as e:
+        return error_response(message=f"Error queueing report: {str(e)}", code=500)
+
+@router.get("/jobs/{job_id}")
+async def get_report_job(job_id: str):
+    """Status of a queued report, with the report itself once it has been generated"""
+    try:
+        job = await get_collection(REPORT_RESULTS_COLLECTION).find_one({"_id": job_id})
+        if not job:
+            return error_response(message="Report job not found", code=404)
+        
+        data = {
+            "job_id": job_id,
+            "report": job["report"],
+            "params": job.get("params", {}),
+            "status": job["status"],
+            "created_at": job.get("created_at")
+        }
+        if job["status"] == "completed":
+            data["completed_at"] = job.get("completed_at")
+            data["result"] = job.get("result")
+            return success_response(data=data)
+        
+        failed = await get_collection(FAILED_JOBS_COLLECTION).find_one({"uuid": job_id}, {"failed_at": 1})
+        if failed:
+            data["status"] = "failed"
+            data["failed_at"] = failed.get("failed_at")
+            return success_response(data=data, message="Report generation failed")
+        
+        return success_response(data=data, message="Report is still being generated", code=202)
+    except Exception as e:
+        return error_response(message=f"Error fetching report job: {str(e)}", code=500)
+
 @router.get("/available")
 async def get_available_reports():
     """Get list of available report types"""
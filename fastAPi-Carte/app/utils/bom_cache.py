@@ -0,0 +1,112 @@
+# app/utils/bom_cache.py - IN-PROCESS BILL-OF-MATERIALS CACHE
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId
+from app.database import get_collection
+from app.logging_config import get_logger
+
+logger = get_logger("api.bom_cache")
+
+# Entries also expire after this long, covering food edits made by other processes
+BOM_CACHE_TTL_SECONDS = float(os.getenv("BOM_CACHE_TTL_SECONDS", "300"))
+
+# Flattened recipe: ((inventory_product_id, quantity_used), ...)
+Bom = Tuple[Tuple[str, float], ...]
+
+
+class _BomEntry:
+    __slots__ = ("bom", "recipes", "loaded_at")
+
+    def __init__(self, recipes: List[Dict[str, Any]], loaded_at: float):
+        self.recipes = recipes
+        self.bom: Bom = tuple(
+            (str(recipe["inventory_product_id"]), float(recipe["quantity_used"]))
+            for recipe in recipes
+            if recipe.get("inventory_product_id") and recipe.get("quantity_used") is not None
+        )
+        self.loaded_at = loaded_at
+
+
+class UnknownFoodError(Exception):
+    """Some requested foods don't exist, so their recipes are unknown"""
+
+    def __init__(self, food_ids: Iterable[str]):
+        self.food_ids = sorted(food_ids)
+        super().__init__(f"Unknown food_id(s): {', '.join(self.food_ids)}")
+
+
+class BomCache:
+    """Maps food_id to its flattened recipe, loaded lazily from the foods collection"""
+
+    def __init__(self, ttl_seconds: float = BOM_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, _BomEntry] = {}
+        self._all_loaded_at: Optional[float] = None
+        # Bumped by every invalidation so loads that overlap a write aren't cached
+        self._generation = 0
+
+    def _fresh(self, loaded_at: Optional[float]) -> bool:
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl_seconds
+
+    async def _load(self, query: Dict[str, Any]) -> Dict[str, _BomEntry]:
+        """Load matching foods and return their entries; they are cached unless invalidated meanwhile"""
+        now = time.monotonic()
+        generation = self._generation
+        foods_collection = get_collection("foods")
+        loaded = {}
+        async for food in foods_collection.iter_find(query, projection={"recipes": 1}):
+            loaded[str(food["_id"])] = _BomEntry(food.get("recipes") or [], now)
+        if generation == self._generation:
+            self._entries.update(loaded)
+        return loaded
+
+    async def get_many(self, food_ids: Iterable[str], strict: bool = True) -> Dict[str, Bom]:
+        """
+        BOMs for the given foods, fetching any missing or expired ones in a single query.
+        Raises UnknownFoodError for foods that don't exist unless strict is False,
+        in which case they are left out.
+        """
+        food_ids = set(food_ids)
+        # Taken before awaiting, so a concurrent invalidation can't drop foods from the result
+        entries: Dict[str, _BomEntry] = {}
+        stale = []
+        for food_id in food_ids:
+            entry = self._entries.get(food_id)
+            if entry is not None and self._fresh(entry.loaded_at):
+                entries[food_id] = entry
+            elif ObjectId.is_valid(food_id):
+                stale.append(food_id)
+        if stale:
+            loaded = await self._load({"_id": {"$in": [ObjectId(food_id) for food_id in stale]}})
+            entries.update(loaded)
+        missing = food_ids - set(entries)
+        if missing and strict:
+            raise UnknownFoodError(missing)
+        return {food_id: entry.bom for food_id, entry in entries.items()}
+
+    async def all_recipes(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Raw recipe lists for every food, loading the whole collection at most once per TTL"""
+        if self._fresh(self._all_loaded_at):
+            return {food_id: entry.recipes for food_id, entry in self._entries.items()}
+        generation = self._generation
+        loaded = await self._load({})
+        if generation == self._generation:
+            # Swapped in whole, so foods deleted since the last snapshot drop out
+            self._entries = dict(loaded)
+            self._all_loaded_at = time.monotonic()
+        return {food_id: entry.recipes for food_id, entry in loaded.items()}
+
+    def invalidate(self, food_id: Optional[str] = None) -> None:
+        """Drop one food (or everything) after a write to the foods collection"""
+        self._generation += 1
+        if food_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(food_id, None)
+        # Any write can add, change or remove a food, so the full snapshot is stale too
+        self._all_loaded_at = None
+        logger.info(f"BOM cache invalidated for {food_id or 'all foods'}")
+
+
+bom_cache = BomCache()
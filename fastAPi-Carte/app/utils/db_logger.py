@@ -71,6 +71,9 @@ def log_insert(collection: str, data: dict = None, result: any = None):
 def log_update(collection: str, query: dict = None, data: dict = None, result: any = None):
     DBLogger.log_operation("update", collection, query, data, result)
 
+def log_bulk_write(collection: str, operations: list = None, result: any = None):
+    DBLogger.log_operation("bulk_write", collection, data=operations, result=result)
+
 def log_delete(collection: str, query: dict = None, result: any = None):
     DBLogger.log_operation("delete", collection, query, result=result)
 
@@ -0,0 +1,116 @@
+# app/utils/events.py - ORDER EVENT BUS (IN-PROCESS PUB/SUB WITH PLUGGABLE TRANSPORT)
+"""
+Order events are published from the write paths and fanned out to every
+subscriber in this process (e.g. SSE connections from kitchen screens).
+
+ORDER_EVENTS_BACKEND selects how events reach other workers:
+  memory (default) - single process; publish fans out locally
+  mongo            - publish inserts into the order_events collection and each
+                     process tails it with a change stream (needs a replica set)
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+from app.logging_config import get_logger
+
+logger = get_logger("api.events")
+
+ORDER_EVENTS_BACKEND = os.getenv("ORDER_EVENTS_BACKEND", "memory").lower()
+ORDER_EVENTS_COLLECTION = "order_events"
+
+# How long events stay in order_events when the mongo backend is used (TTL index in app/indexes.py)
+ORDER_EVENTS_TTL_SECONDS = int(os.getenv("ORDER_EVENTS_TTL_SECONDS", "3600"))
+
+# Per-subscriber buffer; slow consumers lose their oldest events rather than blocking publishers
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class Subscription:
+    """A subscriber's queue, optionally limited to one store"""
+
+    def __init__(self, bus: "EventBus", store_id: Optional[str]):
+        self.bus = bus
+        self.store_id = store_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        if self.store_id and event.get("store_id") != self.store_id:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next event, or None if nothing arrived within timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    def __init__(self, backend: str = ORDER_EVENTS_BACKEND):
+        self.backend = backend
+        self._subscriptions: Set[Subscription] = set()
+        self._watcher: Optional[asyncio.Task] = None
+
+    def subscribe(self, store_id: Optional[str] = None) -> Subscription:
+        subscription = Subscription(self, store_id)
+        self._subscriptions.add(subscription)
+        if self.backend == "mongo" and (self._watcher is None or self._watcher.done()):
+            self._watcher = asyncio.create_task(self._watch_mongo())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def _fan_out(self, event: Dict[str, Any]) -> None:
+        for subscription in list(self._subscriptions):
+            subscription.offer(event)
+
+    async def publish(self, event_type: str, order: Dict[str, Any], **extra: Any) -> None:
+        """Publish an order event; failures are logged and never propagate to the request"""
+        try:
+            order_id = order.get("id") or order.get("_id")
+            event = {
+                "type": event_type,
+                "order_id": str(order_id) if order_id else None,
+                "store_id": str(order["store_id"]) if order.get("store_id") else None,
+                "status": order.get("status"),
+                "payment_status": order.get("payment_status"),
+                "timestamp": datetime.utcnow().isoformat(),
+                **extra
+            }
+            if self.backend == "mongo":
+                from app.database import get_collection
+                await get_collection(ORDER_EVENTS_COLLECTION).insert_one({**event, "created_at": datetime.utcnow()})
+            else:
+                self._fan_out(event)
+        except Exception as e:
+            logger.error(f"Failed to publish {event_type} event: {e}")
+
+    async def _watch_mongo(self) -> None:
+        """Tail order_events with a change stream and fan out to local subscribers"""
+        from app.database import get_collection
+
+        collection = get_collection(ORDER_EVENTS_COLLECTION)
+        while self._subscriptions:
+            try:
+                async with collection.watch([{"$match": {"operationType": "insert"}}]) as stream:
+                    async for change in stream:
+                        event = dict(change["fullDocument"])
+                        event.pop("_id", None)
+                        event.pop("created_at", None)
+                        self._fan_out(event)
+                        if not self._subscriptions:
+                            break
+            except Exception as e:
+                logger.error(f"Order event change stream failed, retrying: {e}")
+                await asyncio.sleep(1)
+
+
+event_bus = EventBus()
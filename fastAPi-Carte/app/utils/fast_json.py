@@ -0,0 +1,122 @@
+# app/utils/fast_json.py - TRUSTED FAST-PATH JSON RESPONSES
+"""
+Opt-in fast path for endpoints that return documents straight from MongoDB.
+
+The default path copies every document (transform_mongo_response),
+revalidates it against the route's response_model and walks it again with
+jsonable_encoder. Here a TrustedShape derived once from the response model
+projects the query down to the model's fields and lays each document out in
+the model's field order, filling defaults for missing fields, and orjson
+writes the result to bytes with ObjectId and datetime handled natively.
+
+Values are returned as stored, without coercion, so this is only for
+collections written through the API's own models. The route keeps its
+response_model for the OpenAPI schema; returning a Response skips its
+validation.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Type
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi.responses import Response
+from pydantic import BaseModel
+from app.logging_config import get_logger
+from app.models.base import nested_model
+
+logger = get_logger("api.response")
+
+_MISSING = object()
+
+
+def _encode_default(value: Any) -> Any:
+    """Types orjson doesn't serialise itself"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_encode_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class TrustedShape:
+    """A response model's fields as a Mongo projection plus a cheap document-to-item layout"""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.fields = []
+        for name, field in model.model_fields.items():
+            nested, is_list = nested_model(field.annotation)
+            self.fields.append((
+                name,
+                field.default if not field.is_required() and field.default_factory is None else None,
+                field.default_factory,
+                trusted_shape(nested) if nested is not None else None,
+                is_list
+            ))
+        self.projection: Dict[str, int] = {}
+        for name, _, _, shape, _ in self.fields:
+            if name == "id":
+                # Top-level documents carry _id; embedded ones usually an id
+                self.projection["_id"] = 1
+                self.projection["id"] = 1
+            elif shape is None:
+                self.projection[name] = 1
+            else:
+                for nested_name in shape.projection:
+                    self.projection[f"{name}.{nested_name}"] = 1
+
+    def project(self, *extra_fields: str) -> Dict[str, int]:
+        """Projection including any extra fields the caller needs internally (e.g. a sort key)"""
+        projection = dict(self.projection)
+        for name in extra_fields:
+            projection.setdefault(name, 1)
+        return projection
+
+    def to_item(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Lay a document out as the response model would, without validating it"""
+        item = {}
+        for name, default, factory, shape, is_list in self.fields:
+            value = document.get(name, _MISSING)
+            if value is _MISSING and name == "id":
+                value = document.get("_id", _MISSING)
+                if isinstance(value, ObjectId):
+                    value = str(value)
+            if value is _MISSING:
+                value = factory() if factory is not None else default
+            elif shape is not None and value is not None:
+                if is_list:
+                    value = [shape.to_item(entry) if isinstance(entry, dict) else entry for entry in value]
+                elif isinstance(value, dict):
+                    value = shape.to_item(value)
+            item[name] = value
+        return item
+
+
+@lru_cache(maxsize=128)
+def trusted_shape(model: Type[BaseModel]) -> TrustedShape:
+    """Build the shape once per response model"""
+    return TrustedShape(model)
+
+
+def trusted_response(data: Any, message: str = "success", code: int = 200, **extra: Any) -> FastJSONResponse:
+    """
+    success_response for data already laid out by TrustedShape.to_item; extra
+    holds any further envelope fields the route's response_model declares,
+    e.g. pagination.
+    """
+    logger.info(
+        f"SUCCESS RESPONSE | Code: {code} | Message: {message} | Fast path",
+        extra={
+            "response_code": code,
+            "response_message": message,
+            "data_type": type(data).__name__,
+            "data_count": len(data) if isinstance(data, list) else 1 if data else 0
+        }
+    )
+    return FastJSONResponse(content={"code": code, "message": message, "data": data, **extra})
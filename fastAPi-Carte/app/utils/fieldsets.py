@@ -0,0 +1,86 @@
+# app/utils/fieldsets.py - SPARSE FIELDSETS (?fields=a,b,c)
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Type
+from bson import ObjectId
+from fastapi import Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, create_model
+
+
+class InvalidFieldsError(ValueError):
+    """Raised when ?fields= names a field the model does not have"""
+
+
+def fields_param(
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return, e.g. fields=name,price")
+) -> Optional[List[str]]:
+    """FastAPI dependency parsing the sparse fieldset; None means return full documents"""
+    if not fields:
+        return None
+    requested = []
+    for name in fields.split(","):
+        name = name.strip()
+        if name and name not in requested:
+            requested.append(name)
+    return requested or None
+
+
+@lru_cache(maxsize=256)
+def _sparse_model(model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """Build (once per model/fieldset) a model holding only the requested fields, all optional"""
+    definitions = {
+        name: (Optional[model.model_fields[name].annotation], None)
+        for name in fields
+    }
+    return create_model(
+        f"{model.__name__}Fields",
+        __config__=ConfigDict(arbitrary_types_allowed=True),
+        **definitions
+    )
+
+
+class Fieldset:
+    """A validated sparse fieldset: the Mongo projection plus the trimmed model for one item model"""
+
+    def __init__(self, item_model: Type[BaseModel], fields: List[str]):
+        unknown = [name for name in fields if name not in item_model.model_fields]
+        if unknown:
+            raise InvalidFieldsError(f"Unknown field(s) for {item_model.__name__}: {', '.join(unknown)}")
+
+        # The id is always returned so list views can key their rows
+        names = ["id"] + [name for name in fields if name != "id"]
+        self.model = _sparse_model(item_model, tuple(names))
+        self.projection: Dict[str, int] = {name: 1 for name in names if name != "id"}
+
+    def project(self, *extra_fields: str) -> Dict[str, int]:
+        """Projection including any extra fields the caller needs internally (e.g. a sort key)"""
+        projection = dict(self.projection)
+        for name in extra_fields:
+            if name != "_id":
+                projection[name] = 1
+        return projection
+
+    def to_item(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate a projected document against the trimmed model and dump it"""
+        data = {}
+        for key, value in document.items():
+            if key == "_id":
+                key = "id"
+            data[key] = str(value) if isinstance(value, ObjectId) else value
+        return self.model(**data).model_dump()
+
+
+def resolve_fieldset(item_model: Type[BaseModel], fields: Optional[List[str]]) -> Optional[Fieldset]:
+    """Return a Fieldset for the request, or None when full documents were asked for"""
+    if not fields:
+        return None
+    return Fieldset(item_model, fields)
+
+
+def sparse_json_response(payload: Dict[str, Any]) -> JSONResponse:
+    """
+    Return the payload directly, bypassing the route's response_model, whose
+    required fields a sparse item would not satisfy.
+    """
+    return JSONResponse(content=jsonable_encoder(payload))
@@ -0,0 +1,115 @@
+# app/utils/idempotency.py - IDEMPOTENCY-KEY SUPPORT FOR RETRIED POSTS
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import DuplicateKeyError
+from app.database import get_collection
+from app.utils.response_helpers import error_response
+from app.logging_config import get_logger
+
+logger = get_logger("api.idempotency")
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+
+# How long a key is remembered; expiry is enforced by a TTL index on created_at (see app/indexes.py)
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+# How long an in_progress marker holds its key. A marker left behind by a
+# crashed process is taken over by the next retry once this runs out, so it
+# must outlast the slowest handler.
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+def _fingerprint(payload: Any) -> Optional[str]:
+    if payload is None:
+        return None
+    encoded = json.dumps(jsonable_encoder(payload, custom_encoder={ObjectId: str}), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+async def run_idempotent(
+    key: Optional[str],
+    scope: str,
+    handler: Callable[[], Awaitable[Dict[str, Any]]],
+    payload: Any = None
+) -> Dict[str, Any]:
+    """
+    Run handler once per (scope, key). A repeat within the TTL returns the stored
+    response without running the handler again; a repeat while the first request
+    is still running gets a 409, unless that request's lease has run out, in
+    which case the repeat takes the key over. Without a key the handler simply runs.
+    """
+    if not key:
+        return await handler()
+
+    collection = get_collection(IDEMPOTENCY_COLLECTION)
+    record_id = f"{scope}:{key}"
+    fingerprint = _fingerprint(payload)
+    owner = uuid.uuid4().hex
+    now = datetime.utcnow()
+    locked_until = now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+
+    try:
+        await collection.insert_one({
+            "_id": record_id,
+            "status": "in_progress",
+            "request_hash": fingerprint,
+            "owner": owner,
+            "locked_until": locked_until,
+            "created_at": now
+        })
+    except DuplicateKeyError:
+        existing = await collection.find_one({"_id": record_id})
+        if existing and fingerprint and existing.get("request_hash") not in (None, fingerprint):
+            return error_response(
+                message=f"{IDEMPOTENCY_HEADER} was already used with a different request body",
+                code=422
+            )
+        if existing and existing.get("status") == "completed":
+            logger.info(f"Replaying stored response for idempotency key {record_id}")
+            return existing["response"]
+
+        # Take over a marker whose request died without cleaning up
+        taken = await collection.find_one_and_update(
+            {
+                "_id": record_id,
+                "status": "in_progress",
+                "$or": [{"locked_until": {"$lt": now}}, {"locked_until": {"$exists": False}}]
+            },
+            {"$set": {"owner": owner, "locked_until": locked_until, "request_hash": fingerprint}}
+        )
+        if taken is None:
+            return error_response(
+                message=f"A request with this {IDEMPOTENCY_HEADER} is still being processed",
+                code=409
+            )
+        logger.warning(f"Took over stale idempotency key {record_id}")
+
+    try:
+        response = await handler()
+    except BaseException:
+        # Includes cancellation (client disconnect, shutdown): let the client retry with the same key
+        await collection.delete_one({"_id": record_id, "owner": owner})
+        raise
+
+    # Server errors are not remembered, so a retry gets a fresh attempt
+    if isinstance(response, dict) and response.get("code", 200) >= 500:
+        await collection.delete_one({"_id": record_id, "owner": owner})
+        return response
+
+    await collection.update_one(
+        {"_id": record_id, "owner": owner},
+        {"$set": {
+            "status": "completed",
+            "response": jsonable_encoder(response, custom_encoder={ObjectId: str}),
+            "completed_at": datetime.utcnow()
+        }}
+    )
+    return response
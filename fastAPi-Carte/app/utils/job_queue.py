@@ -0,0 +1,284 @@
+# app/utils/job_queue.py - DURABLE BACKGROUND JOBS ON THE jobs / failed_jobs COLLECTIONS
+"""
+Slow work is stored as a document in jobs and executed by a worker, so it is
+off the request path and survives restarts.
+
+Job documents follow the Job model: queue, payload (JSON holding the job's
+uuid, handler name, data and max_attempts), attempts, reserved_at and
+available_at (unix seconds). The uuid is also stored as a top-level field with
+a unique index, so a job enqueued under a fixed uuid is queued at most once. A worker claims the oldest available job with
+one find_one_and_update that reserves it and increments attempts. The
+reservation is a lease: it is renewed while the handler runs, and a job
+whose lease lapses (its worker died) can be claimed again. Completion and
+retry writes are fenced on attempts, so a worker that lost its lease can't
+touch a job another worker has claimed since.
+
+A handler that raises is retried after JOB_BACKOFF_SECONDS * 2^(attempts-1),
+capped at JOB_MAX_BACKOFF_SECONDS. After max_attempts, or on
+PermanentJobError, the job moves to failed_jobs with its traceback. Jobs can
+run more than once, so handlers must be idempotent.
+
+Workers run inside the API process (unless JOB_WORKER_IN_PROCESS=false)
+and/or as separate processes:
+
+    python worker.py --queues default --concurrency 4
+"""
+import asyncio
+import importlib
+import json
+import os
+import time
+import traceback
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set
+from pymongo import ASCENDING, ReturnDocument
+from app.database import get_collection
+from app.logging_config import get_logger
+
+logger = get_logger("api.jobs")
+
+JOBS_COLLECTION = "jobs"
+FAILED_JOBS_COLLECTION = "failed_jobs"
+DEFAULT_QUEUE = "default"
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_BACKOFF_SECONDS = int(os.getenv("JOB_BACKOFF_SECONDS", "10"))
+JOB_MAX_BACKOFF_SECONDS = int(os.getenv("JOB_MAX_BACKOFF_SECONDS", "3600"))
+# Idle workers poll this often for jobs enqueued by other processes
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_WORKER_IN_PROCESS = os.getenv("JOB_WORKER_IN_PROCESS", "true").lower() == "true"
+JOB_WORKER_QUEUES = [queue.strip() for queue in os.getenv("JOB_WORKER_QUEUES", DEFAULT_QUEUE).split(",") if queue.strip()]
+
+# Modules whose import registers job handlers
+JOB_HANDLER_MODULES = (
+    "app.routes.hr",
+    "app.routes.payfast_itn",
+    "app.routes.reports",
+    "app.utils.payment_processor",
+    "app.utils.sales_rollup",
+)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for a failure retrying can't fix; the job fails without further attempts"""
+
+
+def job_handler(name: str) -> Callable[[JobHandler], JobHandler]:
+    """Register an async function taking the job's data dict as the handler for name"""
+    def register(func: JobHandler) -> JobHandler:
+        JOB_HANDLERS[name] = func
+        return func
+    return register
+
+
+def load_job_handlers() -> None:
+    for module in JOB_HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+def backoff_seconds(attempts: int) -> int:
+    """Delay before retrying a job that has failed `attempts` times"""
+    return min(JOB_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0), JOB_MAX_BACKOFF_SECONDS)
+
+
+async def enqueue(
+    name: str,
+    data: Optional[Dict[str, Any]] = None,
+    queue: str = DEFAULT_QUEUE,
+    delay_seconds: int = 0,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+    job_uuid: Optional[str] = None
+) -> str:
+    """
+    Store a job for the workers and return its uuid. Raises DuplicateKeyError
+    if a job with the given job_uuid is still queued.
+    """
+    job_uuid = job_uuid or str(uuid.uuid4())
+    now = int(time.time())
+    payload = {"uuid": job_uuid, "job": name, "data": data or {}, "max_attempts": max_attempts}
+    await get_collection(JOBS_COLLECTION).insert_one({
+        "uuid": job_uuid,
+        "queue": queue,
+        "payload": json.dumps(payload, default=str),
+        "attempts": 0,
+        "reserved_at": None,
+        "available_at": now + int(delay_seconds),
+        "created_at": now
+    })
+    if _in_process_worker is not None and not delay_seconds:
+        _in_process_worker.wake(queue)
+    return job_uuid
+
+
+async def claim_job(queues: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """Lease the oldest available job on any of the queues"""
+    now = int(time.time())
+    return await get_collection(JOBS_COLLECTION).find_one_and_update(
+        {
+            "queue": {"$in": list(queues)},
+            "available_at": {"$lte": now},
+            "$or": [{"reserved_at": None}, {"reserved_at": {"$lte": now - JOB_LEASE_SECONDS}}]
+        },
+        {"$set": {"reserved_at": now}, "$inc": {"attempts": 1}},
+        sort=[("available_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def _renew_lease(fence: Dict[str, Any]) -> None:
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        try:
+            await get_collection(JOBS_COLLECTION).update_one(fence, {"$set": {"reserved_at": int(time.time())}})
+        except Exception as e:
+            logger.warning(f"Failed to renew lease for job {fence['_id']}: {e}")
+
+
+async def _fail(job: Dict[str, Any], fence: Dict[str, Any], job_uuid: str, error: str) -> None:
+    """Record the job in failed_jobs, then remove it from jobs"""
+    await get_collection(FAILED_JOBS_COLLECTION).insert_one({
+        "uuid": job_uuid,
+        "connection": "mongodb",
+        "queue": job.get("queue", DEFAULT_QUEUE),
+        "payload": job.get("payload", ""),
+        "exception": error,
+        "failed_at": datetime.utcnow().isoformat()
+    })
+    await get_collection(JOBS_COLLECTION).delete_one(fence)
+
+
+async def run_job(job: Dict[str, Any]) -> None:
+    """Run one claimed job and delete, reschedule or fail it depending on the outcome"""
+    jobs_collection = get_collection(JOBS_COLLECTION)
+    fence = {"_id": job["_id"], "attempts": job["attempts"]}
+
+    try:
+        payload = json.loads(job["payload"])
+    except (KeyError, TypeError, ValueError) as e:
+        await _fail(job, fence, str(job["_id"]), f"Unreadable payload: {e}")
+        return
+    job_uuid = payload.get("uuid") or str(job["_id"])
+    name = payload.get("job")
+
+    handler = JOB_HANDLERS.get(name)
+    if handler is None:
+        logger.error(f"No handler registered for job {name} ({job_uuid})")
+        await _fail(job, fence, job_uuid, f"No handler registered for job {name}")
+        return
+
+    lease = asyncio.create_task(_renew_lease(fence))
+    try:
+        await handler(payload.get("data") or {})
+        error = None
+    except Exception as e:
+        error = e
+        trace = traceback.format_exc()
+    finally:
+        lease.cancel()
+
+    if error is None:
+        await jobs_collection.delete_one(fence)
+        return
+
+    if isinstance(error, PermanentJobError) or job["attempts"] >= payload.get("max_attempts", JOB_MAX_ATTEMPTS):
+        logger.error(f"Job {name} ({job_uuid}) failed after {job['attempts']} attempts: {error}")
+        await _fail(job, fence, job_uuid, trace)
+        return
+
+    delay = backoff_seconds(job["attempts"])
+    logger.warning(f"Job {name} ({job_uuid}) failed on attempt {job['attempts']}, retrying in {delay}s: {error}")
+    await jobs_collection.update_one(
+        fence, {"$set": {"reserved_at": None, "available_at": int(time.time()) + delay}}
+    )
+
+
+class JobWorker:
+    """Claims and runs jobs from some queues, at most `concurrency` at a time"""
+
+    def __init__(
+        self,
+        queues: Optional[Sequence[str]] = None,
+        concurrency: int = JOB_WORKER_CONCURRENCY,
+        poll_seconds: float = JOB_POLL_SECONDS
+    ):
+        self.queues: List[str] = list(queues or JOB_WORKER_QUEUES)
+        self.concurrency = max(1, concurrency)
+        self.poll_seconds = poll_seconds
+        self._wake = asyncio.Event()
+        self._running: Set[asyncio.Task] = set()
+
+    def wake(self, queue: Optional[str] = None) -> None:
+        """Skip the poll delay, e.g. because a job was just enqueued"""
+        if queue is None or queue in self.queues:
+            self._wake.set()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        try:
+            await run_job(job)
+        except Exception as e:
+            logger.error(f"Job {job.get('_id')} could not be settled: {e}")
+
+    async def run(self) -> None:
+        """Claim jobs until cancelled"""
+        load_job_handlers()
+        slots = asyncio.Semaphore(self.concurrency)
+        logger.info(f"Job worker started on {', '.join(self.queues)} with concurrency {self.concurrency}")
+
+        while True:
+            await slots.acquire()
+            self._wake.clear()
+            try:
+                job = await claim_job(self.queues)
+            except Exception as e:
+                logger.error(f"Failed to claim job: {e}")
+                job = None
+
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._run(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def drain(self, timeout: float) -> None:
+        """Wait for running jobs; any still running after timeout are cancelled and retried once their lease lapses"""
+        if not self._running:
+            return
+        _, pending = await asyncio.wait(set(self._running), timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+
+_in_process_worker: Optional[JobWorker] = None
+_in_process_task: Optional[asyncio.Task] = None
+
+
+def start_in_process_worker() -> None:
+    """Run a worker inside the API process, unless JOB_WORKER_IN_PROCESS is false"""
+    global _in_process_worker, _in_process_task
+    if not JOB_WORKER_IN_PROCESS or _in_process_task is not None:
+        return
+    _in_process_worker = JobWorker()
+    _in_process_task = asyncio.create_task(_in_process_worker.run())
+
+
+async def stop_in_process_worker(timeout: float = 10) -> None:
+    global _in_process_worker, _in_process_task
+    if _in_process_task is None:
+        return
+    _in_process_task.cancel()
+    await _in_process_worker.drain(timeout)
+    _in_process_worker = None
+    _in_process_task = None
@@ -4,30 +4,72 @@ from bson import ObjectId
 from datetime import datetime, date
 from app.models.base import MongoModel
 
-def transform_mongo_response(data: Any) -> Any:
+# Types that can't hold an _id or ObjectId; returned without a closer look
+_LEAF_TYPES = frozenset({str, int, float, bool, type(None), datetime, date, bytes})
+
+def transform_mongo_response(data: Any, in_place: bool = False) -> Any:
     """
-    Transform MongoDB response to match Pydantic models by converting _id to id.
+    Transform MongoDB response to match Pydantic models by converting _id to id
+    and ObjectIds to strings, at any depth.
     KEEP datetime objects as datetime objects - don't convert to strings.
+    
+    Dicts and lists that need no change are returned as they are and only the
+    ones on the way to a change are copied, so data that is already in API
+    shape (e.g. Pydantic output) is walked once without copying. Pass
+    in_place=True when the caller owns the data to change it directly.
     """
-    if isinstance(data, dict):
-        data = data.copy()
-        if '_id' in data:
-            if isinstance(data['_id'], ObjectId):
-                data['id'] = str(data['_id'])
-            else:
-                data['id'] = data['_id']
-            del data['_id']
-        # Recursively transform nested dictionaries and lists
-        for key, value in data.items():
-            data[key] = transform_mongo_response(value)
+    cls = data.__class__
+    if cls in _LEAF_TYPES:
         return data
-    elif isinstance(data, list):
-        return [transform_mongo_response(item) for item in data]
-    elif isinstance(data, ObjectId):
+    if cls is ObjectId:
         return str(data)
-    # REMOVED: Don't convert datetime to string - keep as datetime object
+    if isinstance(data, dict):
+        return _transform_dict(data, in_place)
+    if isinstance(data, list):
+        return _transform_list(data, in_place)
     return data
 
+def _transform_dict(data: dict, in_place: bool) -> dict:
+    changed = None
+    for key, value in data.items():
+        cls = value.__class__
+        if cls in _LEAF_TYPES:
+            continue
+        # Plain dicts and lists are dispatched directly; this runs for every nested value
+        if cls is dict:
+            transformed = _transform_dict(value, in_place)
+        elif cls is list:
+            transformed = _transform_list(value, in_place)
+        else:
+            transformed = transform_mongo_response(value, in_place)
+        if transformed is not value:
+            if changed is None:
+                changed = {}
+            changed[key] = transformed
+    has_id = '_id' in data
+    if changed is None and not has_id:
+        return data
+    
+    result = data if in_place else data.copy()
+    if changed:
+        result.update(changed)
+    if has_id:
+        result['id'] = result.pop('_id')
+    return result
+
+def _transform_list(data: list, in_place: bool) -> list:
+    result = data if in_place else None
+    for index, item in enumerate(data):
+        cls = item.__class__
+        if cls in _LEAF_TYPES:
+            continue
+        transformed = _transform_dict(item, in_place) if cls is dict else transform_mongo_response(item, in_place)
+        if transformed is not item:
+            if result is None:
+                result = list(data)
+            result[index] = transformed
+    return data if result is None else result
+
 def to_mongo_dict(model_instance: MongoModel, exclude_unset: bool = False) -> Dict[str, Any]:
     """
     Convert a model instance to a MongoDB dictionary, setting timestamps and removing immutable fields.
@@ -60,9 +102,15 @@ def to_mongo_update_dict(model_instance: MongoModel, exclude_unset: bool = True)
     data["updated_at"] = now  # Store as datetime
     return data
 
-def prepare_response_data(data: Any) -> Any:
+def prepare_response_data(data: Any, in_place: bool = False) -> Any:
     """
     Prepare data for API response by transforming MongoDB format to API format.
     KEEP datetime objects as datetime objects.
     """
-    return transform_mongo_response(data)
\ No newline at end of file
+    return transform_mongo_response(data, in_place)
+
+def inserted_document(document: Dict[str, Any], result: Any) -> Dict[str, Any]:
+    """
+    The document as stored by insert_one, without reading it back.
+    """
+    return {**document, "_id": result.inserted_id}
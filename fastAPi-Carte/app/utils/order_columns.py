@@ -0,0 +1,338 @@
+# app/utils/order_columns.py - COLUMNAR (NUMPY) AGGREGATION OVER RAW ORDERS
+"""
+Reports that can't be answered from the hourly rollups scan raw orders.
+Rather than folding every order into dict accumulators, the fields a report
+needs are loaded once into parallel NumPy arrays:
+
+  created_at       int64 microseconds since the epoch, UTC (MISSING_TIME if unparsable)
+  total_amount     float64
+  status, store_id, employee_id, customer_id, payment_method
+                   int32 codes into a label list; code 0 is a missing value.
+                   Ids are labelled by str(), so ObjectId and string ids match
+  items            one row per line item: parent order index, item key and
+                   name codes, quantity and sub_total
+
+Group-bys are then np.bincount / np.unique / ufunc.at over the code arrays,
+so the per-order Python work is limited to copying fields into lists.
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from app.database import get_collection
+from app.utils.sales_rollup import SalesSummary, field_key, utc_datetime
+
+MISSING_TIME = int(np.iinfo(np.int64).min)
+US_PER_HOUR = 3_600_000_000
+US_PER_DAY = 86_400_000_000
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+CATEGORICAL_COLUMNS = ("status", "store_id", "employee_id", "customer_id", "payment_method")
+# Stored as ObjectId by some writers and as strings by others
+ID_COLUMNS = ("store_id", "employee_id", "customer_id")
+ORDER_COLUMNS = ("created_at", "total_amount", *CATEGORICAL_COLUMNS, "items")
+# What to_summary() reads
+SUMMARY_COLUMNS = tuple(column for column in ORDER_COLUMNS if column != "store_id")
+
+# Orders buffered by OrderColumnsBuilder before their fields are copied into column lists
+BUILD_CHUNK_SIZE = 10000
+
+# Projection for each column; items only needs the fields the aggregations read
+_COLUMN_PROJECTION = {
+    "items": {"items.food_id": 1, "items.name": 1, "items.quantity": 1, "items.sub_total": 1}
+}
+
+
+def _factorise(values: List[Any]) -> Tuple[np.ndarray, List[Any]]:
+    """Codes into a label list in first-seen order; falsy values get code 0 (label None)"""
+    labels: List[Any] = [None]
+    index: Dict[Any, int] = {}
+    for value in dict.fromkeys(values):
+        if value:
+            index[value] = len(labels)
+            labels.append(value)
+        else:
+            index[value] = 0
+    codes = np.fromiter(map(index.__getitem__, values), dtype=np.int32, count=len(values))
+    return codes, labels
+
+
+def _relabel(codes: np.ndarray, labels: List[Any], relabel) -> Tuple[np.ndarray, List[Any]]:
+    """Apply relabel to each distinct label (not each row), merging labels that map to the same value"""
+    mapped_codes, mapped_labels = _factorise([relabel(label) for label in labels])
+    return mapped_codes[codes], mapped_labels
+
+
+def _microseconds(value: Any) -> int:
+    if type(value) is not datetime or value.tzinfo is not None:
+        value = utc_datetime(value)
+        if value is None:
+            return MISSING_TIME
+    return (value - EPOCH) // ONE_MICROSECOND
+
+
+def _timestamps(values: List[Any]) -> np.ndarray:
+    # Plain timedelta arithmetic is several times faster than NumPy's datetime object conversion
+    return np.fromiter(map(_microseconds, values), dtype=np.int64, count=len(values))
+
+
+def _quantities(values: List[Any]) -> np.ndarray:
+    array = np.array(values) if values else np.zeros(0, dtype=np.int64)
+    return array if array.dtype.kind in "iuf" else array.astype(np.float64)
+
+
+def _sum_by(codes: np.ndarray, weights: np.ndarray, size: int) -> np.ndarray:
+    """Per-code sums, kept integral when the weights are"""
+    sums = np.bincount(codes, weights=weights, minlength=size)
+    return sums.astype(np.int64) if weights.dtype.kind in "iu" else sums
+
+
+def _day(days: int) -> date:
+    return (EPOCH + timedelta(days=int(days))).date()
+
+
+class OrderColumns:
+    """Orders as parallel arrays; build with OrderColumnsBuilder or load_order_columns()"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.created_at: Optional[np.ndarray] = None
+        self.total_amount: Optional[np.ndarray] = None
+        self.codes: Dict[str, np.ndarray] = {}
+        self.labels: Dict[str, List[Any]] = {}
+        # Line items
+        self.item_order: Optional[np.ndarray] = None
+        self.item_key: Optional[np.ndarray] = None
+        self.item_keys: List[Any] = [None]
+        self.item_name: Optional[np.ndarray] = None
+        self.item_names: List[Any] = [None]
+        self.item_quantity: Optional[np.ndarray] = None
+        self.item_revenue: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _is(self, column: str, label: Any) -> np.ndarray:
+        """Mask of orders whose column equals label"""
+        matching = [code for code, value in enumerate(self.labels[column]) if value == label]
+        return np.isin(self.codes[column], matching)
+
+    def _groups(self, column: str, mask: Optional[np.ndarray] = None) -> List[Tuple[Any, int, float]]:
+        """(label, order count, total_amount sum) for each value of column among the masked orders"""
+        codes = self.codes[column] if mask is None else self.codes[column][mask]
+        amounts = self.total_amount if mask is None else self.total_amount[mask]
+        size = len(self.labels[column])
+        counts = np.bincount(codes, minlength=size)
+        sums = np.bincount(codes, weights=amounts, minlength=size)
+        return [(self.labels[column][code], int(counts[code]), float(sums[code])) for code in np.flatnonzero(counts)]
+
+    def _last_names(self) -> np.ndarray:
+        """Name code of the last named row for each item key"""
+        names = np.zeros(len(self.item_keys), dtype=np.int32)
+        named = np.flatnonzero(self.item_name)
+        if len(named):
+            reversed_keys = self.item_key[named][::-1]
+            keys, first = np.unique(reversed_keys, return_index=True)
+            names[keys] = self.item_name[named][::-1][first]
+        return names
+
+    def to_summary(self) -> SalesSummary:
+        """The SalesSummary SalesSummary.add_order would build from the same orders"""
+        summary = SalesSummary()
+        cancelled = self._is("status", "cancelled")
+        live = ~cancelled
+        amounts = self.total_amount
+
+        summary.orders = self.size
+        summary.revenue = float(amounts[live].sum())
+        summary.cancelled_orders = int(cancelled.sum())
+        summary.cancelled_revenue = float(amounts[cancelled].sum())
+
+        for status, count, _ in self._groups("status"):
+            summary.status[field_key(status or "unknown")] += count
+        for method, _, revenue in self._groups("payment_method", live):
+            summary.payment_methods[field_key(method or "unknown")] += revenue
+        for column, totals in (("customer_id", summary.customers), ("employee_id", summary.employees)):
+            for person_id, count, revenue in self._groups(column, live):
+                if person_id:
+                    totals[field_key(person_id)]["orders"] += count
+                    totals[field_key(person_id)]["revenue"] += revenue
+
+        # Items of non-cancelled orders; names come from every order, as in the rollups
+        names = self._last_names()
+        live_items = live[self.item_order]
+        size = len(self.item_keys)
+        counts = np.bincount(self.item_key[live_items], minlength=size)
+        quantities = _sum_by(self.item_key[live_items], self.item_quantity[live_items], size)
+        revenues = _sum_by(self.item_key[live_items], self.item_revenue[live_items], size)
+        for code in np.flatnonzero(counts | names):
+            item = summary.items[self.item_keys[code]]
+            item["name"] = self.item_names[names[code]] or item["name"]
+            item["quantity"] += quantities[code].item()
+            item["revenue"] += revenues[code].item()
+
+        # Hours as offsets from the earliest, so bincount can group them without sorting
+        dated = self.created_at != MISSING_TIME
+        hours = self.created_at[dated] // US_PER_HOUR
+        first_hour = int(hours.min()) if len(hours) else 0
+        hour_orders = np.bincount(hours - first_hour)
+        hour_revenue = np.bincount(hours - first_hour, weights=np.where(live, amounts, 0)[dated])
+        for offset in np.flatnonzero(hour_orders).tolist():
+            summary.by_hour[EPOCH + timedelta(hours=first_hour + offset)] = {
+                "orders": int(hour_orders[offset]), "revenue": float(hour_revenue[offset])
+            }
+        if not dated.all():
+            summary.by_hour[None] = {
+                "orders": int((~dated).sum()),
+                "revenue": float(amounts[~dated & live].sum())
+            }
+        return summary
+
+    def totals_by(self, column: str) -> Dict[str, Dict[str, float]]:
+        """Order count and total_amount per value of column, over every order (cancelled included)"""
+        return {
+            value: {"orders": count, "revenue": revenue}
+            for value, count, revenue in self._groups(column) if value
+        }
+
+    def customer_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-customer order, spend, visit and favourite-item figures for the customer analysis report"""
+        codes = self.codes["customer_id"]
+        size = len(self.labels["customer_id"])
+        orders = np.bincount(codes, minlength=size)
+        spent = np.bincount(codes, weights=self.total_amount, minlength=size)
+
+        # Visits, as UTC days
+        dated = (codes > 0) & (self.created_at != MISSING_TIME)
+        visit_codes = codes[dated]
+        days = self.created_at[dated] // US_PER_DAY
+        dated_orders = np.bincount(visit_codes, minlength=size)
+        first_day = np.full(size, np.iinfo(np.int64).max)
+        last_day = np.full(size, np.iinfo(np.int64).min)
+        np.minimum.at(first_day, visit_codes, days)
+        np.maximum.at(last_day, visit_codes, days)
+        visit_days = np.zeros(size, dtype=np.int64)
+        if len(days):
+            span = int(days.max() - days.min()) + 1
+            visits = np.unique(visit_codes.astype(np.int64) * span + (days - days.min()))
+            visit_days = np.bincount(visits // span, minlength=size)
+
+        # Favourite item: the name with the largest quantity across the customer's orders
+        favourites: Dict[int, Tuple[Any, Any]] = {}
+        item_customers = codes[self.item_order]
+        has_customer = item_customers > 0
+        if has_customer.any():
+            name_count = len(self.item_names)
+            pairs, inverse = np.unique(
+                item_customers[has_customer].astype(np.int64) * name_count + self.item_name[has_customer],
+                return_inverse=True
+            )
+            pair_quantity = _sum_by(inverse, self.item_quantity[has_customer], len(pairs))
+            pair_customer = pairs // name_count
+            ranked = np.lexsort((-pair_quantity, pair_customer))
+            best = ranked[np.r_[True, pair_customer[ranked][1:] != pair_customer[ranked][:-1]]]
+            for pair in best:
+                name = self.item_names[pairs[pair] % name_count]
+                favourites[int(pair_customer[pair])] = ("Unknown" if name is None else name, pair_quantity[pair].item())
+
+        stats = {}
+        for code in np.flatnonzero(orders):
+            if code == 0:
+                continue
+            has_dates = dated_orders[code] > 0
+            stats[self.labels["customer_id"][code]] = {
+                "orders": int(orders[code]),
+                "total_spent": float(spent[code]),
+                "dated_orders": int(dated_orders[code]),
+                "first_date": _day(first_day[code]) if has_dates else None,
+                "last_date": _day(last_day[code]) if has_dates else None,
+                "unique_visit_days": int(visit_days[code]),
+                "favorite_item": favourites.get(int(code), ("None", 0))
+            }
+        return stats
+
+
+class OrderColumnsBuilder:
+    """Collects orders in chunks, copying their fields into column lists, and converts those to arrays once"""
+
+    def __init__(self, columns: Sequence[str] = ORDER_COLUMNS):
+        self.columns = tuple(columns)
+        self._values: Dict[str, List[Any]] = {column: [] for column in self.columns if column != "items"}
+        self._items: Dict[str, List[Any]] = {
+            field: [] for field in ("count", "key", "name", "quantity", "sub_total")
+        } if "items" in self.columns else {}
+        self._chunk: List[Dict[str, Any]] = []
+        self.size = 0
+
+    def add(self, order: Dict[str, Any]) -> None:
+        self._chunk.append(order)
+        if len(self._chunk) >= BUILD_CHUNK_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        chunk, self._chunk = self._chunk, []
+        for column, values in self._values.items():
+            values.extend([order.get(column) for order in chunk])
+        if self._items:
+            item_lists = [order.get("items") or () for order in chunk]
+            items = [item for order_items in item_lists for item in order_items]
+            self._items["count"].extend([len(order_items) for order_items in item_lists])
+            self._items["key"].extend([item.get("food_id") or item.get("name") for item in items])
+            self._items["name"].extend([item.get("name") for item in items])
+            self._items["quantity"].extend([item.get("quantity", 0) or 0 for item in items])
+            self._items["sub_total"].extend([item.get("sub_total", 0) or 0 for item in items])
+        self.size += len(chunk)
+
+    def build(self) -> OrderColumns:
+        self._flush()
+        columns = OrderColumns(self.size)
+        columns.created_at = (
+            _timestamps(self._values["created_at"]) if "created_at" in self._values
+            else np.full(self.size, MISSING_TIME, dtype=np.int64)
+        )
+        columns.total_amount = np.array(
+            [amount or 0 for amount in self._values.get("total_amount", [0] * self.size)], dtype=np.float64
+        )
+        for column in CATEGORICAL_COLUMNS:
+            codes, labels = _factorise(self._values.get(column, [None] * self.size))
+            if column in ID_COLUMNS:
+                # Merged before grouping, so both spellings of an id fall in one group
+                codes, labels = _relabel(codes, labels, lambda label: str(label) if label else None)
+            columns.codes[column], columns.labels[column] = codes, labels
+
+        items = self._items or {field: [] for field in ("count", "key", "name", "quantity", "sub_total")}
+        columns.item_order = np.repeat(
+            np.arange(self.size, dtype=np.int64), np.array(items["count"] or [0] * self.size, dtype=np.int64)
+        )
+        # Keyed like the rollups: sales_rollup.item_key() applied per distinct food_id / name
+        columns.item_key, columns.item_keys = _relabel(
+            *_factorise(items["key"]), lambda label: field_key(label or "unknown")
+        )
+        columns.item_name, columns.item_names = _factorise(items["name"])
+        columns.item_quantity = _quantities(items["quantity"])
+        columns.item_revenue = _quantities(items["sub_total"])
+        return columns
+
+
+def order_columns(orders: Iterable[Dict[str, Any]], columns: Sequence[str] = ORDER_COLUMNS) -> OrderColumns:
+    builder = OrderColumnsBuilder(columns)
+    for order in orders:
+        builder.add(order)
+    return builder.build()
+
+
+async def load_order_columns(query: Dict[str, Any], columns: Sequence[str] = ORDER_COLUMNS) -> OrderColumns:
+    """Stream the matching orders' columns into arrays"""
+    projection: Dict[str, int] = {}
+    for column in columns:
+        projection.update(_COLUMN_PROJECTION.get(column, {column: 1}))
+
+    builder = OrderColumnsBuilder(columns)
+    async for order in get_collection("orders").iter_find(query, projection=projection):
+        builder.add(order)
+    return builder.build()
+
+
+async def summarise_orders(query: Dict[str, Any]) -> SalesSummary:
+    """Build the rollup-style summary straight from raw orders, for filters the rollups aren't broken down by"""
+    return (await load_order_columns(query, SUMMARY_COLUMNS)).to_summary()
@@ -0,0 +1,219 @@
+# app/utils/order_transitions.py - COMPARE-AND-SET ORDER STATUS TRANSITIONS
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ReturnDocument
+from app.database import get_collection
+
+# Allowed next statuses for each order status
+ORDER_TRANSITIONS: Dict[str, List[str]] = {
+    "new": ["preparing", "cancelled"],
+    "preparing": ["ready", "served", "cancelled"],
+    "ready": ["served", "cancelled"],
+    "served": ["paid", "cancelled"],
+    "paid": [],
+    "cancelled": []
+}
+
+# Statuses from which an order can no longer be cancelled
+NON_CANCELLABLE_STATUSES = ["paid", "completed"]
+
+# Statuses from which an order can be paid
+PAYABLE_STATUSES = ["served", "ready"]
+
+# Order payment_status while an attempt holds the order, and once that attempt has failed
+PAYMENT_IN_PROGRESS = "processing"
+PAYMENT_DECLINED = "failed"
+
+# Payment attempt statuses that still hold the order
+_OPEN_ATTEMPT_STATUSES = ["pending", "processing"]
+
+
+class TransitionRejected(Exception):
+    """The order exists but its current status does not allow the write"""
+
+    def __init__(self, current_status: Optional[str], message: str):
+        super().__init__(message)
+        self.current_status = current_status
+        self.message = message
+
+
+class OrderNotFound(Exception):
+    """No order with the given id"""
+
+
+class PaymentInProgress(Exception):
+    """Another payment attempt still holds the order"""
+
+    def __init__(self, payment_attempt_id: Optional[str]):
+        super().__init__("A payment for this order is already being processed")
+        self.payment_attempt_id = payment_attempt_id
+        self.message = str(self)
+
+
+# Reads and conditional writes tried before giving up on an order that keeps changing
+TRANSITION_ATTEMPTS = 5
+
+
+def allowed_sources(new_status: str) -> List[str]:
+    """Statuses an order may be in for a move to new_status"""
+    return [status for status, targets in ORDER_TRANSITIONS.items() if new_status in targets]
+
+
+async def _transition(
+    oid: ObjectId,
+    changes: Dict[str, Any],
+    rejection: Callable[[Dict[str, Any]], Optional[str]]
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Read the fields the write changes, let rejection() refuse it (by returning
+    a message), then write with those fields pinned to the values read. The
+    order after the write is returned by the write itself; the order before it
+    is that document with the pinned values put back, which is exact because
+    the filter guaranteed them. If another write got in between, start over.
+    Returns (order before the write, order after the write).
+    """
+    orders_collection = get_collection("orders")
+    # Dotted keys change part of a top-level field, so the whole field is pinned
+    fields = {field.split(".", 1)[0] for field in changes} | {"status"}
+
+    for _ in range(TRANSITION_ATTEMPTS):
+        current = await orders_collection.find_one({"_id": oid}, projection={field: 1 for field in fields})
+        if not current:
+            raise OrderNotFound()
+        message = rejection(current)
+        if message:
+            raise TransitionRejected(current.get("status"), message)
+
+        # A missing field is pinned to None, which matches missing as well as null
+        pinned = {field: current.get(field) for field in fields}
+        after = await orders_collection.find_one_and_update(
+            {"_id": oid, **pinned},
+            {"$set": changes},
+            return_document=ReturnDocument.AFTER
+        )
+        if after is not None:
+            before = {field: value for field, value in after.items() if field not in fields}
+            before.update({field: current[field] for field in fields if field in current})
+            return before, after
+
+    raise TransitionRejected(current.get("status"), "Order was changed by another request, please retry")
+
+
+async def update_order_fields(order_id: str, update_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Apply update_data in one write. If it changes the status, the write only
+    happens while the order is in a status the new one may follow.
+    Returns (order before the write, order after the write).
+    """
+    new_status = update_data.get("status")
+    changes = {**update_data, "updated_at": datetime.utcnow().isoformat()}
+
+    def rejection(current: Dict[str, Any]) -> Optional[str]:
+        if new_status and current.get("status") not in allowed_sources(new_status):
+            return f"Invalid status transition from '{current.get('status')}' to '{new_status}'"
+        return None
+
+    return await _transition(ObjectId(order_id), changes, rejection)
+
+
+async def cancel_order_atomically(order_id: str, reason: Optional[str]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Cancel an order in one write unless it is already settled or cancelled.
+    Returns (order before the write, order after the write).
+    """
+    changes = {
+        "status": "cancelled",
+        "updated_at": datetime.utcnow().isoformat(),
+        "cancellation_reason": reason
+    }
+
+    def rejection(current: Dict[str, Any]) -> Optional[str]:
+        status = current.get("status")
+        if status == "cancelled":
+            return "Order is already cancelled"
+        if status in NON_CANCELLABLE_STATUSES:
+            return f"Cannot cancel order with status '{status}'"
+        return None
+
+    return await _transition(ObjectId(order_id), changes, rejection)
+
+
+async def mark_order_paid(
+    order_id: str,
+    update_data: Dict[str, Any],
+    payment_attempt_id: str
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Move an order to paid in one write, only while it is still payable, so an
+    order cancelled while its payment was processing stays cancelled. The order
+    records the paying attempt, and the same attempt may repeat the write.
+    Returns (order before the write, order after the write).
+    """
+    changes = {
+        **update_data,
+        "status": "paid",
+        "payment_attempt_id": payment_attempt_id,
+        "updated_at": datetime.utcnow().isoformat()
+    }
+
+    def rejection(current: Dict[str, Any]) -> Optional[str]:
+        status = current.get("status")
+        if status in PAYABLE_STATUSES or (status == "paid" and current.get("payment_attempt_id") == payment_attempt_id):
+            return None
+        return f"Order can no longer be paid: status is '{status}'"
+
+    return await _transition(ObjectId(order_id), changes, rejection)
+
+
+async def claim_order_payment(order_id: str, payment_attempt_id: str) -> None:
+    """
+    Mark a payable order as being paid by one attempt, in one write, so two
+    concurrent submits can't both start a charge. A claim whose attempt has
+    since settled, or no longer exists, is taken over.
+    Raises OrderNotFound, TransitionRejected if the order isn't payable, or
+    PaymentInProgress if another open attempt holds it.
+    """
+    orders_collection = get_collection("orders")
+    oid = ObjectId(order_id)
+    claim = {"$set": {
+        "payment_status": PAYMENT_IN_PROGRESS,
+        "payment_attempt_id": payment_attempt_id,
+        "updated_at": datetime.utcnow().isoformat()
+    }}
+    payable = {"_id": oid, "status": {"$in": PAYABLE_STATUSES}}
+
+    if await orders_collection.find_one_and_update(
+        {**payable, "payment_status": {"$ne": PAYMENT_IN_PROGRESS}}, claim, projection={"_id": 1}
+    ):
+        return
+
+    current = await orders_collection.find_one(
+        {"_id": oid}, projection={"status": 1, "payment_status": 1, "payment_attempt_id": 1}
+    )
+    if not current:
+        raise OrderNotFound()
+    status = current.get("status")
+    if status not in PAYABLE_STATUSES:
+        raise TransitionRejected(
+            status, f"Order must be 'served' or 'ready' for payment. Current status: {status}"
+        )
+
+    holder = current.get("payment_attempt_id")
+    holder_open = ObjectId.is_valid(holder or "") and await get_collection("payment_attempts").find_one(
+        {"_id": ObjectId(holder), "status": {"$in": _OPEN_ATTEMPT_STATUSES}}, projection={"_id": 1}
+    )
+    # Keyed on the previous holder, so only one of several concurrent takeovers wins
+    if not holder_open and await orders_collection.find_one_and_update(
+        {**payable, "payment_status": PAYMENT_IN_PROGRESS, "payment_attempt_id": holder}, claim, projection={"_id": 1}
+    ):
+        return
+    raise PaymentInProgress(holder)
+
+
+async def release_order_payment(order_id: str, payment_attempt_id: str) -> None:
+    """Give up an attempt's claim on an order after the attempt failed"""
+    await get_collection("orders").update_one(
+        {"_id": ObjectId(order_id), "payment_status": PAYMENT_IN_PROGRESS, "payment_attempt_id": payment_attempt_id},
+        {"$set": {"payment_status": PAYMENT_DECLINED, "updated_at": datetime.utcnow().isoformat()}}
+    )
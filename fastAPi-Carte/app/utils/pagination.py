@@ -0,0 +1,142 @@
+# app/utils/pagination.py - KEYSET (CURSOR) PAGINATION
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+from bson import ObjectId
+from fastapi import Query
+from pydantic import BaseModel
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+# Fields a list can be ordered by; both are walked newest first with _id as the tiebreaker
+SORTABLE_FIELDS = ("_id", "created_at")
+
+# created_at is a datetime on some documents and an ISO string on others. MongoDB
+# sorts by BSON type first (dates above strings), so a created_at walk goes
+# through the dates and then the strings. Documents whose created_at is null,
+# missing or of any other type have no place in that order and are excluded.
+KEY_TYPES = {"created_at": ("date", "string")}
+
+
+class InvalidCursorError(ValueError):
+    """Raised when an `after` cursor cannot be decoded"""
+
+
+class PageParams(BaseModel):
+    """Keyset pagination parameters shared by list endpoints"""
+    limit: Optional[int] = None
+    after: Optional[str] = None
+    order_by: str = "_id"
+
+    @property
+    def enabled(self) -> bool:
+        """Pagination is opt-in so existing clients keep receiving full lists"""
+        return self.limit is not None or self.after is not None
+
+    @property
+    def page_size(self) -> int:
+        return self.limit or DEFAULT_PAGE_LIMIT
+
+
+def page_params(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT, description="Page size; enables cursor pagination"),
+    after: Optional[str] = Query(None, description="Opaque cursor returned as pagination.next_cursor"),
+    order_by: str = Query("_id", regex="^(_id|created_at)$", description="Sort key, newest first; created_at leaves out documents without one")
+) -> PageParams:
+    """FastAPI dependency reading limit/after/order_by from the query string"""
+    return PageParams(limit=limit, after=after, order_by=order_by)
+
+
+# --- Cursor encoding ---
+
+def _encode_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, ObjectId):
+        return {"t": "oid", "v": str(value)}
+    if isinstance(value, datetime):
+        return {"t": "dt", "v": value.isoformat()}
+    return {"t": "raw", "v": value}
+
+def _decode_value(encoded: Dict[str, Any]) -> Any:
+    kind, value = encoded["t"], encoded["v"]
+    if kind == "oid":
+        return ObjectId(value)
+    if kind == "dt":
+        return datetime.fromisoformat(value)
+    return value
+
+def encode_cursor(document: Dict[str, Any], order_by: str) -> str:
+    """Build an opaque cursor pointing just past `document`"""
+    payload = {"o": order_by, "id": _encode_value(document["_id"])}
+    if order_by != "_id":
+        payload["k"] = _encode_value(document.get(order_by))
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, order_by: str) -> Dict[str, Any]:
+    """Decode a cursor produced by encode_cursor for the same order_by"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if payload.get("o") != order_by:
+            raise InvalidCursorError("Cursor was issued for a different order_by")
+        decoded = {"_id": _decode_value(payload["id"])}
+        if order_by != "_id":
+            decoded[order_by] = _decode_value(payload["k"])
+            if not isinstance(decoded[order_by], (datetime, str)):
+                raise InvalidCursorError(f"Cursor has no {order_by} to continue from")
+        return decoded
+    except InvalidCursorError:
+        raise
+    except Exception as e:
+        raise InvalidCursorError(f"Invalid pagination cursor: {e}")
+
+
+# --- Query helpers ---
+
+def build_page_query(query: Optional[Dict[str, Any]], page: PageParams) -> Tuple[Dict[str, Any], List[Tuple[str, int]]]:
+    """
+    Combine the caller's filter with the keyset condition and return (filter, sort).
+    Ordering by created_at excludes documents without a date or string created_at.
+    """
+    conditions = [query] if query else []
+    if page.order_by == "_id":
+        sort = [("_id", -1)]
+    else:
+        sort = [(page.order_by, -1), ("_id", -1)]
+        conditions.append({page.order_by: {"$type": list(KEY_TYPES[page.order_by])}})
+
+    if page.after:
+        position = decode_cursor(page.after, page.order_by)
+        if page.order_by == "_id":
+            conditions.append({"_id": {"$lt": position["_id"]}})
+        else:
+            key = position[page.order_by]
+            # $lt only matches values of the key's own type, so the walk moves on to
+            # the next type explicitly once a date cursor has passed the last date
+            keyset = [
+                {page.order_by: {"$lt": key}},
+                {page.order_by: key, "_id": {"$lt": position["_id"]}}
+            ]
+            if isinstance(key, datetime):
+                keyset.append({page.order_by: {"$type": "string"}})
+            conditions.append({"$or": keyset})
+
+    if len(conditions) > 1:
+        return {"$and": conditions}, sort
+    return (conditions[0] if conditions else {}), sort
+
+async def fetch_page(collection, query: Optional[Dict[str, Any]], page: PageParams, **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Fetch one page of raw documents and the cursor for the next one (None on the last page)"""
+    page_query, sort = build_page_query(query, page)
+    limit = page.page_size
+    # Read one extra document to learn whether another page exists without counting
+    documents = [
+        document async for document in collection.iter_find(page_query, sort=sort, limit=limit + 1, **kwargs)
+    ]
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1], page.order_by)
+    return documents, next_cursor
@@ -0,0 +1,191 @@
+# app/utils/payment_processor.py - BACKGROUND PAYMENT STATE MACHINE
+"""
+Payment attempts move pending -> processing -> completed | failed outside the
+request that created them. The request stores the attempt, queues a job and
+returns 202; the job runs process_payment_attempt() to advance it. Each transition is a conditional
+update on the current status, so running the processor twice for the same
+attempt is harmless.
+
+A job whose worker died is re-run by the job queue once its lease lapses; the
+re-run reclaims an attempt left in processing for longer than that lease. The
+gateway outcome is recorded on the attempt as soon as it is known, and the
+gateway is called with the attempt id as idempotency key, so a reclaimed
+attempt never charges twice. The order and the Payment record are keyed to
+the attempt as well, so a reclaim finishes the work instead of repeating it.
+Errors before the gateway is called fail the attempt; errors after it hand
+the attempt back to pending and propagate, so the job is retried.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.database import get_collection
+from app.models.core import Payment
+from app.utils.mongo_helpers import to_mongo_dict
+from app.utils.events import event_bus
+from app.utils.job_queue import JOB_LEASE_SECONDS, job_handler
+from app.utils.order_transitions import (
+    PAYABLE_STATUSES, OrderNotFound, TransitionRejected, mark_order_paid, release_order_payment
+)
+from app.utils.sales_rollup import record_order_change
+from app.logging_config import get_logger
+
+logger = get_logger("api.payments")
+
+PAYMENT_PENDING = "pending"
+PAYMENT_PROCESSING = "processing"
+PAYMENT_COMPLETED = "completed"
+PAYMENT_FAILED = "failed"
+
+PROCESS_PAYMENT_ATTEMPT_JOB = "payments.process_attempt"
+
+
+async def _charge(attempt: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Call the payment gateway for an attempt, with the attempt id as the
+    gateway's idempotency key so a repeated call returns the first charge.
+    There is no live gateway integration yet, so the outcome comes from
+    payment_data.simulate_success.
+    """
+    payment_data = attempt.get("payment_data") or {}
+    if payment_data.get("simulate_success", True):
+        transaction_id = payment_data.get("transaction_id") or f"TXN-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+        return {"success": True, "transaction_id": transaction_id}
+    return {"success": False, "error": payment_data.get("error_message", "Payment failed")}
+
+
+async def _fail_attempt(attempt_id: str, reason: str, order_id: Optional[str] = None) -> None:
+    """Settle an attempt as failed and let the order take a new one"""
+    await get_collection("payment_attempts").update_one(
+        {"_id": ObjectId(attempt_id), "status": PAYMENT_PROCESSING},
+        {"$set": {
+            "status": PAYMENT_FAILED,
+            "cancelled_at": datetime.utcnow().isoformat(),
+            "cancellation_reason": reason
+        }}
+    )
+    if order_id:
+        await release_order_payment(order_id, attempt_id)
+
+
+async def process_payment_attempt(attempt_id: str) -> None:
+    """Advance one payment attempt to a terminal state"""
+    payment_attempts_collection = get_collection("payment_attempts")
+    payments_collection = get_collection("payments")
+    orders_collection = get_collection("orders")
+
+    # Claim the attempt so only one processor charges it. A processing
+    # attempt older than the job lease belongs to a run whose worker died
+    # (the job queue only re-runs the job after that lease lapses).
+    started = datetime.utcnow()
+    stale_before = (started - timedelta(seconds=JOB_LEASE_SECONDS)).isoformat()
+    attempt = await payment_attempts_collection.find_one_and_update(
+        {"_id": ObjectId(attempt_id), "$or": [
+            {"status": PAYMENT_PENDING},
+            {"status": PAYMENT_PROCESSING, "processing_started_at": {"$lt": stale_before}}
+        ]},
+        {"$set": {"status": PAYMENT_PROCESSING, "processing_started_at": started.isoformat()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if attempt is None:
+        current = await payment_attempts_collection.find_one({"_id": ObjectId(attempt_id)}, projection={"status": 1})
+        if current and current.get("status") == PAYMENT_PROCESSING:
+            # Held by another run, or by a dead one whose lease hasn't lapsed yet: have the job retry
+            raise RuntimeError(f"Payment attempt {attempt_id} is still being processed")
+        return
+
+    order_id = attempt["order_id"]
+    payment_data = attempt.get("payment_data") or {}
+    # Set once the gateway may have been called; from then on errors are retried, never failed
+    charging = False
+
+    try:
+        outcome = attempt.get("charge")
+        if outcome is None:
+            # Don't charge for an order cancelled since the attempt was accepted
+            payable = await orders_collection.find_one(
+                {"_id": ObjectId(order_id), "status": {"$in": PAYABLE_STATUSES}},
+                projection={"_id": 1}
+            )
+            if not payable:
+                await _fail_attempt(attempt_id, "Order is no longer awaiting payment", order_id)
+                return
+
+            charging = True
+            outcome = await _charge(attempt)
+            # Recorded before anything else, so a reclaim reuses it instead of charging again;
+            # the Payment record's id is fixed here for the same reason
+            outcome["payment_record_id"] = str(ObjectId())
+            await payment_attempts_collection.update_one(
+                {"_id": ObjectId(attempt_id), "status": PAYMENT_PROCESSING},
+                {"$set": {"charge": outcome}}
+            )
+        else:
+            charging = True
+            logger.warning(f"Resuming payment attempt {attempt_id} with its recorded charge")
+
+        if not outcome["success"]:
+            await _fail_attempt(attempt_id, outcome["error"], order_id)
+            return
+
+        transaction_id = outcome["transaction_id"]
+
+        # The status filter makes this a compare-and-set: an order cancelled
+        # (or paid by another attempt) while the charge ran is left alone
+        try:
+            order, paid_order = await mark_order_paid(order_id, {
+                "payment_status": "paid",
+                "payment_method": payment_data.get("payment_method")
+            }, attempt_id)
+        except (OrderNotFound, TransitionRejected) as e:
+            reason = e.message if isinstance(e, TransitionRejected) else "Order not found"
+            logger.error(f"Payment attempt {attempt_id} charged ({transaction_id}) but not applied: {reason}")
+            await _fail_attempt(attempt_id, f"{reason}; transaction {transaction_id} needs a refund", order_id)
+            return
+
+        # Create payment record
+        payment = Payment(
+            order_id=order_id,
+            payment_method_id=payment_data.get("payment_method_id", ""),
+            amount=attempt.get("amount", 0),
+            payment_date=datetime.utcnow().isoformat(),
+            transaction_id=transaction_id,
+            status="completed"
+        )
+        payment_dict = to_mongo_dict(payment)
+        payment_dict["_id"] = ObjectId(outcome["payment_record_id"])
+        try:
+            await payments_collection.insert_one(payment_dict)
+        except DuplicateKeyError:
+            pass  # inserted by the run this one reclaimed from
+
+        await payment_attempts_collection.update_one(
+            {"_id": ObjectId(attempt_id), "status": PAYMENT_PROCESSING},
+            {"$set": {
+                "status": PAYMENT_COMPLETED,
+                "payment_id": str(payment_dict["_id"]),
+                "completed_at": datetime.utcnow().isoformat()
+            }}
+        )
+
+        await record_order_change(order, paid_order)
+        await event_bus.publish("order.paid", paid_order, payment_attempt_id=attempt_id)
+    except Exception as e:
+        if not charging:
+            logger.error(f"Payment attempt {attempt_id} failed during processing: {e}")
+            await _fail_attempt(attempt_id, f"Processing error: {e}", order_id)
+            return
+        # The customer may have been charged: hand the attempt back so the
+        # job's retry resumes from the recorded charge instead of failing it
+        logger.error(f"Payment attempt {attempt_id} failed after charging, retrying: {e}")
+        await payment_attempts_collection.update_one(
+            {"_id": ObjectId(attempt_id), "status": PAYMENT_PROCESSING, "processing_started_at": started.isoformat()},
+            {"$set": {"status": PAYMENT_PENDING}}
+        )
+        raise
+
+
+@job_handler(PROCESS_PAYMENT_ATTEMPT_JOB)
+async def _process_payment_attempt_job(data: Dict[str, Any]) -> None:
+    await process_payment_attempt(data["attempt_id"])
@@ -0,0 +1,183 @@
+# app/utils/report_cache.py - IN-PROCESS REPORT RESULT CACHE
+"""
+Caches report and analytics responses keyed by endpoint path and normalised
+query parameters, with LRU eviction and ETag / If-None-Match support.
+
+Reports whose period ends before today are closed: they expire after
+REPORT_CACHE_CLOSED_TTL_SECONDS and are otherwise only dropped by order writes
+that fall inside their period. Everything else expires after
+REPORT_CACHE_TTL_SECONDS and is dropped by any write to orders,
+inventory_products or employees for its store (or for any store, if the entry
+covers all stores). Inventory and employee figures inside a closed report are
+as of when it was computed.
+
+The cache is per process. Writes made by other API workers or by worker.py
+(payments, ITNs, report jobs) never reach it, so each entry is stale by at
+most its TTL.
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+REPORT_CACHE_TTL_SECONDS = float(os.getenv("REPORT_CACHE_TTL_SECONDS", "60"))
+# Closed periods rarely change, but a late write from another process can only be picked up on expiry
+REPORT_CACHE_CLOSED_TTL_SECONDS = float(os.getenv("REPORT_CACHE_CLOSED_TTL_SECONDS", "3600"))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "256"))
+
+# Collections whose writes can change a cached report
+REPORT_SOURCE_COLLECTIONS = frozenset({"orders", "inventory_products", "employees"})
+
+Period = Tuple[datetime, datetime]
+
+
+class _ReportEntry:
+    __slots__ = ("body", "etag", "store_id", "period", "closed", "expires_at")
+
+    def __init__(self, body: bytes, store_id: Optional[str], period: Optional[Period], closed: bool,
+                 expires_at: float):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.store_id = store_id
+        self.period = period
+        self.closed = closed
+        self.expires_at = expires_at
+
+    def covers(self, at: datetime) -> bool:
+        return self.period is not None and self.period[0] <= at <= self.period[1]
+
+
+def report_period(start_date: str, end_date: Optional[str] = None) -> Optional[Period]:
+    """The datetime range of YYYY-MM-DD report dates, or None if they don't parse"""
+    try:
+        return (
+            datetime.fromisoformat(start_date + "T00:00:00"),
+            datetime.fromisoformat((end_date or start_date) + "T23:59:59.999999")
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+class ReportCache:
+    def __init__(self, ttl_seconds: float = REPORT_CACHE_TTL_SECONDS,
+                 closed_ttl_seconds: float = REPORT_CACHE_CLOSED_TTL_SECONDS,
+                 max_entries: int = REPORT_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.closed_ttl_seconds = closed_ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _ReportEntry]" = OrderedDict()
+        # Bumped by every invalidation so results computed across a write aren't stored
+        self.generation = 0
+
+    @staticmethod
+    def make_key(path: str, params) -> str:
+        items = sorted((key, value) for key, value in params.multi_items() if value != "")
+        return path + "?" + "&".join(f"{key}={value}" for key, value in items)
+
+    def get(self, key: str) -> Optional[_ReportEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, result: Dict[str, Any], store_id: Optional[str], period: Optional[Period],
+            generation: int) -> _ReportEntry:
+        """Store a computed result unless something was invalidated while it was computed"""
+        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        closed = period is not None and period[1] < today_start
+        entry = _ReportEntry(
+            JSONResponse(content=jsonable_encoder(result)).body,
+            store_id,
+            period,
+            closed,
+            time.monotonic() + (self.closed_ttl_seconds if closed else self.ttl_seconds)
+        )
+        if generation == self.generation and self.max_entries > 0:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, store_id: Optional[str] = None, at: Optional[datetime] = None) -> int:
+        """
+        Drop entries a write may have changed. store_id None means the store is
+        unknown; at is the changed order's timestamp, without which closed
+        periods are kept. Returns the number of entries dropped.
+        """
+        self.generation += 1
+        stale = [
+            key for key, entry in self._entries.items()
+            if not (store_id and entry.store_id and entry.store_id != store_id)
+            and not (entry.closed and (at is None or not entry.covers(at)))
+        ]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names etag (weak comparison, as GETs use)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+async def cached_report(
+    request: Request,
+    compute: Callable[[], Awaitable[Dict[str, Any]]],
+    store_id: Optional[str] = None,
+    period: Optional[Period] = None
+):
+    """Serve a report from the cache, computing and storing it on a miss; error responses aren't cached"""
+    key = report_cache.make_key(request.url.path, request.query_params)
+    entry = report_cache.get(key)
+
+    if entry is None:
+        generation = report_cache.generation
+        result = await compute()
+        if not isinstance(result, dict) or result.get("code", 200) != 200:
+            return result
+        entry = report_cache.put(key, result, store_id, period, generation)
+
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers={"ETag": entry.etag})
+    return Response(content=entry.body, media_type="application/json", headers={"ETag": entry.etag})
+
+
+def invalidate_for_write(collection_name: str, *documents: Any) -> None:
+    """
+    Called after every logged write; drops open reports for the written store.
+    documents are whatever identifies it: inserted documents, filters, updates
+    or the document returned by find_one_and_update. If they don't name exactly
+    one store, all stores are invalidated.
+    """
+    if collection_name not in REPORT_SOURCE_COLLECTIONS:
+        return
+    stores = set()
+    for document in documents:
+        for doc in document if isinstance(document, list) else [document]:
+            if not isinstance(doc, dict):
+                continue
+            for source in (doc, doc.get("$set") or {}):
+                store_id = source.get("store_id")
+                if store_id is not None:
+                    stores.add(store_id if isinstance(store_id, str) else None)
+    report_cache.invalidate(stores.pop() if len(stores) == 1 else None)
+
+
+report_cache = ReportCache()
@@ -0,0 +1,11 @@
+# app/utils/report_jobs.py - QUEUED REPORT GENERATION SETTINGS
+"""
+Names shared by the queued report endpoints in app/routes/reports.py and the
+index registry, kept here so the registry doesn't import the reports router.
+"""
+import os
+
+REPORT_RESULTS_COLLECTION = "report_results"
+# Queued reports and their results are kept this long (TTL index in app/indexes.py)
+REPORT_RESULTS_TTL_SECONDS = int(os.getenv("REPORT_RESULTS_TTL_SECONDS", "86400"))
+GENERATE_REPORT_JOB = "reports.generate"
@@ -9,10 +9,14 @@ logger = get_logger("api.response")
 def success_response(
     data: Any = None, 
     message: str = "success", 
-    code: int = 200
+    code: int = 200,
+    in_place: bool = False
 ) -> Dict[str, Any]:
-    """Helper function to create success responses with MongoDB data transformation"""
-    transformed_data = prepare_response_data(data)
+    """
+    Helper function to create success responses with MongoDB data transformation.
+    in_place=True transforms data the caller owns without copying it.
+    """
+    transformed_data = prepare_response_data(data, in_place)
     
     # Log successful response
     logger.info(
@@ -37,10 +41,11 @@ def paginated_response(
     page: int,
     limit: int,
     message: str = "success",
-    code: int = 200
+    code: int = 200,
+    in_place: bool = False
 ) -> Dict[str, Any]:
     """Helper function for paginated responses with MongoDB data transformation"""
-    transformed_data = prepare_response_data(data)
+    transformed_data = prepare_response_data(data, in_place)
     total_pages = (total + limit - 1) // limit if limit > 0 else 1
     
     # Log paginated response
@@ -70,6 +75,46 @@ def paginated_response(
         }
     }
 
+def cursor_paginated_response(
+    data: Any,
+    limit: int,
+    next_cursor: Optional[str],
+    order_by: str = "_id",
+    message: str = "success",
+    code: int = 200,
+    in_place: bool = False
+) -> Dict[str, Any]:
+    """Helper function for keyset-paginated responses with MongoDB data transformation"""
+    transformed_data = prepare_response_data(data, in_place)
+
+    # Log paginated response
+    logger.info(
+        f"CURSOR PAGINATED RESPONSE | Code: {code} | Count: {len(transformed_data)} | Has next: {next_cursor is not None}",
+        extra={
+            "response_code": code,
+            "limit": limit,
+            "order_by": order_by,
+            "current_page_count": len(transformed_data),
+            "has_next": next_cursor is not None
+        }
+    )
+
+    return {
+        "code": code,
+        "message": message,
+        "data": transformed_data,
+        "pagination": cursor_pagination(limit, next_cursor, order_by)
+    }
+
+def cursor_pagination(limit: int, next_cursor: Optional[str], order_by: str = "_id") -> Dict[str, Any]:
+    """The pagination block of a keyset-paginated response"""
+    return {
+        "limit": limit,
+        "order_by": order_by,
+        "next_cursor": next_cursor,
+        "has_next": next_cursor is not None
+    }
+
 def error_response(
     message: str = "error",
     code: int = 400,
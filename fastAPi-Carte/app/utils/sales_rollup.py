@@ -0,0 +1,349 @@
+# app/utils/sales_rollup.py - HOURLY SALES ROLLUPS MAINTAINED ON ORDER WRITES
+"""
+sales_rollups holds one document per (store_id, hour) with the totals the
+dashboards and sales reports need, so a period costs one small document per
+store-hour to read instead of every order in it.
+
+Order write paths call record_order_change(before, after) with the order as
+it was and as it is now (None for creates and deletes). The difference
+between the two versions' contributions is applied with one $inc upsert, so
+each bucket always reflects its orders' current status, payment method and
+items.
+
+Every order counts towards orders and the status breakdown. Revenue, payment
+methods, items, customers and employees are net of cancelled orders, which
+are tracked in cancelled_orders / cancelled_revenue instead.
+
+Rollups can be rebuilt from raw orders at any time:
+
+    python -m app.utils.sales_rollup --backfill
+    python -m app.utils.sales_rollup --backfill --since 2025-01-01
+
+Reports read only the rollups, so orders written before rollups existed
+count for nothing until a backfill has run. Startup therefore queues one
+(schedule_initial_backfill) whenever sales_rollups is empty and orders is not.
+The job has a fixed uuid, so processes starting together queue it only once.
+"""
+import asyncio
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from app.database import get_collection
+from app.logging_config import get_logger
+from app.utils.job_queue import enqueue, job_handler
+from app.utils.report_cache import report_cache
+
+logger = get_logger("api.sales_rollup")
+
+SALES_ROLLUP_COLLECTION = "sales_rollups"
+
+# Order fields a rollup is computed from
+ROLLUP_ORDER_FIELDS = {
+    "store_id": 1, "created_at": 1, "total_amount": 1, "status": 1, "payment_method": 1,
+    "customer_id": 1, "employee_id": 1,
+    "items.food_id": 1, "items.name": 1, "items.quantity": 1, "items.sub_total": 1
+}
+
+# Documents per bulk_write call when backfilling
+BACKFILL_BATCH_SIZE = 500
+
+BACKFILL_JOB = "sales_rollup.backfill"
+# Job uuid of the startup backfill, so it is queued once however many processes start
+INITIAL_BACKFILL_JOB_UUID = "sales_rollup.initial_backfill"
+
+
+def field_key(value: Any) -> str:
+    """Make a value usable as a field name"""
+    return str(value).replace(".", "_").replace("$", "_") or "unknown"
+
+
+def utc_datetime(value: Any) -> Optional[datetime]:
+    """A stored timestamp (datetime or ISO string) as a naive UTC datetime"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_hour(value: Any) -> Optional[datetime]:
+    """The start of the UTC hour a timestamp falls in"""
+    value = utc_datetime(value)
+    if value is None:
+        return None
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _bucket(order: Dict[str, Any]) -> Optional[Tuple[Optional[str], datetime]]:
+    hour = bucket_hour(order.get("created_at"))
+    if hour is None:
+        return None
+    store_id = order.get("store_id")
+    return (str(store_id) if store_id else None, hour)
+
+
+def _rollup_id(store_id: Optional[str], hour: datetime) -> str:
+    return f"{store_id or '-'}|{hour.strftime('%Y-%m-%dT%H')}"
+
+
+def item_key(item: Dict[str, Any]) -> str:
+    return field_key(item.get("food_id") or item.get("name") or "unknown")
+
+
+def order_contribution(order: Dict[str, Any]) -> Dict[str, float]:
+    """The $inc fields one order adds to its hour bucket"""
+    amount = order.get("total_amount", 0) or 0
+    status = order.get("status") or "unknown"
+
+    fields: Dict[str, float] = defaultdict(int)
+    fields["orders"] = 1
+    fields[f"status.{field_key(status)}"] = 1
+
+    if status == "cancelled":
+        fields["cancelled_orders"] = 1
+        fields["cancelled_revenue"] = amount
+        return fields
+
+    fields["revenue"] = amount
+    fields[f"payment_methods.{field_key(order.get('payment_method') or 'unknown')}"] += amount
+
+    for item in order.get("items") or []:
+        key = item_key(item)
+        fields[f"items.{key}.quantity"] += item.get("quantity", 0) or 0
+        fields[f"items.{key}.revenue"] += item.get("sub_total", 0) or 0
+
+    for role in ("customer", "employee"):
+        person_id = order.get(f"{role}_id")
+        if person_id:
+            fields[f"{role}s.{field_key(person_id)}.orders"] += 1
+            fields[f"{role}s.{field_key(person_id)}.revenue"] += amount
+
+    return fields
+
+
+def _item_names(order: Dict[str, Any]) -> Dict[str, str]:
+    return {item_key(item): item["name"] for item in order.get("items") or [] if item.get("name")}
+
+
+def _add_order(flat: Dict[str, Any], order: Dict[str, Any]) -> None:
+    """Add one order's contribution and item names to flat (dotted) rollup fields"""
+    for field, value in order_contribution(order).items():
+        flat[field] += value
+    for key, name in _item_names(order).items():
+        flat[f"items.{key}.name"] = name
+
+
+def _nest(flat: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn dotted field names into the nested document $inc would have built"""
+    nested: Dict[str, Any] = {}
+    for path, value in flat.items():
+        parts = path.split(".")
+        target = nested
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return nested
+
+
+async def record_order_change(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+    """Apply the rollup delta for one order write; failures are logged and never propagate to the request"""
+    # Cached reports for closed periods are only dropped by order writes inside them
+    for order in (before, after):
+        bucket = _bucket(order) if order else None
+        if bucket is not None:
+            report_cache.invalidate(*bucket)
+
+    try:
+        changes: Dict[Tuple[Optional[str], datetime], Dict[str, Any]] = {}
+        for order, sign in ((before, -1), (after, 1)):
+            bucket = _bucket(order) if order else None
+            if bucket is None:
+                continue
+            change = changes.setdefault(bucket, {"inc": defaultdict(int), "names": {}})
+            for field, value in order_contribution(order).items():
+                change["inc"][field] += sign * value
+            if sign > 0:
+                change["names"].update(_item_names(order))
+
+        rollups_collection = get_collection(SALES_ROLLUP_COLLECTION)
+        for (store_id, hour), change in changes.items():
+            inc = {field: value for field, value in change["inc"].items() if value}
+            if not inc:
+                continue
+            update = {"$inc": inc, "$setOnInsert": {"store_id": store_id, "hour": hour}}
+            if change["names"]:
+                update["$set"] = {f"items.{key}.name": name for key, name in change["names"].items()}
+            await rollups_collection.update_one({"_id": _rollup_id(store_id, hour)}, update, upsert=True)
+    except Exception as e:
+        order = after or before or {}
+        logger.error(f"Failed to update sales rollup for order {order.get('_id')}: {e}")
+
+
+class SalesSummary:
+    """Totals merged from a range of hourly rollups"""
+
+    def __init__(self):
+        self.orders = 0
+        self.revenue = 0
+        self.cancelled_orders = 0
+        self.cancelled_revenue = 0
+        self.status: Dict[str, int] = defaultdict(int)
+        self.payment_methods: Dict[str, float] = defaultdict(float)
+        self.items: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"name": None, "quantity": 0, "revenue": 0})
+        self.customers: Dict[str, Dict[str, float]] = defaultdict(lambda: {"orders": 0, "revenue": 0})
+        self.employees: Dict[str, Dict[str, float]] = defaultdict(lambda: {"orders": 0, "revenue": 0})
+        # Keyed by hour start; None collects orders whose created_at couldn't be parsed
+        self.by_hour: Dict[Optional[datetime], Dict[str, float]] = defaultdict(lambda: {"revenue": 0, "orders": 0})
+
+    def add(self, rollup: Dict[str, Any]) -> None:
+        self.orders += rollup.get("orders", 0)
+        self.revenue += rollup.get("revenue", 0)
+        self.cancelled_orders += rollup.get("cancelled_orders", 0)
+        self.cancelled_revenue += rollup.get("cancelled_revenue", 0)
+
+        hour = self.by_hour[rollup["hour"]]
+        hour["orders"] += rollup.get("orders", 0)
+        hour["revenue"] += rollup.get("revenue", 0)
+
+        for status, count in (rollup.get("status") or {}).items():
+            self.status[status] += count
+        for method, amount in (rollup.get("payment_methods") or {}).items():
+            self.payment_methods[method] += amount
+        for key, item in (rollup.get("items") or {}).items():
+            totals = self.items[key]
+            totals["name"] = item.get("name") or totals["name"]
+            totals["quantity"] += item.get("quantity", 0)
+            totals["revenue"] += item.get("revenue", 0)
+        for role, totals in (("customers", self.customers), ("employees", self.employees)):
+            for person_id, person in (rollup.get(role) or {}).items():
+                totals[person_id]["orders"] += person.get("orders", 0)
+                totals[person_id]["revenue"] += person.get("revenue", 0)
+
+    def add_order(self, order: Dict[str, Any]) -> None:
+        """Add one raw order as if it were a rollup of its own"""
+        flat: Dict[str, Any] = defaultdict(int)
+        _add_order(flat, order)
+        self.add({"hour": bucket_hour(order.get("created_at")), **_nest(flat)})
+
+    def active(self, totals: Dict[str, Dict[str, float]]) -> Set[str]:
+        """Ids with at least one non-cancelled order in the range"""
+        return {person_id for person_id, person in totals.items() if person["orders"] > 0}
+
+
+async def load_sales_summary(start: datetime, end: datetime, store_id: Optional[str] = None) -> SalesSummary:
+    """Merge the rollups for every hour bucket overlapping [start, end]"""
+    query: Dict[str, Any] = {"hour": {"$gte": bucket_hour(start), "$lte": end}}
+    if store_id:
+        query["store_id"] = store_id
+
+    summary = SalesSummary()
+    async for rollup in get_collection(SALES_ROLLUP_COLLECTION).iter_find(query):
+        summary.add(rollup)
+    return summary
+
+
+async def backfill(since: Optional[datetime] = None) -> int:
+    """
+    Rebuild rollups from raw orders (all of them, or those created since a date).
+    Each bucket is replaced in place, so live $inc upserts never find it
+    missing; order writes made while it runs may still be lost from the rebuilt range.
+    Returns the number of rollup documents written.
+    """
+    orders_collection = get_collection("orders")
+    rollups_collection = get_collection(SALES_ROLLUP_COLLECTION)
+    scan_hour = bucket_hour(datetime.utcnow())
+
+    # Rebuild whole hours: the range starts where the replaced buckets do
+    start = bucket_hour(since) if since else None
+    query: Dict[str, Any] = {}
+    if start:
+        # created_at is a datetime for some orders and an ISO string for those
+        # written through the API. Strings compare lexicographically, so their
+        # range starts a day early to cover UTC offsets and ' ' separators;
+        # the bucket check below drops what falls before start.
+        query = {"$or": [
+            {"created_at": {"$gte": start}},
+            {"created_at": {"$gte": (start - timedelta(days=1)).strftime("%Y-%m-%d")}}
+        ]}
+    buckets: Dict[Tuple[Optional[str], datetime], Dict[str, Any]] = {}
+    async for order in orders_collection.iter_find(query, projection=ROLLUP_ORDER_FIELDS):
+        bucket = _bucket(order)
+        if bucket is None or (start and bucket[1] < start):
+            continue
+        _add_order(buckets.setdefault(bucket, defaultdict(int)), order)
+
+    documents: List[Dict[str, Any]] = [
+        {"_id": _rollup_id(store_id, hour), "store_id": store_id, "hour": hour, **_nest(flat)}
+        for (store_id, hour), flat in buckets.items()
+    ]
+    for i in range(0, len(documents), BACKFILL_BATCH_SIZE):
+        await rollups_collection.bulk_write(
+            [ReplaceOne({"_id": document["_id"]}, document, upsert=True)
+             for document in documents[i:i + BACKFILL_BATCH_SIZE]],
+            ordered=False
+        )
+
+    # Buckets in the range that no longer have orders. Hours from the scan on
+    # are kept, since orders created during the backfill may have opened them.
+    hours: Dict[str, Any] = {"$lt": scan_hour}
+    if start:
+        hours["$gte"] = start
+    await rollups_collection.delete_many(
+        {"hour": hours, "_id": {"$nin": [document["_id"] for document in documents]}}
+    )
+    return len(documents)
+
+
+@job_handler(BACKFILL_JOB)
+async def _backfill_job(data: Dict[str, Any]) -> None:
+    written = await backfill()
+    logger.info(f"Rebuilt {written} sales rollup documents")
+
+
+async def schedule_initial_backfill() -> bool:
+    """Queue a full backfill if there are orders but no rollups yet; True if one was queued"""
+    if await get_collection(SALES_ROLLUP_COLLECTION).find_one({}, projection={"_id": 1}):
+        return False
+    if not await get_collection("orders").find_one({}, projection={"_id": 1}):
+        return False
+    try:
+        await enqueue(BACKFILL_JOB, job_uuid=INITIAL_BACKFILL_JOB_UUID)
+    except DuplicateKeyError:
+        return False  # another process queued it first
+    logger.warning("sales_rollups is empty: queued a backfill from existing orders")
+    return True
+
+
+async def _main(argv: List[str]) -> int:
+    from app.database import database
+
+    if database is None:
+        print("❌ Database not initialized - check MONGODB_URL environment variable")
+        return 2
+    if "--backfill" not in argv:
+        print("Usage: python -m app.utils.sales_rollup --backfill [--since YYYY-MM-DD]")
+        return 2
+
+    since = None
+    if "--since" in argv:
+        try:
+            since = datetime.fromisoformat(argv[argv.index("--since") + 1])
+        except (IndexError, ValueError):
+            print("❌ --since expects a date in YYYY-MM-DD format")
+            return 2
+
+    written = await backfill(since)
+    print(f"✅ Rebuilt {written} sales rollup documents")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
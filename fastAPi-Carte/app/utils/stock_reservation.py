@@ -0,0 +1,90 @@
+# app/utils/stock_reservation.py - ATOMIC STOCK RESERVATION
+import asyncio
+from typing import Any, Dict, List
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.database import get_collection
+from app.logging_config import get_logger
+
+logger = get_logger("api.stock")
+
+
+class ReservationResult:
+    """Outcome of a reservation: what was decremented, and any shortages that prevented it"""
+
+    def __init__(self, reserved: Dict[str, float], shortages: List[Dict[str, Any]]):
+        self.reserved = reserved
+        self.shortages = shortages
+
+    @property
+    def succeeded(self) -> bool:
+        return not self.shortages
+
+
+async def _reserve_one(inventory_collection, product_id: str, quantity: float) -> bool:
+    """Decrement one product only if it still has enough stock; the check and the write are a single operation"""
+    result = await inventory_collection.update_one(
+        {"_id": ObjectId(product_id), "quantity_in_stock": {"$gte": quantity}},
+        {"$inc": {"quantity_in_stock": -quantity}}
+    )
+    return result.matched_count == 1
+
+
+async def release_stock(quantities: Dict[str, float]) -> None:
+    """Return previously reserved quantities to inventory in one round trip"""
+    if not quantities:
+        return
+    inventory_collection = get_collection("inventory_products")
+    await inventory_collection.bulk_write(
+        [UpdateOne({"_id": ObjectId(product_id)}, {"$inc": {"quantity_in_stock": quantity}})
+         for product_id, quantity in quantities.items()],
+        ordered=False
+    )
+
+
+async def reserve_stock(required_quantities: Dict[str, float]) -> ReservationResult:
+    """
+    Reserve every required quantity or none of them.
+
+    Each product is decremented with a conditional update, so concurrent orders
+    can never drive stock negative. If any product is short, the decrements that
+    did succeed are rolled back and the shortages are returned.
+    """
+    if not required_quantities:
+        return ReservationResult({}, [])
+
+    inventory_collection = get_collection("inventory_products")
+    product_ids = list(required_quantities)
+    outcomes = await asyncio.gather(
+        *(_reserve_one(inventory_collection, product_id, required_quantities[product_id]) for product_id in product_ids)
+    )
+    reserved = {pid: required_quantities[pid] for pid, ok in zip(product_ids, outcomes) if ok}
+    failed = [pid for pid, ok in zip(product_ids, outcomes) if not ok]
+
+    if not failed:
+        return ReservationResult(reserved, [])
+
+    # A failed update means either too little stock or no such product; only the former is a shortage
+    shortages = []
+    async for product in inventory_collection.iter_find(
+        {"_id": {"$in": [ObjectId(pid) for pid in failed]}}, projection={"name": 1, "quantity_in_stock": 1}
+    ):
+        product_id = str(product["_id"])
+        available = product.get("quantity_in_stock", 0) or 0
+        shortages.append({
+            "product_id": product_id,
+            "product_name": product.get("name", "Unknown"),
+            "required": required_quantities[product_id],
+            "available": available,
+            "shortage": required_quantities[product_id] - available
+        })
+
+    if not shortages:
+        return ReservationResult(reserved, [])
+
+    try:
+        await release_stock(reserved)
+    except Exception as e:
+        logger.error(f"Failed to roll back partial stock reservation {reserved}: {e}")
+        raise
+    return ReservationResult({}, shortages)
@@ -0,0 +1,134 @@
+# benchmark_models.py
+"""
+Benchmark building models from stored documents: full validation against
+the trusted construction path (construct_trusted / MongoModel.from_trusted).
+
+Covers every model class in app/models. Each gets a synthetic document with
+every field filled, built the way the model would store it; MongoModels are
+timed through from_mongo and from_trusted, other models through
+model_validate and construct_trusted. Both paths must dump the same data.
+
+    python benchmark_models.py [--iterations 2000] [--top 15]
+"""
+import argparse
+import sys
+import time
+import typing
+from datetime import date, datetime
+from enum import Enum
+
+from bson import ObjectId
+from pydantic import BaseModel
+
+from app.models import core, hr, inventory, response
+from app.models.base import MongoModel, PyObjectId, construct_trusted
+
+MODEL_MODULES = (core, hr, inventory, response)
+
+
+def model_classes():
+    classes = []
+    for module in MODEL_MODULES:
+        for value in vars(module).values():
+            if isinstance(value, type) and issubclass(value, BaseModel) and value.__module__ == module.__name__:
+                classes.append(value)
+    return classes
+
+
+def sample_value(annotation, name: str):
+    """A stored value for a field annotation"""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Union:
+        return sample_value(next(arg for arg in args if arg is not type(None)), name)
+    if origin is typing.Literal:
+        return args[0]
+    if origin in (list, typing.List):
+        return [sample_value(args[0], name)] if args else []
+    if origin in (dict, typing.Dict):
+        return {"key": sample_value(args[1], name) if args else "value"}
+    if annotation is typing.Any:
+        return "value"
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            return sample_document(annotation)
+        if issubclass(annotation, Enum):
+            return next(iter(annotation)).value
+        if issubclass(annotation, PyObjectId):
+            return str(ObjectId())
+        if issubclass(annotation, bool):
+            return True
+        if issubclass(annotation, int):
+            return 3
+        if issubclass(annotation, float):
+            return 2.5
+        if issubclass(annotation, datetime):
+            return datetime(2025, 1, 1, 12, 30)
+        if issubclass(annotation, date):
+            return date(2025, 1, 1)
+    if "email" in name:
+        return "someone@example.com"
+    return f"{name} value"
+
+
+def sample_document(model):
+    document = {name: sample_value(field.annotation, name) for name, field in model.model_fields.items()}
+    if issubclass(model, MongoModel):
+        document.pop("id", None)
+        document["_id"] = ObjectId()
+    return document
+
+
+def paths(model):
+    if issubclass(model, MongoModel):
+        return model.from_mongo, model.from_trusted
+    return model.model_validate, lambda document: construct_trusted(model, document)
+
+
+def timed(build, document, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        build(document)
+    return (time.perf_counter() - started) / iterations
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--top", type=int, default=15, help="Rows to print, slowest validation first")
+    args = parser.parse_args(argv)
+
+    rows, skipped, mismatched = [], [], []
+    for model in model_classes():
+        document = sample_document(model)
+        validate, trusted = paths(model)
+        try:
+            expected = validate(document).model_dump()
+        except Exception as e:
+            skipped.append(f"{model.__name__} ({type(e).__name__})")
+            continue
+        if trusted(document).model_dump(warnings=False) != expected:
+            mismatched.append(model.__name__)
+            continue
+        rows.append((model.__name__, timed(validate, document, args.iterations), timed(trusted, document, args.iterations)))
+
+    print(f"📊 Model construction over {len(rows)} of {len(rows) + len(skipped) + len(mismatched)} model classes")
+    print(f"{'model':<32} {'validated (µs)':>15} {'trusted (µs)':>13} {'speedup':>8}")
+    for name, validated, trusted in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"{name:<32} {validated * 1e6:>15.2f} {trusted * 1e6:>13.2f} {validated / trusted:>7.1f}x")
+
+    total_validated = sum(row[1] for row in rows)
+    total_trusted = sum(row[2] for row in rows)
+    print(f"{'all models':<32} {total_validated * 1e6:>15.2f} {total_trusted * 1e6:>13.2f} {total_validated / total_trusted:>7.1f}x")
+
+    if skipped:
+        print(f"⚠️  No valid sample document for: {', '.join(skipped)}")
+    if mismatched:
+        print(f"❌ Trusted construction dumped different data for: {', '.join(mismatched)}")
+        return 1
+    print("✅ Trusted construction matched validation for every model timed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,130 @@
+# benchmark_reports.py
+"""
+Benchmark the financial report's order accumulation and daily breakdown.
+
+Feeds synthetic orders through the columnar engine the report uses when it
+summarises raw orders, then folds the result into daily rows. Each order is
+touched once, so the time per order should stay flat as the order count
+grows. The per-order dict accumulator (SalesSummary.add_order) and the old
+per-date rescan are timed alongside for comparison.
+
+    python benchmark_reports.py [--days 90] [--sizes 25000,50000,100000,200000]
+    python benchmark_reports.py --sizes 1000000 --dict-limit 1000000
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.routes.reports import _daily_performance
+from app.utils.order_columns import SUMMARY_COLUMNS, order_columns
+from app.utils.sales_rollup import SalesSummary
+
+# Per-order time may grow by at most this factor between the smallest and largest run
+LINEAR_TOLERANCE = 2.0
+
+# The rescan is O(days x orders); only time it up to this many orders
+RESCAN_LIMIT = 50000
+
+# Default cap on the order count the dict accumulator is timed at
+DICT_LIMIT = 200000
+
+
+def make_orders(count: int, days: int):
+    random.seed(42)
+    end = datetime(2025, 1, 1)
+    foods = [f"food{i}" for i in range(40)]
+    for _ in range(count):
+        yield {
+            "store_id": random.choice(["store1", "store2"]),
+            "created_at": end - timedelta(seconds=random.randint(0, days * 86400 - 1)),
+            "total_amount": round(random.uniform(5, 80), 2),
+            "status": random.choice(["new", "paid", "paid", "paid", "cancelled"]),
+            "payment_method": random.choice(["card", "cash", "halo"]),
+            "customer_id": f"customer{random.randint(0, 2000)}",
+            "employee_id": f"employee{random.randint(0, 30)}",
+            "items": [
+                {"food_id": random.choice(foods), "name": "Dish", "quantity": random.randint(1, 3), "sub_total": 12.5}
+                for _ in range(random.randint(1, 4))
+            ],
+        }
+
+
+def columnar(orders):
+    return _daily_performance(order_columns(orders, SUMMARY_COLUMNS).to_summary())
+
+
+def dict_accumulator(orders):
+    """Folding each order into dicts, as summarise_orders did before the columnar engine"""
+    summary = SalesSummary()
+    for order in orders:
+        summary.add_order(order)
+    return _daily_performance(summary)
+
+
+def per_date_rescan(orders):
+    """The previous approach: one scan of every order per distinct date"""
+    dates = sorted({order["created_at"].strftime("%Y-%m-%d") for order in orders})
+    daily_data = []
+    for date_str in dates:
+        revenue = 0
+        count = 0
+        for order in orders:
+            if order["created_at"].strftime("%Y-%m-%d") == date_str:
+                count += 1
+                if order["status"] != "cancelled":
+                    revenue += order["total_amount"]
+        daily_data.append({"date": date_str, "revenue": revenue, "orders": count})
+    return daily_data
+
+
+def timed(fn, orders):
+    started = time.perf_counter()
+    result = fn(orders)
+    return time.perf_counter() - started, result
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--sizes", default="25000,50000,100000,200000")
+    parser.add_argument("--dict-limit", type=int, default=DICT_LIMIT,
+                        help="Largest order count to time the dict accumulator at")
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    print(f"📊 Financial report daily breakdown over {args.days} days")
+    print(f"{'orders':>10} {'columnar (s)':>13} {'µs/order':>10} {'dict (s)':>10} {'speedup':>8} {'rescan (s)':>12}")
+
+    per_order = []
+    for size in sizes:
+        orders = list(make_orders(size, args.days))
+        elapsed, daily = timed(columnar, orders)
+        per_order.append(elapsed / size)
+
+        dict_time = speedup = "-"
+        if size <= args.dict_limit:
+            dict_elapsed, dict_daily = timed(dict_accumulator, orders)
+            dict_time, speedup = f"{dict_elapsed:.2f}", f"{dict_elapsed / elapsed:.1f}x"
+            assert [(d["date"], d["orders"], round(d["revenue"], 6)) for d in daily] == \
+                [(d["date"], d["orders"], round(d["revenue"], 6)) for d in dict_daily]
+
+        rescan = "-"
+        if size <= RESCAN_LIMIT:
+            rescan_elapsed, rescan_daily = timed(per_date_rescan, orders)
+            rescan = f"{rescan_elapsed:.2f}"
+            assert [(d["date"], d["orders"]) for d in daily] == [(d["date"], d["orders"]) for d in rescan_daily]
+
+        print(f"{size:>10} {elapsed:>13.3f} {elapsed / size * 1e6:>10.2f} {dict_time:>10} {speedup:>8} {rescan:>12}")
+
+    growth = per_order[-1] / per_order[0]
+    if growth > LINEAR_TOLERANCE:
+        print(f"❌ Time per order grew {growth:.2f}x from {sizes[0]} to {sizes[-1]} orders - not linear")
+        return 1
+    print(f"✅ Linear: time per order changed {growth:.2f}x from {sizes[0]} to {sizes[-1]} orders")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,61 @@
+# worker.py
+"""
+Run queued background jobs outside the API process.
+
+    python worker.py [--queues default] [--concurrency 4]
+
+Queues and concurrency default to JOB_WORKER_QUEUES and JOB_WORKER_CONCURRENCY.
+Start the API with JOB_WORKER_IN_PROCESS=false to leave every job to these
+workers. On SIGINT/SIGTERM running jobs get a grace period to finish; any
+that don't are picked up again once their lease lapses.
+"""
+import argparse
+import asyncio
+import signal
+import sys
+
+from app.database import database
+from app.utils.job_queue import JOB_WORKER_CONCURRENCY, JOB_WORKER_QUEUES, JobWorker
+
+# Seconds running jobs get to finish on shutdown
+SHUTDOWN_GRACE_SECONDS = 30
+
+
+async def run(queues, concurrency: int) -> int:
+    if database is None:
+        print("❌ Database not initialized - check MONGODB_URL environment variable")
+        return 2
+
+    worker = JobWorker(queues=queues, concurrency=concurrency)
+    task = asyncio.create_task(worker.run())
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+
+    print(f"✅ Worker running on {', '.join(worker.queues)} with concurrency {worker.concurrency}")
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+    print("⏳ Waiting for running jobs...")
+    await worker.drain(SHUTDOWN_GRACE_SECONDS)
+    print("✅ Worker stopped")
+    return 0
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queues", default=",".join(JOB_WORKER_QUEUES),
+                        help="Comma-separated queues to take jobs from")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY,
+                        help="Maximum jobs run at once")
+    args = parser.parse_args(argv)
+
+    queues = [queue.strip() for queue in args.queues.split(",") if queue.strip()]
+    return asyncio.run(run(queues, args.concurrency))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))